@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Tells settings they are running under ASGI (see DB_CONN_MAX_AGE there).
+os.environ['ASGI'] = '1'
 
 application = get_asgi_application()
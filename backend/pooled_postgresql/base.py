@@ -0,0 +1,126 @@
+"""PostgreSQL on psycopg2 with a process-wide connection pool.
+
+Django's own pool needs psycopg 3; this is the DB_POOL=bundled fallback.
+Instead of closing its connection at the end of a request, each
+DatabaseWrapper hands it back to a per-alias pool shared by all threads of
+the process, and the next request takes it again without a new handshake.
+Options come from the "POOL" key of the database settings:
+max_size (connections in use at once), min_size (idle connections always
+kept), timeout (seconds to wait when all are in use).
+"""
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.base import IsolationLevel
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+MAX_IDLE = 600  # seconds an idle connection beyond min_size is kept
+
+
+class ConnectionPool:
+    def __init__(self, min_size=2, max_size=10, timeout=10, check=True):
+        self.min_size = min_size
+        self.timeout = timeout
+        self.check = check
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = deque()  # (connection, returned at), most recent on the right
+        self.lock = threading.Lock()
+
+    def getconn(self, connect):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(f"No database connection free after {self.timeout}s (DB_POOL_MAX_SIZE).")
+        try:
+            while True:
+                with self.lock:
+                    conn = self.idle.pop()[0] if self.idle else None
+                if conn is None:
+                    return connect()
+                if self._usable(conn):
+                    return conn
+                conn.close()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.closed:
+                return
+            now = time.monotonic()
+            with self.lock:
+                self.idle.append((conn, now))
+                expired = []
+                while len(self.idle) > self.min_size and now - self.idle[0][1] > MAX_IDLE:
+                    expired.append(self.idle.popleft()[0])
+            for old in expired:
+                old.close()
+        except psycopg2.Error:
+            conn.close()
+        finally:
+            self.slots.release()
+
+    def _usable(self, conn):
+        if conn.closed:
+            return False
+        if not self.check:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()  # leave no transaction open for Django's autocommit switch
+            return True
+        except psycopg2.Error:
+            return False
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for conn, _ in idle:
+            conn.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _bundled_pools = {}
+    _bundled_pools_lock = threading.Lock()
+
+    @property
+    def bundled_pool(self):
+        if self.alias == base.NO_DB_ALIAS:
+            return None
+        pool = self._bundled_pools.get(self.alias)
+        if pool is None:
+            options = {"check": self.settings_dict["CONN_HEALTH_CHECKS"], **self.settings_dict.get("POOL", {})}
+            with self._bundled_pools_lock:
+                pool = self._bundled_pools.setdefault(self.alias, ConnectionPool(**options))
+        return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self.bundled_pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # a reused connection skipped the parent's setup of this attribute
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get("isolation_level", IsolationLevel.READ_COMMITTED))
+        return connection
+
+    def _close(self):
+        pool = self.bundled_pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+            self.connection = None
+
+    def close_pool(self):
+        super().close_pool()
+        with self._bundled_pools_lock:
+            pool = self._bundled_pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
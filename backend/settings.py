@@ -3,6 +3,7 @@ import os
 from datetime import timedelta
 from dotenv import load_dotenv
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -67,9 +68,50 @@ TEMPLATES = [
 WSGI_APPLICATION = "backend.wsgi.application"
 
 # Database
+# Connections persist for DB_CONN_MAX_AGE seconds (0 = close after every
+# request) and are pinged before reuse. The default is 600, or 0 under ASGI,
+# where sync ORM calls run on executor threads and each would keep its own
+# connection; an explicit DB_CONN_MAX_AGE applies to both. DB_POOL pools
+# PostgreSQL connections instead: "psycopg" uses Django's pool on psycopg 3
+# (psycopg[pool]), "bundled" a small process-wide pool for psycopg2
+# (backend/pooled_postgresql).
+ASGI = os.getenv("ASGI", "") == "1"  # set by backend/asgi.py
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "0" if ASGI else "600"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "1") == "1"
+DB_POOL = os.getenv("DB_POOL", "")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+
 DATABASES = {
-    "default": dj_database_url.config(default=os.getenv("DATABASE_URL"))
+    "default": dj_database_url.config(
+        default=os.getenv("DATABASE_URL"),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
 }
+if DB_POOL and DATABASES["default"].get("ENGINE") == "django.db.backends.postgresql":
+    _pool = {"min_size": DB_POOL_MIN_SIZE, "max_size": DB_POOL_MAX_SIZE, "timeout": DB_POOL_TIMEOUT}
+    # pooled connections go back to the pool at the end of each request
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    if DB_POOL == "psycopg":
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = _pool
+    elif DB_POOL == "bundled":
+        DATABASES["default"]["ENGINE"] = "backend.pooled_postgresql"
+        DATABASES["default"]["POOL"] = _pool
+    else:
+        raise ValueError(f"DB_POOL must be psycopg or bundled, not {DB_POOL!r}")
+
+# Cache: Redis when REDIS_URL is set (shared by all workers), otherwise
+# per-process memory.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+# Unread counts and cached API responses are invalidated by writes in any
+# worker, so they are only used when every worker sees the same cache.
+SHARED_CACHE = os.getenv("SHARED_CACHE", "1" if REDIS_URL else "0") == "1"
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -79,6 +121,34 @@ AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator"},
 ]
 
+# Login: one user lookup by username or email (social/auth_backends.py), and
+# last_login written at most once per LAST_LOGIN_UPDATE_INTERVAL seconds.
+AUTHENTICATION_BACKENDS = ["social.auth_backends.LoginBackend"]
+LAST_LOGIN_UPDATE_INTERVAL = int(os.getenv("LAST_LOGIN_UPDATE_INTERVAL", "300"))
+
+# Password hashing profile: PBKDF2-SHA256 iterations, the bulk of a login's CPU.
+# "django" keeps Django's default (1,000,000), "owasp" is OWASP's 600,000
+# minimum; an integer sets the count directly but may not go below that
+# minimum (social/hashers.py clamps overrides too). Hashes made at another cost
+# still verify and are re-encoded at this one on the user's next login.
+PASSWORD_HASH_PROFILES = {"django": None, "owasp": 600_000}
+_hash_profile = os.getenv("PASSWORD_HASH_PROFILE", "django")
+if _hash_profile in PASSWORD_HASH_PROFILES:
+    PASSWORD_PBKDF2_ITERATIONS = PASSWORD_HASH_PROFILES[_hash_profile]
+elif _hash_profile.isdigit() and int(_hash_profile) >= PASSWORD_HASH_PROFILES["owasp"]:
+    PASSWORD_PBKDF2_ITERATIONS = int(_hash_profile)
+else:
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASH_PROFILE must be one of {', '.join(PASSWORD_HASH_PROFILES)} or at least "
+        f"{PASSWORD_HASH_PROFILES['owasp']} iterations, not {_hash_profile!r}")
+PASSWORD_HASHERS = [
+    "social.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 # Internationalization
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
@@ -102,6 +172,15 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    "DEFAULT_RENDERER_CLASSES": (
+        "social.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "social.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 # JWT settings
@@ -117,10 +196,99 @@ SIMPLE_JWT = {
 CORS_ALLOW_ALL_ORIGINS = True  # Change later to your frontend domain, e.g., 'https://yourfrontend.vercel.app'
 
 # Email
-EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
 DEFAULT_FROM_EMAIL = "no-reply@socialconnect.local"
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "0") == "1"
+EMAIL_TIMEOUT = 10
+# Views queue mail in OutboundEmail (social/outbox.py). "thread" sends from a
+# background worker, "sync" inline after commit (tests), "off" only through
+# `manage.py send_outbox --loop`. Failed sends are retried after
+# EMAIL_OUTBOX_RETRY_DELAY seconds, doubling each time, up to MAX_ATTEMPTS.
+EMAIL_OUTBOX_PIPELINE = os.getenv("EMAIL_OUTBOX_PIPELINE", "thread")
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_POLL_INTERVAL = 30
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
 
 # Supabase (for storage uploads)
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "images")
+
+# Image uploads (POST /api/uploads/images/). Without Supabase, files are kept
+# under MEDIA_ROOT; MEDIA_URL must be absolute because Post.image_url is a URLField.
+UPLOAD_STORAGE = os.getenv(
+    "UPLOAD_STORAGE", "social.storage.SupabaseStorage" if SUPABASE_URL else "social.storage.LocalStorage")
+MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_URL = os.getenv("MEDIA_URL", "http://localhost:8000/media/")
+# Thumbnails (longest side in px) are rendered off the request path by a
+# thread feeding a process pool ("thread"), or inline ("sync", for tests and
+# serverless hosts). Run `manage.py process_uploads` to retry stragglers.
+UPLOAD_PIPELINE = os.getenv("UPLOAD_PIPELINE", "thread")
+UPLOAD_THUMBNAIL_SIZES = (160, 480, 1080)
+UPLOAD_THUMBNAIL_PROCESSES = int(os.getenv("UPLOAD_THUMBNAIL_PROCESSES", "2"))
+# `process_uploads` deletes uploads still pending or failed after this many hours
+# (files and rows) unless a post uses them.
+UPLOAD_SWEEP_HOURS = float(os.getenv("UPLOAD_SWEEP_HOURS", "24"))
+
+# Home timeline (fan-out-on-write). Authors with at least this many followers
+# are not fanned out; their posts are merged into feeds at read time instead.
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", "10000"))
+# Recent posts copied into a follower's timeline when they follow someone.
+TIMELINE_BACKFILL_SIZE = int(os.getenv("TIMELINE_BACKFILL_SIZE", "200"))
+# The trending feed ranks only this many of a user's newest timeline entries.
+TIMELINE_TRENDING_WINDOW = int(os.getenv("TIMELINE_TRENDING_WINDOW", "1000"))
+
+# Fail GET requests that exceed their view's query_budget (enable in tests).
+ENFORCE_QUERY_BUDGETS = os.getenv("ENFORCE_QUERY_BUDGETS", "") == "1"
+
+# Spread like/comment counter writes for a post over this many rows (0 = off,
+# update the Post row directly). Run `manage.py flush_counter_shards` periodically.
+POST_COUNTER_SHARDS = int(os.getenv("POST_COUNTER_SHARDS", "0"))
+
+# Notifications are written off the request path by a background thread
+# ("thread") or inline ("sync", for tests and serverless hosts).
+NOTIFICATION_PIPELINE = os.getenv("NOTIFICATION_PIPELINE", "thread")
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_BATCH_WAIT = 0.5  # seconds to wait for a batch to fill
+# Unread notifications for the same (recipient, post, type) newer than this
+# many seconds absorb new events instead of creating another row.
+NOTIFICATION_COALESCE_WINDOW = 3600
+
+# Realtime push (/api/stream/, server-sent events; needs ASGI and ASYNC_VIEWS).
+# Use "social.realtime.RedisBroker" when running several worker processes.
+REALTIME_BROKER = os.getenv("REALTIME_BROKER", "social.realtime.MemoryBroker")
+REALTIME_HEARTBEAT = 15  # seconds between keep-alive comments
+REALTIME_BUFFER_SIZE = 100  # events kept per user for Last-Event-ID resume
+REALTIME_RETENTION = 300  # seconds a disconnected user's buffer is kept
+REALTIME_TICKET_TTL = 30  # seconds a POST /api/stream/ticket/ ticket stays valid (single use)
+
+# Seconds a cached public read response (posts, profiles, comments, follower
+# lists) may live; signal handlers invalidate entries sooner when data changes.
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Serialized user/post fragments: shared-cache lifetime and per-process LRU size.
+FRAGMENT_CACHE_TIMEOUT = 3600
+FRAGMENT_LRU_SIZE = 4096
+
+# Admin stats rollup: write slots per hourly bucket, and how long the overview is cached.
+STATS_SHARDS = int(os.getenv("STATS_SHARDS", "8"))
+STATS_CACHE_TIMEOUT = 30
+
+# Search: "postgres" (tsvector + GIN), "python" (in-process BM25 index) or "auto" by database vendor.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+
+# Trending ranking: a post needs 10x the engagement to rank level with one posted this many seconds later.
+TRENDING_TENFOLD_SECONDS = 45000
+
+# "Who to follow": suggestions stored per user. Run `manage.py refresh_suggestions --loop 30` as a worker;
+# it also marks the neighbours of users whose follows changed, which the request only queues.
+SUGGESTIONS_SIZE = 50
+
+# Serve the feed, notification list and like/follow endpoints from async views
+# (social/async_views.py), and route /api/stream/. Turn on when running under ASGI, e.g. uvicorn backend.asgi:application.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "") == "1"
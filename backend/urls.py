@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from django.views.static import serve
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
@@ -8,3 +10,7 @@ urlpatterns = [
     path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/", include("social.urls")),
 ]
+
+if settings.DEBUG and settings.UPLOAD_STORAGE == "social.storage.LocalStorage":
+    # local uploads in development; production uses Supabase storage
+    urlpatterns.append(re_path(r"^media/(?P<path>.*)$", serve, {"document_root": settings.MEDIA_ROOT}))
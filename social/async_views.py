@@ -0,0 +1,144 @@
+"""Async versions of the busiest endpoints, for serving under ASGI.
+
+Each view handles the common case natively with the async ORM and hands
+everything else (no or bad credentials, bad parameters, missing objects,
+other methods) to the DRF view it shadows, so errors and edge cases behave
+exactly as before. Routed in place of the DRF views when
+settings.ASYNC_VIEWS is on (see social/urls.py).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .counters import pending_post_counts
+from .mixins import gather_queries
+from .models import Follow, Like, Post
+from .pagination import KeysetPagination, TrendingPagination
+from .relationships import follow_relations, liked_post_ids, viewer_state_context
+from .renderers import dumps
+from .serializers import NotificationSerializer, PostSerializer
+from .timeline import HomeTimeline
+from .views import NotificationViewSet, PostViewSet, UserViewSet, feed_view
+from . import trending
+
+sync_notifications = NotificationViewSet.as_view({"get": "list", "post": "create"}, basename="notification")
+sync_like = PostViewSet.as_view({"post": "like", "delete": "unlike"}, basename="post", detail=True)
+sync_follow = UserViewSet.as_view({"post": "follow_user", "delete": "unfollow_user"}, basename="user", detail=True)
+
+
+async def authenticate(request):
+    """The active user behind a valid Bearer token, or None."""
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        token = auth.get_validated_token(raw)
+        user = await User.objects.aget(**{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]})
+    except (InvalidToken, TokenError, KeyError, User.DoesNotExist):
+        return None
+    if not user.is_active:
+        return None
+    if jwt_settings.CHECK_REVOKE_TOKEN and token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+        return None
+    return user
+
+
+def _drf_request(request, user):
+    drf_request = Request(request)
+    drf_request.user = user
+    return drf_request
+
+
+def _json(data):
+    return HttpResponse(dumps(data), content_type="application/json")
+
+
+async def _sync(view, request, **kwargs):
+    return await sync_to_async(view)(request, **kwargs)
+
+
+async def serialize_posts(posts, request):
+    """PostSerializer(many=True) output, with the page's side lookups (shard
+    counter deltas, the viewer's likes and follow edges) run concurrently."""
+    context = {"request": request, **viewer_state_context(request)}
+    state = context.get("viewer_state")
+    post_ids = [p.pk for p in posts]
+    author_ids = list({p.author_id for p in posts})
+    lookups = [lambda: pending_post_counts(post_ids)]
+    if state is not None:
+        lookups += [lambda: liked_post_ids(state.user, post_ids), lambda: follow_relations(state.user, author_ids)]
+    pending, *viewer = await gather_queries(*lookups)
+    for p in posts:
+        p.pending_counts = pending.get(p.pk)
+    if state is not None:
+        state.prime_posts(post_ids, viewer[0])
+        state.prime_users(author_ids, *viewer[1])
+    return await sync_to_async(lambda: PostSerializer(posts, many=True, context=context).data)()
+
+
+@csrf_exempt
+async def feed(request):
+    user = await authenticate(request)
+    if user is None or request.method != "GET":
+        return await _sync(feed_view, request)
+    drf_request = _drf_request(request, user)
+    try:
+        ranking = trending.ranking(drf_request)
+        paginator = TrendingPagination() if ranking == "trending" else KeysetPagination()
+        posts = HomeTimeline(user, ranking)
+        page = await paginator.apaginate_queryset(posts, drf_request)
+    except APIException:
+        return await _sync(feed_view, request)
+    data = await serialize_posts(page, drf_request)
+    return _json(paginator.get_paginated_response(data).data)
+
+
+@csrf_exempt
+async def notifications(request):
+    user = await authenticate(request)
+    if user is None or request.method != "GET":
+        return await _sync(sync_notifications, request)
+    drf_request = _drf_request(request, user)
+    view = NotificationViewSet(request=drf_request, action="list", format_kwarg=None)
+    paginator = KeysetPagination()
+    try:
+        page = await paginator.apaginate_queryset(view.get_queryset(), drf_request)
+    except APIException:
+        return await _sync(sync_notifications, request)
+    data = await sync_to_async(lambda: NotificationSerializer(page, many=True, context={"request": drf_request}).data)()
+    return _json(paginator.get_paginated_response(data).data)
+
+
+@csrf_exempt
+async def like(request, pk):
+    user = await authenticate(request)
+    post = await Post.objects.filter(pk=pk, is_active=True).afirst() if user is not None else None
+    if post is None or request.method not in ("POST", "DELETE"):
+        return await _sync(sync_like, request, pk=pk)
+    if request.method == "POST":
+        await Like.objects.aget_or_create(user=user, post=post)
+        return _json({"liked": True})
+    await Like.objects.filter(user=user, post=post).adelete()
+    return _json({"unliked": True})
+
+
+@csrf_exempt
+async def follow(request, pk):
+    user = await authenticate(request)
+    target = await User.objects.filter(pk=pk).afirst() if user is not None else None
+    if target is None or target.pk == user.pk or request.method not in ("POST", "DELETE"):
+        return await _sync(sync_follow, request, pk=pk)
+    if request.method == "POST":
+        await Follow.objects.aget_or_create(follower=user, following=target)
+        return _json({"followed": True})
+    await Follow.objects.filter(follower=user, following=target).adelete()
+    return _json({"unfollowed": True})
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+
+def find_user(identifier):
+    """The user for a username, or for an email address (any case), in one query.
+
+    The email match is on UPPER(email), which auth_user_email_upper_idx covers.
+    """
+    users = User.objects.all()
+    if "@" in identifier:
+        users = users.alias(email_upper=Upper("email")).filter(email_upper=identifier.upper())
+    else:
+        users = users.filter(username=identifier)
+    return users.order_by("pk").first()
+
+
+class LoginBackend(ModelBackend):
+    """ModelBackend that also accepts an email address as the username and
+    loads the user once, instead of a lookup by email followed by another by
+    username."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None or password is None:
+            return None
+        user = find_user(username)
+        if user is None:
+            # hash anyway, so an unknown account takes as long as a wrong password
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+def touch_last_login(user):
+    """Record a login, writing last_login at most once per LAST_LOGIN_UPDATE_INTERVAL seconds."""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, "LAST_LOGIN_UPDATE_INTERVAL", 300))
+    if user.last_login is not None and user.last_login > cutoff:
+        return
+    # conditional, so a burst of logins for one user writes once
+    User.objects.filter(Q(last_login__isnull=True) | Q(last_login__lte=cutoff), pk=user.pk).update(last_login=now)
+    user.last_login = now
@@ -3,16 +3,16 @@ from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.urls import reverse
-from django.conf import settings
-from django.utils import timezone
+from django.db import transaction
 
 from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .auth_backends import touch_last_login
+from .outbox import enqueue
 from .serializers import RegisterSerializer, ChangePasswordSerializer, UserSerializer
 
 class RegisterView(APIView):
@@ -30,13 +30,8 @@ class RegisterView(APIView):
         verify_url = request.build_absolute_uri(
             reverse("auth-verify-email", kwargs={"uidb64": uid, "token": token})
         )
-        send_mail(
-            "Verify your SocialConnect account",
-            f"Click to verify: {verify_url}",
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=True,
-        )
+        # sent by the outbox worker, not on the request
+        enqueue("Verify your SocialConnect account", f"Click to verify: {verify_url}", [user.email])
         return Response({"message": "Registered. Check email to verify."}, status=status.HTTP_201_CREATED)
 
 class VerifyEmailView(APIView):
@@ -64,25 +59,16 @@ class LoginView(APIView):
         if not username_or_email or not password:
             return Response({"detail": "username/email and password required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if "@" in username_or_email:
-            try:
-                user_obj = User.objects.get(email__iexact=username_or_email)
-                username = user_obj.username
-            except User.DoesNotExist:
-                return Response({"detail": "Invalid credentials."}, status=status.HTTP_401_UNAUTHORIZED)
-        else:
-            username = username_or_email
-
-        user = authenticate(username=username, password=password)
+        # LoginBackend accepts a username or an email and fetches the user once
+        user = authenticate(request, username=username_or_email, password=password)
         if not user:
             return Response({"detail": "Invalid credentials."}, status=status.HTTP_401_UNAUTHORIZED)
         if not user.is_active:
             return Response({"detail": "Account inactive."}, status=status.HTTP_403_FORBIDDEN)
 
-        user.last_login = timezone.now()
-        user.save(update_fields=["last_login"])
-
-        refresh = RefreshToken.for_user(user)
+        with transaction.atomic():  # one commit for both writes
+            touch_last_login(user)
+            refresh = RefreshToken.for_user(user)
         return Response({
             "access": str(refresh.access_token),
             "refresh": str(refresh),
@@ -134,7 +120,7 @@ class PasswordResetView(APIView):
         reset_url = request.build_absolute_uri(
             reverse("auth-password-reset-confirm", kwargs={"uidb64": uid, "token": token})
         )
-        send_mail("Password reset", f"Reset link: {reset_url}", settings.DEFAULT_FROM_EMAIL, [email], fail_silently=True)
+        enqueue("Password reset", f"Reset link: {reset_url}", [email])
         return Response({"message": "If the email exists, a reset link was sent."})
 
 class PasswordResetConfirmView(APIView):
@@ -0,0 +1,173 @@
+import csv
+from collections import Counter
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .counters import incr
+from .mixins import query_plan
+from .models import Comment, Like, Post, Profile
+from .renderers import StreamingJSONResponse, dumps
+from .response_cache import bump
+from . import stats
+
+EXPORT_CHUNK_SIZE = 1000
+BULK_BATCH_SIZE = 500
+
+
+# ---- Streaming exports ----
+def serialized_rows(serializer_class, queryset, chunk_size=EXPORT_CHUNK_SIZE, context=None):
+    """Serializer output row by row, holding at most one chunk in memory."""
+    select, prefetch, only = query_plan(serializer_class)
+    qs = queryset.select_related(*select).prefetch_related(*prefetch)
+    if only:
+        qs = qs.only(*only)
+    # one-off rows would only evict hot fragments
+    context = {**(context or {}), "fragments": False}
+    chunk = []
+    for obj in qs.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield from serializer_class(chunk, many=True, context=context).data
+            chunk = []
+    if chunk:
+        yield from serializer_class(chunk, many=True, context=context).data
+
+
+def csv_columns(serializer, prefix=""):
+    """Column names for a serializer's output; nested serializers become "author.id" etc."""
+    columns = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+            columns += csv_columns(field, f"{prefix}{name}.")
+        else:
+            columns.append(prefix + name)
+    return columns
+
+
+def _csv_value(row, column):
+    for key in column.split("."):
+        row = row.get(key) if isinstance(row, dict) else None
+    # free-form values (JSONField dicts, lists) stay in one cell
+    return dumps(row).decode() if isinstance(row, (dict, list)) else row
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row, column) for column in columns])
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield dumps(row) + b"\n"
+
+
+def export_response(request, serializer_class, queryset, name):
+    """JSON array (default), ?export=ndjson or ?export=csv, streamed in chunks."""
+    context = {"request": request}
+    rows = serialized_rows(serializer_class, queryset.order_by("pk"), context=context)
+    mode = request.query_params.get("export", "json")
+    if mode == "json":
+        return StreamingJSONResponse(rows)
+    if mode == "ndjson":
+        response = StreamingHttpResponse(_ndjson_lines(rows), content_type="application/x-ndjson")
+    elif mode == "csv":
+        columns = csv_columns(serializer_class(context=context))
+        response = StreamingHttpResponse(_csv_lines(rows, columns), content_type="text/csv")
+    else:
+        raise ValidationError({"export": ["Expected one of json, ndjson, csv."]})
+    response["Content-Disposition"] = f'attachment; filename="{name}.{mode}"'
+    return response
+
+
+# ---- Bulk actions ----
+def bulk_filter(queryset, data, date_field):
+    """Narrow `queryset` by ids, an id range and/or a date cutoff from a request body.
+
+    At least one criterion is required so an empty body never matches the
+    whole table.
+    """
+    criteria = {}
+    try:
+        if data.get("ids") is not None:
+            criteria["pk__in"] = [int(i) for i in data["ids"]]
+        if data.get("id_from") is not None:
+            criteria["pk__gte"] = int(data["id_from"])
+        if data.get("id_to") is not None:
+            criteria["pk__lte"] = int(data["id_to"])
+    except (TypeError, ValueError):
+        raise ValidationError({"ids": ["Expected integer ids."]})
+    if data.get("before"):
+        before = parse_datetime(str(data["before"]))
+        if before is None:
+            raise ValidationError({"before": ["Expected an ISO 8601 datetime."]})
+        criteria[f"{date_field}__lt"] = before
+    if not criteria:
+        raise ValidationError({"detail": "Give ids, id_from/id_to or before."})
+    return queryset.filter(**criteria)
+
+
+def id_batches(queryset, size=BULK_BATCH_SIZE):
+    """Primary keys of `queryset` in ascending batches, seeking past the last one."""
+    last = None
+    while True:
+        qs = queryset if last is None else queryset.filter(pk__gt=last)
+        ids = list(qs.order_by("pk").values_list("pk", flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def bulk_deactivate_users(queryset):
+    done = 0
+    for ids in id_batches(queryset.filter(is_active=True)):
+        done += queryset.model.objects.filter(pk__in=ids).update(is_active=False)
+    if done:
+        bump("users")
+    return done
+
+
+def _delete_for_posts(model, post_ids):
+    """One DELETE of `model` rows on these posts, without per-row signals.
+    Nothing references likes or comments, so there is nothing to cascade."""
+    rows = model.objects.filter(post_id__in=post_ids)
+    rows._raw_delete(rows.db)
+
+
+def bulk_delete_posts(queryset):
+    """Delete posts in batches.
+
+    The posts themselves go through QuerySet.delete(), so their signals
+    update search, stats and cached responses, and timeline entries cascade.
+    Likes and comments are removed with one DELETE per batch instead of a
+    signal per row, since those receivers would only adjust counters on
+    posts that are about to go; their side effects are applied here:
+    stats buckets and authors' posts_count.
+    """
+    done = 0
+    for ids in id_batches(queryset):
+        with transaction.atomic():
+            authors = Counter(Post.objects.filter(pk__in=ids).values_list("author_id", flat=True))
+            for metric, model in (("likes", Like), ("comments", Comment)):
+                stats.forget(metric, model.objects.filter(post_id__in=ids))
+                _delete_for_posts(model, ids)
+            _, deleted = Post.objects.filter(pk__in=ids).delete()
+            for author_id, n in authors.items():
+                incr(Profile, "posts_count", -n, user_id=author_id)
+        done += deleted.get(Post._meta.label, 0)
+    if done:
+        bump("posts", "profiles")
+    return done
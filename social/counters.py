@@ -0,0 +1,126 @@
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from . import trending
+from .models import Comment, Follow, Like, Post, PostCounterShard, Profile
+
+# Post counter -> PostCounterShard delta column
+SHARD_FIELDS = {"like_count": "like_delta", "comment_count": "comment_delta"}
+
+
+def incr(model, field, delta=1, **lookup):
+    """Adjust a denormalized counter in one UPDATE, clamped at zero.
+
+    A decrement larger than the counter (after drift) lands on zero rather
+    than being skipped, which would leave the drift in place.
+    """
+    new = Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+    return model.objects.filter(**lookup).update(**{field: new})
+
+
+def shard_count():
+    return getattr(settings, "POST_COUNTER_SHARDS", 0)
+
+
+def incr_post(post_id, field, delta=1):
+    """Adjust Post.like_count / comment_count, through a shard slot if enabled.
+
+    trending_score moves in the same UPDATE (or when the shards are flushed).
+
+    With sharding on, concurrent writers on a hot post land on different rows
+    instead of queueing on the post's row lock.
+    """
+    shards = shard_count()
+    if not shards:
+        new = Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+        qs = Post.objects.filter(pk=post_id)
+        return qs.update(**{field: new}, trending_score=trending.adjust(**{field: new}))
+    column = SHARD_FIELDS[field]
+    slot = random.randrange(shards)
+    bump = {column: F(column) + delta}
+    if PostCounterShard.objects.filter(post_id=post_id, slot=slot).update(**bump):
+        return 1
+    try:
+        with transaction.atomic():
+            PostCounterShard.objects.create(post_id=post_id, slot=slot, **{column: delta})
+    except IntegrityError:
+        # another writer created the slot first
+        PostCounterShard.objects.filter(post_id=post_id, slot=slot).update(**bump)
+    return 1
+
+
+def pending_post_counts(post_ids):
+    """{post_id: {"like_count": n, "comment_count": n}} of unflushed shard deltas."""
+    if not shard_count() or not post_ids:
+        return {}
+    rows = (PostCounterShard.objects.filter(post_id__in=post_ids).values("post_id")
+            .annotate(like_count=Sum("like_delta"), comment_count=Sum("comment_delta")))
+    return {row.pop("post_id"): row for row in rows}
+
+
+def flush_shards():
+    """Fold shard deltas into the Post rows. Returns the number of posts updated."""
+    with transaction.atomic():
+        shards = list(PostCounterShard.objects.select_for_update()
+                      .exclude(like_delta=0, comment_delta=0)
+                      .values_list("id", "post_id", "like_delta", "comment_delta"))
+        totals = {}
+        for _, post_id, likes, comments in shards:
+            t = totals.setdefault(post_id, [0, 0])
+            t[0] += likes
+            t[1] += comments
+        for post_id, (likes, comments) in totals.items():
+            new = {"like_count": Greatest(F("like_count") + likes, 0),
+                   "comment_count": Greatest(F("comment_count") + comments, 0)}
+            Post.objects.filter(pk=post_id).update(**new, trending_score=trending.adjust(**new))
+        PostCounterShard.objects.filter(id__in=[row[0] for row in shards]).update(
+            like_delta=0, comment_delta=0)
+    return len(totals)
+
+
+# (model, counter field, model key, source model, source foreign key)
+COUNTERS = [
+    (Profile, "followers_count", "user_id", Follow, "following_id"),
+    (Profile, "following_count", "user_id", Follow, "follower_id"),
+    (Profile, "posts_count", "user_id", Post, "author_id"),
+    (Post, "like_count", "id", Like, "post_id"),
+    (Post, "comment_count", "id", Comment, "post_id"),
+]
+
+
+def actual_count(key, source, source_fk):
+    """Correlated COUNT(*) of `source` rows pointing at the outer row."""
+    counts = (source.objects.filter(**{source_fk: OuterRef(key)}).order_by()
+              .values(source_fk).annotate(n=Count("*")).values("n"))
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile(dry_run=False):
+    """Recompute every denormalized counter and fix rows that have drifted.
+
+    Each counter is repaired with a single UPDATE ... WHERE counter <> actual,
+    so only drifted rows are written, and repaired posts get their
+    trending_score recomputed. Pending shard deltas are flushed first,
+    otherwise they would be counted twice. Returns {"Model.field": rows}.
+    """
+    if not dry_run:
+        flush_shards()
+    fixed, repaired_posts = {}, set()
+    for model, field, key, source, source_fk in COUNTERS:
+        actual = actual_count(key, source, source_fk)
+        drifted = model.objects.annotate(actual=actual).exclude(**{field: F("actual")})
+        label = f"{model.__name__}.{field}"
+        if dry_run:
+            fixed[label] = drifted.count()
+            continue
+        if model is Post:
+            repaired_posts.update(drifted.values_list("pk", flat=True))
+        fixed[label] = drifted.update(**{field: actual})
+    if repaired_posts:
+        # from scratch: the drifted score may not match the drifted counts either
+        trending.refresh(Post.objects.filter(pk__in=repaired_posts))
+    return fixed
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .response_cache import versions
+
+
+class LRU:
+    """Small thread-safe in-process LRU in front of the shared cache."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+
+local = LRU(getattr(settings, "FRAGMENT_LRU_SIZE", 4096))
+
+
+def _stamp(dt):
+    return int(dt.timestamp() * 1_000_000) if dt else 0
+
+
+def enabled(context):
+    """Serializer contexts can opt out, e.g. bulk exports that would flood the cache."""
+    return context.get("fragments", True)
+
+
+def users_enabled(context):
+    """User fragments are invalidated through cache versions, so they also need a SHARED_CACHE."""
+    return enabled(context) and getattr(settings, "SHARED_CACHE", False)
+
+
+def user_versions(users, context):
+    """Each user's "user:<id>" version (bumped when they are edited), looked
+    up in one get_many and remembered for the rest of the serialization."""
+    known = context.setdefault("_user_versions", {})
+    missing = list({u.pk for u in users if u.pk not in known})
+    if missing:
+        known.update(zip(missing, versions([f"user:{pk}" for pk in missing])))
+    return known
+
+
+def user_keys(users, context):
+    # last_login changes on every login without a version bump, so it is
+    # part of the key itself
+    known = user_versions(users, context)
+    return [f"frag:user:{u.pk}:{known[u.pk]}:{_stamp(u.last_login)}" for u in users]
+
+
+def user_key(user, context):
+    return user_keys([user], context)[0]
+
+
+def post_key(post):
+    # counters are updated in place without touching updated_at
+    return f"frag:post:{post.pk}:{_stamp(post.updated_at)}:{post.like_count}:{post.comment_count}"
+
+
+def prefetch(keys):
+    """Pull fragments missing from the local tier with one get_many."""
+    missing = [k for k in keys if k not in local]
+    if missing:
+        for key, value in cache.get_many(missing).items():
+            local.set(key, value)
+
+
+def fetch(key, build):
+    """Fragment for `key` from the local tier, then the shared cache, else `build()`."""
+    value = local.get(key)
+    if value is None:
+        value = cache.get(key)
+        if value is None:
+            value = dict(build())
+            cache.set(key, value, getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 3600))
+        local.set(key, value)
+    return dict(value)
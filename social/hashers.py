@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+MIN_ITERATIONS = 600_000  # OWASP's minimum for PBKDF2-SHA256
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """Django's PBKDF2-SHA256 with the cost taken from PASSWORD_PBKDF2_ITERATIONS.
+
+    The algorithm name is unchanged, so existing hashes still verify, and a
+    hash made at another cost is re-encoded at this one on the user's next
+    successful login. Counts below MIN_ITERATIONS are raised to it.
+    """
+
+    @property
+    def iterations(self):
+        iterations = getattr(settings, "PASSWORD_PBKDF2_ITERATIONS", None) or hashers.PBKDF2PasswordHasher.iterations
+        return max(iterations, MIN_ITERATIONS)
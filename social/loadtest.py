@@ -0,0 +1,99 @@
+"""Helpers for the load-test management commands: seed a feed, run a
+server subprocess, and drive it with keep-alive client threads."""
+import http.client
+import subprocess
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+
+from .models import Follow, Post, Profile
+from .timeline import backfill
+
+
+def seed_feed(tag):
+    """A reader following 20 authors with 10 posts each; returns the reader."""
+    users = User.objects.bulk_create(User(username=f"bench_{tag}_{i}") for i in range(21))
+    Profile.objects.bulk_create(Profile(user=u) for u in users)
+    reader, authors = users[0], users[1:]
+    Follow.objects.bulk_create(Follow(follower=reader, following=a) for a in authors)
+    Post.objects.bulk_create(Post(author=a, content=f"load test post {i}") for a in authors for i in range(10))
+    for author in authors:
+        backfill(reader.pk, author.pk)
+    return reader
+
+
+def run_load(port, path, headers, concurrency, duration):
+    """GET `path` from `concurrency` threads for `duration` seconds.
+
+    Returns requests (successful), rps, p50/p99 latency in ms and errors.
+    """
+    deadline = time.monotonic() + duration
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine, failed = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            if ok:
+                mine.append((time.perf_counter() - start) * 1000)
+            else:
+                failed += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+    latencies.sort()
+    pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else float("nan")
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed,
+            "p50": pick(0.5), "p99": pick(0.99), "errors": errors[0]}
+
+
+class Server:
+    """Run a server subprocess for the duration of a `with` block."""
+
+    def __init__(self, command, env, port, probe="/api/feed/"):
+        self.command, self.env, self.port, self.probe = command, env, port, probe
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, env=self.env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"Server exited with status {self.process.returncode}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                conn.request("GET", self.probe)
+                conn.getresponse().read()
+                conn.close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError("Server did not start within 30s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
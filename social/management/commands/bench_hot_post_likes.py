@@ -0,0 +1,58 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from social.counters import flush_shards
+from social.models import Like, Post, Profile
+
+
+class Command(BaseCommand):
+    help = ("Benchmark likes/sec on a single hot post, with the plain row counter "
+            "and with sharded counters. Creates and removes its own rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--likes", type=int, default=2000)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--shards", type=int, nargs="+", default=[0, 16],
+                            help="Shard counts to compare; 0 means the Post row counter.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stderr.write("SQLite serializes all writers; run against PostgreSQL for meaningful numbers.")
+        tag = uuid.uuid4().hex[:8]
+        author = User.objects.create(username=f"bench_{tag}_author")
+        Profile.objects.create(user=author)
+        likers = User.objects.bulk_create(
+            User(username=f"bench_{tag}_{i}") for i in range(options["likes"] * len(options["shards"]))
+        )
+        try:
+            for n, shards in enumerate(options["shards"]):
+                post = Post.objects.create(author=author, content="hot post")
+                batch = likers[n * options["likes"]:(n + 1) * options["likes"]]
+                with override_settings(POST_COUNTER_SHARDS=shards):
+                    elapsed = self.run_likes(post, batch, options["threads"])
+                    flush_shards()
+                post.refresh_from_db()
+                label = f"{shards} shards" if shards else "row counter"
+                self.stdout.write(f"{label:>12}: {len(batch) / elapsed:8.0f} likes/sec "
+                                  f"(like_count={post.like_count}, expected {len(batch)})")
+        finally:
+            User.objects.filter(username__startswith=f"bench_{tag}_").delete()
+
+    def run_likes(self, post, users, threads):
+        def worker(chunk):
+            try:
+                for user in chunk:
+                    Like.objects.create(user=user, post=post)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, [users[i::threads] for i in range(threads)]))
+        return time.perf_counter() - start
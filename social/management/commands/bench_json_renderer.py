@@ -0,0 +1,63 @@
+import contextlib
+import json
+import time
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from social import renderers
+from social.models import Post, Profile
+from social.serializers import PostSerializer
+
+
+class Command(BaseCommand):
+    help = ("Benchmark encoding PostSerializer output with DRF's JSONRenderer against "
+            "FastJSONRenderer (orjson and stdlib paths). Creates and removes its own rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20, help="Posts per rendered page.")
+        parser.add_argument("--iterations", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        author = User.objects.create(username=f"bench_{tag}", first_name="Bench", last_name="Ünicode")
+        Profile.objects.create(user=author)
+        try:
+            Post.objects.bulk_create(
+                Post(author=author, content=f"post {i} — " + "lorem ipsum dolor sit amet " * 8,
+                     image_url=f"https://example.com/{i}.jpg", like_count=i, comment_count=i // 2)
+                for i in range(options["rows"])
+            )
+            posts = Post.objects.filter(author=author).select_related("author")
+            data = PostSerializer(posts, many=True).data
+            self.compare(data, options["iterations"])
+        finally:
+            User.objects.filter(username=f"bench_{tag}").delete()
+
+    def compare(self, data, iterations):
+        fast = renderers.FastJSONRenderer().render
+        candidates = [("DRF JSONRenderer", JSONRenderer().render, contextlib.nullcontext())]
+        if renderers.orjson is not None:
+            candidates.append(("FastJSONRenderer (orjson)", fast, contextlib.nullcontext()))
+        else:
+            self.stderr.write("orjson is not installed; only the stdlib fast path is measured.")
+        candidates.append(("FastJSONRenderer (stdlib)", fast, mock.patch.object(renderers, "orjson", None)))
+
+        expected = json.loads(JSONRenderer().render(data))
+        baseline = None
+        for label, render, ctx in candidates:
+            with ctx:
+                out = render(data)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    render(data)
+                elapsed = time.perf_counter() - start
+            if json.loads(out) != expected:
+                self.stderr.write(f"{label}: output differs from DRF's renderer")
+            rate = len(out) * iterations / elapsed
+            baseline = baseline or rate
+            self.stdout.write(f"{label:>26}: {rate / 1e6:7.1f} MB/s  "
+                              f"{elapsed / iterations * 1e6:7.1f} us/page  ({rate / baseline:.1f}x)")
@@ -0,0 +1,87 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from social.hashers import MIN_ITERATIONS
+
+PASSWORD = "Bench-pass-4821!"
+
+
+class Command(BaseCommand):
+    help = ("Benchmark POST /api/auth/login/ per password hashing profile and report "
+            "logins/sec and logins per CPU-second (i.e. per core), plus queries per login. "
+            "Creates and removes its own users.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default="django,owasp",
+                            help=f"Comma-separated, from {', '.join(settings.PASSWORD_HASH_PROFILES)} "
+                                 f"or iteration counts of at least {MIN_ITERATIONS}.")
+        parser.add_argument("--logins", type=int, default=100, help="Logins per profile.")
+        parser.add_argument("--users", type=int, default=20, help="Distinct accounts to log in as.")
+        parser.add_argument("--threads", type=int, default=1)
+
+    def handle(self, *args, **options):
+        profiles = []
+        for name in options["profiles"].split(","):
+            if name in settings.PASSWORD_HASH_PROFILES:
+                profiles.append((name, settings.PASSWORD_HASH_PROFILES[name]))
+            elif name.isdigit() and int(name) >= MIN_ITERATIONS:
+                profiles.append((name, int(name)))
+            else:
+                raise CommandError(f"Unknown profile {name!r} (iteration counts start at {MIN_ITERATIONS})")
+        tag = uuid.uuid4().hex[:8]
+        try:
+            self.stdout.write(f"{'profile':>8} {'iterations':>10} {'logins/s':>9} {'per core':>9} "
+                              f"{'queries first/repeat':>21}")
+            for n, (name, iterations) in enumerate(profiles):
+                with override_settings(PASSWORD_PBKDF2_ITERATIONS=iterations):
+                    names = self.create_users(f"bench_{tag}_{n}", options["users"])
+                    queries = [self.count_queries(names[0]) for _ in range(2)]
+                    logins, wall, cpu = self.run_logins(names, options["logins"], options["threads"])
+                cost = iterations or "default"
+                self.stdout.write(f"{name:>8} {cost:>10} {logins / wall:>9.1f} {logins / cpu:>9.1f} "
+                                  f"{'/'.join(map(str, queries)):>21}")
+        finally:
+            OutstandingToken.objects.filter(user__username__startswith=f"bench_{tag}_").delete()
+            User.objects.filter(username__startswith=f"bench_{tag}_").delete()
+
+    def create_users(self, prefix, count):
+        encoded = make_password(PASSWORD)  # one hash at the profile's cost, shared
+        users = User.objects.bulk_create(
+            User(username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password=encoded)
+            for i in range(count))
+        return [u.username for u in users]
+
+    def login(self, client, username):
+        response = client.post("/api/auth/login/", {"username": username, "password": PASSWORD},
+                               content_type="application/json")
+        if response.status_code != 200:
+            raise CommandError(f"Login failed: {response.status_code} {response.content[:200]!r}")
+
+    def count_queries(self, username):
+        with CaptureQueriesContext(connection) as queries:
+            self.login(Client(), username)
+        return len(queries)
+
+    def run_logins(self, names, count, threads):
+        def worker(i):
+            try:
+                client = Client()
+                for n in range(i, count, threads):
+                    self.login(client, names[n % len(names)])
+            finally:
+                connection.close()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, range(threads)))
+        return count, time.perf_counter() - wall, time.process_time() - cpu
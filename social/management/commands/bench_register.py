@@ -0,0 +1,92 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from social.models import OutboundEmail
+from social.outbox import deliver
+
+
+class SMTPStandIn(EmailBackend):
+    """locmem backend with SMTP-like costs: a connect (TCP + TLS + AUTH) on
+    open and a round trip per message. Like the SMTP backend, send_messages
+    on a closed connection opens one and closes it afterwards."""
+    connect_ms = send_ms = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected = False
+
+    def open(self):
+        if self.connected:
+            return False
+        time.sleep(self.connect_ms / 1000)
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        opened = self.open()
+        try:
+            time.sleep(self.send_ms * len(messages) / 1000)
+            return super().send_messages(messages)
+        finally:
+            if opened:
+                self.close()
+
+
+class Command(BaseCommand):
+    help = ("Compare POST /api/auth/register/ latency with the verification email sent on the "
+            "request (EMAIL_OUTBOX_PIPELINE=sync, as before the outbox) and only queued, then "
+            "time draining the queue over one connection. SMTP is simulated offline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Registrations per mode.")
+        parser.add_argument("--connect-ms", type=float, default=150, help="Simulated SMTP connect cost.")
+        parser.add_argument("--send-ms", type=float, default=30, help="Simulated per-message cost.")
+
+    def handle(self, *args, **options):
+        SMTPStandIn.connect_ms, SMTPStandIn.send_ms = options["connect_ms"], options["send_ms"]
+        tag = uuid.uuid4().hex[:8]
+        backend = f"{__name__}.SMTPStandIn"
+        since = OutboundEmail.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        ours = lambda: [m for m in OutboundEmail.objects.filter(pk__gt=since) if m.to[0].startswith(f"bench_{tag}")]
+        try:
+            self.stdout.write(f"{'mode':>7} {'p50 ms':>8} {'p99 ms':>8} {'sent on request':>16}")
+            for n, (label, mode) in enumerate((("inline", "sync"), ("outbox", "off"))):
+                mail.outbox = []
+                with override_settings(EMAIL_BACKEND=backend, EMAIL_OUTBOX_PIPELINE=mode):
+                    latencies = self.register(f"{tag}{n}", options["requests"])
+                pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+                self.stdout.write(f"{label:>7} {pick(0.5):>8.1f} {pick(0.99):>8.1f} {len(mail.outbox):>16}")
+
+            # what the worker does with the queued ones, minus the claim step
+            queued = [m for m in ours() if m.status == OutboundEmail.QUEUED]
+            with override_settings(EMAIL_BACKEND=backend):
+                start = time.perf_counter()
+                deliver(queued)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(f"Outbox worker sent {len(mail.outbox)} of {len(queued)} queued emails "
+                              f"in {elapsed:.2f}s over one connection.")
+        finally:
+            OutboundEmail.objects.filter(pk__in=[m.pk for m in ours()]).delete()
+            User.objects.filter(username__startswith=f"bench_{tag}").delete()
+
+    def register(self, prefix, count):
+        client, latencies = Client(), []
+        for i in range(count):
+            name = f"bench_{prefix}_{i}"
+            data = {"username": name, "email": f"{name}@example.com",
+                    "password": "Bench-pass-4821!", "password2": "Bench-pass-4821!"}
+            start = time.perf_counter()
+            response = client.post("/api/auth/register/", data, content_type="application/json")
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 201, response.content
+        return sorted(latencies)
@@ -0,0 +1,76 @@
+import random
+import statistics
+import time
+import uuid
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from social.models import Post, Profile
+from social.search import InvertedIndex, PostgresSearch
+
+
+class Command(BaseCommand):
+    help = ("Search latency over synthetic posts drawn from a Zipf-distributed vocabulary. "
+            "The python backend indexes in memory; postgres inserts (and then removes) real rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--vocabulary", type=int, default=50_000)
+        parser.add_argument("--backend", choices=["python", "postgres"], default="python")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        words = [f"w{i}" for i in range(options["vocabulary"])]
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+        cumulative = list(accumulate(weights))
+
+        def text(n):
+            return " ".join(rng.choices(words, cum_weights=cumulative, k=n))
+
+        # mostly mid-frequency terms, the way people actually search
+        queries = [" ".join(rng.choices(words[50:5000], k=rng.randint(1, 3))) for _ in range(options["queries"])]
+
+        start = time.perf_counter()
+        if options["backend"] == "python":
+            index = InvertedIndex()
+            for post_id in range(options["posts"]):
+                index.add(post_id, text(rng.randint(8, 40)))
+            self.stdout.write(f"indexed {len(index)} posts, {len(index.postings)} terms "
+                              f"in {time.perf_counter() - start:.1f}s")
+            run = lambda q: index.search(q, 20)
+            self.report(run, queries)
+        else:
+            if connection.vendor != "postgresql":
+                raise CommandError("--backend postgres needs a PostgreSQL database.")
+            author = User.objects.create(username=f"bench_{uuid.uuid4().hex[:8]}")
+            Profile.objects.create(user=author)
+            try:
+                for offset in range(0, options["posts"], 10_000):
+                    Post.objects.bulk_create(Post(author=author, content=text(rng.randint(8, 40)))
+                                             for _ in range(min(10_000, options["posts"] - offset)))
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE social_post")
+                self.stdout.write(f"inserted {options['posts']} posts in {time.perf_counter() - start:.1f}s")
+                backend = PostgresSearch()
+                self.report(lambda q: backend.posts(q, 20), queries)
+            finally:
+                author.delete()
+
+    def report(self, run, queries):
+        for q in queries[:5]:
+            run(q)  # warm up
+        timings = []
+        for q in queries:
+            start = time.perf_counter()
+            run(q)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        pick = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+        self.stdout.write(f"{len(timings)} queries: mean {statistics.mean(timings):.2f} ms, "
+                          f"p50 {pick(0.5):.2f} ms, p95 {pick(0.95):.2f} ms, p99 {pick(0.99):.2f} ms")
+
@@ -0,0 +1,83 @@
+import time
+import uuid
+from contextlib import ExitStack
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+
+from social import fragments
+from social import serializers as social_serializers
+from social.mixins import FieldPlanMixin, query_plan
+from social.models import Comment, Notification, Post, Profile
+from social.renderers import FastJSONRenderer
+from social.serializers import CommentSerializer, NotificationSerializer, PostSerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    help = ("Check that the FieldPlanMixin read path renders byte-for-byte the same JSON as "
+            "plain ModelSerializer, then time both per row. Creates and removes its own rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200)
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        rows = options["rows"]
+        users = User.objects.bulk_create(
+            User(username=f"bench_{tag}_{i}", first_name="Bénch", email=f"{i}@example.com") for i in range(10)
+        )
+        Profile.objects.bulk_create(Profile(user=u) for u in users)
+        try:
+            posts = Post.objects.bulk_create(
+                Post(author=users[i % 10], content=f"post {i}  " + "lorem ipsum " * 10,
+                     image_url="" if i % 3 else f"https://example.com/{i}.png", like_count=i)
+                for i in range(rows)
+            )
+            Comment.objects.bulk_create(
+                Comment(author=users[i % 10], post=posts[i], content=f"comment {i}") for i in range(rows)
+            )
+            Notification.objects.bulk_create(
+                Notification(recipient=users[0], sender=users[i % 10], notification_type="like",
+                             post=posts[i] if i % 4 else None, message=f"u{i} liked your post")
+                for i in range(rows)
+            )
+            cases = [
+                (UserSerializer, User.objects.filter(username__startswith=f"bench_{tag}_")),
+                (PostSerializer, Post.objects.filter(author__in=users)),
+                (CommentSerializer, Comment.objects.filter(author__in=users)),
+                (NotificationSerializer, Notification.objects.filter(recipient=users[0])),
+            ]
+            for serializer_class, qs in cases:
+                select, prefetch, _ = query_plan(serializer_class)
+                instances = list(qs.select_related(*select).prefetch_related(*prefetch).order_by("id"))
+                self.compare(serializer_class, instances, options["iterations"])
+        finally:
+            User.objects.filter(username__startswith=f"bench_{tag}_").delete()
+
+    def compare(self, serializer_class, instances, iterations):
+        render = FastJSONRenderer().render
+        results = {}
+        for label, stock in (("ModelSerializer", True), ("FieldPlanMixin", False)):
+            with ExitStack() as stack:
+                # measure serialization alone: no fragment cache, no shard lookups
+                stack.enter_context(mock.patch.object(fragments, "fetch", lambda key, build: dict(build())))
+                stack.enter_context(mock.patch.object(fragments, "prefetch", lambda keys: None))
+                stack.enter_context(mock.patch.object(social_serializers, "pending_post_counts", lambda ids: {}))
+                if stock:
+                    stack.enter_context(mock.patch.object(
+                        FieldPlanMixin, "to_representation", serializers.ModelSerializer.to_representation))
+                out = render(serializer_class(instances, many=True).data)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    serializer_class(instances, many=True).data
+                elapsed = time.perf_counter() - start
+            results[label] = (out, elapsed / (iterations * len(instances)) * 1e6)
+        (stock_out, stock_us), (lean_out, lean_us) = results.values()
+        name = serializer_class.__name__
+        if stock_out != lean_out:
+            raise CommandError(f"{name}: FieldPlanMixin output differs from ModelSerializer")
+        self.stdout.write(f"{name:>24}: identical ({len(lean_out)} bytes), "
+                          f"{stock_us:6.1f} -> {lean_us:6.1f} us/row ({stock_us / lean_us:.1f}x)")
@@ -0,0 +1,64 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from social.models import Comment, Follow, Notification, Post, TimelineEntry
+
+# Plan lines that mean "read the whole table": PostgreSQL reports Seq Scan,
+# SQLite reports SCAN <table> without an index.
+SEQ_SCAN_RE = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"SCAN (\w+)\b(?! USING)"),
+}
+
+
+def hot_queries(user_id, post_id, email):
+    """The queries behind feeds, inboxes, threads, follower lists and login."""
+    newest = ("-created_at", "-id")
+    return [
+        ("home timeline", TimelineEntry.objects.filter(owner_id=user_id)
+            .order_by("-created_at", "-post_id").values_list("created_at", "post_id")[:21]),
+        ("post list", Post.objects.filter(is_active=True).order_by(*newest)[:21]),
+        ("trending posts", Post.objects.filter(is_active=True).order_by("-trending_score", "-id")[:21]),
+        ("author posts", Post.objects.filter(author_id=user_id, is_active=True).order_by(*newest)[:21]),
+        ("notification inbox", Notification.objects.filter(recipient_id=user_id).order_by(*newest)[:21]),
+        ("unread notifications", Notification.objects.filter(recipient_id=user_id, is_read=False).values("id")),
+        ("comment thread", Comment.objects.filter(post_id=post_id, is_active=True).order_by(*newest)[:21]),
+        ("comment list", Comment.objects.filter(is_active=True).order_by(*newest)[:21]),
+        ("followers", Follow.objects.filter(following_id=user_id).order_by(*newest)[:21]),
+        ("following", Follow.objects.filter(follower_id=user_id).order_by(*newest)[:21]),
+        ("user by email", User.objects.filter(email__iexact=email)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot query paths and report sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, default=1, help="User id to plug into per-user queries.")
+        parser.add_argument("--post", type=int, default=1, help="Post id to plug into per-post queries.")
+        parser.add_argument("--email", default="someone@example.com")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan in full.")
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_RE.get(connection.vendor)
+        if pattern is None:
+            self.stderr.write(f"Sequential scan detection is not implemented for {connection.vendor}.")
+        flagged = 0
+        for label, qs in hot_queries(options["user"], options["post"], options["email"]):
+            plan = qs.explain()
+            scans = sorted(set(pattern.findall(plan))) if pattern else []
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"SEQ SCAN  {label}: {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok        {label}"))
+            if scans or options["verbose_plans"]:
+                self.stdout.write("    " + plan.replace("\n", "\n    "))
+        if flagged:
+            self.stdout.write(self.style.WARNING(
+                f"{flagged} hot queries use sequential scans. Small tables may legitimately be "
+                "scanned; run ANALYZE and re-check on production-sized data."
+            ))
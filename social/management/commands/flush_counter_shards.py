@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from social.counters import flush_shards
+
+
+class Command(BaseCommand):
+    help = "Fold sharded like/comment counter deltas into Post rows."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Flushed counters for {flush_shards()} posts.")
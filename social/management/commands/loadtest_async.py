@@ -0,0 +1,45 @@
+import importlib.util
+import os
+import sys
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social.loadtest import Server, run_load, seed_feed
+
+
+class Command(BaseCommand):
+    help = ("Serve the project with uvicorn twice, with the DRF (sync) views and with "
+            "ASYNC_VIEWS=1, and load-test an endpoint at rising client concurrency to show how "
+            "each path scales. Creates and removes its own rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/feed/", help="Endpoint to GET, e.g. /api/notifications/.")
+        parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated client counts.")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds per run.")
+        parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes.")
+        parser.add_argument("--port", type=int, default=8766)
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec("uvicorn") is None:
+            raise CommandError("uvicorn is not installed (pip install uvicorn).")
+        levels = [int(n) for n in options["concurrency"].split(",") if n]
+        tag = uuid.uuid4().hex[:8]
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(seed_feed(tag))}"}
+        command = [sys.executable, "-m", "uvicorn", "backend.asgi:application", "--host", "127.0.0.1",
+                   "--port", str(options["port"]), "--workers", str(options["workers"]),
+                   "--log-level", "warning", "--no-access-log"]
+        try:
+            self.stdout.write(f"{'views':>6} {'clients':>8} {'requests':>9} {'req/s':>8} "
+                              f"{'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+            for label, flag in (("sync", ""), ("async", "1")):
+                env = {**os.environ, "ASYNC_VIEWS": flag}
+                with Server(command, env, options["port"], probe=options["path"]):
+                    for clients in levels:
+                        stats = run_load(options["port"], options["path"], headers, clients, options["duration"])
+                        self.stdout.write(f"{label:>6} {clients:>8} {stats['requests']:>9} {stats['rps']:>8.1f} "
+                                          f"{stats['p50']:>8.1f} {stats['p99']:>8.1f} {stats['errors']:>7}")
+        finally:
+            User.objects.filter(username__startswith=f"bench_{tag}_").delete()
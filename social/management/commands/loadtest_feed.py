@@ -0,0 +1,65 @@
+import importlib.util
+import os
+import sys
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social.loadtest import Server, run_load, seed_feed
+
+# name -> environment for the server under test
+CONFIGS = {
+    "fresh": {"DB_CONN_MAX_AGE": "0", "DB_POOL": ""},
+    "persistent": {"DB_CONN_MAX_AGE": "600", "DB_POOL": ""},
+    "bundled-pool": {"DB_POOL": "bundled"},
+    "psycopg-pool": {"DB_POOL": "psycopg"},
+}
+
+
+class Command(BaseCommand):
+    help = ("Load-test GET /api/feed/ under gunicorn once per database connection setup "
+            "(fresh connections, persistent connections, pools) and report requests/sec and "
+            "latency percentiles. Creates and removes its own rows; point DATABASE_URL at a "
+            "local PostgreSQL for meaningful numbers.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--configs", default="fresh,persistent,bundled-pool,psycopg-pool",
+                            help=f"Comma-separated, from: {', '.join(CONFIGS)}.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Client threads.")
+        parser.add_argument("--duration", type=float, default=15, help="Seconds per config.")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker.")
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        names = [n for n in options["configs"].split(",") if n]
+        unknown = set(names) - set(CONFIGS)
+        if unknown:
+            raise CommandError(f"Unknown configs: {', '.join(sorted(unknown))}")
+        if "psycopg-pool" in names and importlib.util.find_spec("psycopg_pool") is None:
+            self.stderr.write("psycopg_pool is not installed; skipping psycopg-pool.")
+            names.remove("psycopg-pool")
+        if connection.vendor != "postgresql":
+            self.stderr.write(f"Database is {connection.vendor}; DB_POOL only applies to PostgreSQL.")
+
+        tag = uuid.uuid4().hex[:8]
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(seed_feed(tag))}"}
+        try:
+            self.stdout.write(f"{'config':>14} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+            for name in names:
+                with Server(self.server_command(options), {**os.environ, **CONFIGS[name]}, options["port"]):
+                    stats = run_load(options["port"], "/api/feed/", headers,
+                                     options["concurrency"], options["duration"])
+                self.stdout.write(f"{name:>14} {stats['requests']:>9} {stats['rps']:>8.1f} "
+                                  f"{stats['p50']:>8.1f} {stats['p99']:>8.1f} {stats['errors']:>7}")
+        finally:
+            User.objects.filter(username__startswith=f"bench_{tag}_").delete()
+
+    def server_command(self, options):
+        return [sys.executable, "-m", "gunicorn", settings.WSGI_APPLICATION.rsplit(".", 1)[0],
+                "--bind", f"127.0.0.1:{options['port']}", "--workers", str(options["workers"]),
+                "--worker-class", "gthread", "--threads", str(options["threads"]), "--log-level", "warning"]
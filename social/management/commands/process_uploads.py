@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from social.models import UploadedImage
+from social.uploads import pipeline, sweep
+
+
+class Command(BaseCommand):
+    help = ("Make thumbnails for uploads the background pipeline never finished (pending for "
+            "longer than --min-age, e.g. after a restart) and, with --retry-failed, failed ones. "
+            "Then delete uploads still pending or failed after --sweep-hours that no post uses.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-age", type=int, default=300, help="Seconds an upload must have been pending.")
+        parser.add_argument("--retry-failed", action="store_true")
+        parser.add_argument("--batch", type=int, default=50)
+        parser.add_argument("--sweep-hours", type=float, default=getattr(settings, "UPLOAD_SWEEP_HOURS", 24),
+                            help="Age after which unfinished uploads are deleted (0 = never).")
+
+    def handle(self, *args, **options):
+        statuses = [UploadedImage.PENDING] + ([UploadedImage.FAILED] if options["retry_failed"] else [])
+        cutoff = timezone.now() - timedelta(seconds=options["min_age"])
+        ids = list(UploadedImage.objects.filter(status__in=statuses, created_at__lt=cutoff)
+                   .order_by("created_at").values_list("id", flat=True))
+        for start in range(0, len(ids), options["batch"]):
+            pipeline.process([(image_id, None) for image_id in ids[start:start + options["batch"]]], pool=None)
+        ready = UploadedImage.objects.filter(id__in=ids, status=UploadedImage.READY).count()
+        self.stdout.write(self.style.SUCCESS(f"{ready} of {len(ids)} uploads now have thumbnails."))
+        if options["sweep_hours"] > 0:
+            swept = sweep(timedelta(hours=options["sweep_hours"]))
+            self.stdout.write(f"Deleted {swept} uploads left unfinished for over {options['sweep_hours']:g}h.")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from social.search import PostgresSearch, get_backend
+
+POSTGRES_INDEXES = ["post_content_search_idx", "auth_user_name_search_idx", "profile_bio_search_idx"]
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the search indexes: REINDEX + ANALYZE on PostgreSQL. The Python backend's "
+            "index lives in each server process, so there is nothing to rebuild from here.")
+
+    def handle(self, *args, **options):
+        if not isinstance(get_backend(), PostgresSearch):
+            self.stdout.write(self.style.WARNING(
+                "Python search backend: each server process builds its index on first search and "
+                "keeps it current itself; restart the servers to rebuild. Nothing done."))
+            return
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            for name in POSTGRES_INDEXES:
+                cursor.execute(f"REINDEX INDEX CONCURRENTLY {connection.ops.quote_name(name)}")
+                self.stdout.write(f"reindexed {name}")
+            cursor.execute("ANALYZE social_post, social_profile, auth_user")
+        self.stdout.write(f"done in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from social.models import Follow, TimelineEntry
+from social.timeline import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home timelines from posts and follows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only rebuild these user ids (repeatable).")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["user_ids"]:
+            users = users.filter(id__in=options["user_ids"])
+        rebuilt = 0
+        for user_id in users.values_list("id", flat=True).iterator():
+            TimelineEntry.objects.filter(owner_id=user_id).delete()
+            backfill(user_id, user_id)
+            for author_id in Follow.objects.filter(follower_id=user_id).values_list("following_id", flat=True):
+                backfill(user_id, author_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timelines."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from social.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized follower/post/like/comment counters and fix drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows drifted.")
+
+    def handle(self, *args, **options):
+        verb = "drifted" if options["dry_run"] else "fixed"
+        for label, rows in reconcile(dry_run=options["dry_run"]).items():
+            self.stdout.write(f"{label}: {rows} {verb}")
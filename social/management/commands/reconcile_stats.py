@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from social.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recount the admin stats rollup from the raw tables (last 48 hours by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=48, help="How many recent hours to recount.")
+        parser.add_argument("--all", action="store_true", help="Rebuild every bucket, e.g. after deploying.")
+
+    def handle(self, *args, **options):
+        since = None if options["all"] else timezone.now() - timedelta(hours=options["hours"])
+        for metric, buckets in rebuild(since).items():
+            self.stdout.write(f"{metric}: {buckets} buckets")
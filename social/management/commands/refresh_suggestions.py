@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.suggestions import refresh, refresh_stale
+
+
+class Command(BaseCommand):
+    help = ("Recompute \"who to follow\" suggestions: rows marked stale by follow changes, "
+            "or every user with --all. --loop keeps running as a background worker.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild every user from one full graph load.")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only these user ids (repeatable).")
+        parser.add_argument("--batch", type=int, default=1000, help="Stale rows per pass.")
+        parser.add_argument("--loop", type=float, metavar="SECONDS",
+                            help="Keep draining stale rows, sleeping this long when idle.")
+
+    def handle(self, *args, **options):
+        if options["all"] or options["user_ids"]:
+            written = refresh(options["user_ids"])
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {written} users."))
+            return
+        while True:
+            written = refresh_stale(options["batch"])
+            if written:
+                self.stdout.write(f"Refreshed {written} stale users.")
+            if options["loop"] is None:
+                return
+            if written < options["batch"]:
+                time.sleep(options["loop"])
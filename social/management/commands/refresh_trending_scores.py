@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from social.trending import refresh
+
+
+class Command(BaseCommand):
+    help = ("Recompute Post.trending_score from scratch. Scores are kept current incrementally; "
+            "run this after reconcile_counters or a change to TRENDING_TENFOLD_SECONDS.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{refresh()} posts rescored")
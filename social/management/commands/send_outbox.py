@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.outbox import send_due
+
+
+class Command(BaseCommand):
+    help = ("Send due queued email (new messages and retries) in batches over one SMTP "
+            "connection. --loop keeps running as a worker, e.g. with EMAIL_OUTBOX_PIPELINE=off.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=100, help="Messages per connection.")
+        parser.add_argument("--loop", type=float, metavar="SECONDS",
+                            help="Keep sending, sleeping this long when nothing is due.")
+
+    def handle(self, *args, **options):
+        while True:
+            claimed, sent = send_due(options["batch"])
+            if claimed:
+                self.stdout.write(f"Sent {sent} of {claimed} emails.")
+            if claimed < options["batch"]:
+                if options["loop"] is None:
+                    return
+                time.sleep(options["loop"])
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+# auth.User belongs to another app, so its index is created directly instead
+# of through model state. Upper() matches the SQL Django emits for iexact.
+USER_EMAIL_INDEX = models.Index(Upper("email"), name="auth_user_email_upper_idx")
+
+
+def add_user_email_index(apps, schema_editor):
+    if schema_editor.connection.features.supports_expression_indexes:
+        schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), USER_EMAIL_INDEX)
+
+
+def remove_user_email_index(apps, schema_editor):
+    if schema_editor.connection.features.supports_expression_indexes:
+        schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), USER_EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0002_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['post', '-created_at', '-id'], name='comment_post_active_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='comment_active_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', '-created_at', '-id'], name='follow_following_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-created_at', '-id'], name='follow_follower_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='notif_recipient_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient'], name='notif_recipient_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='post_active_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['author', '-created_at', '-id'], name='post_author_active_recent_idx'),
+        ),
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
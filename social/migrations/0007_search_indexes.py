@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Q
+
+# Full-text search indexes only exist on PostgreSQL; other databases use the
+# in-process index in social/search.py. The expressions mirror the
+# SearchVectors in social/search.py so the planner can match them.
+
+
+def search_indexes():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        (settings.AUTH_USER_MODEL, GinIndex(
+            SearchVector("username", "first_name", "last_name", config="simple"),
+            name="auth_user_name_search_idx")),
+        ("social.Profile", GinIndex(SearchVector("bio", config="english"), name="profile_bio_search_idx")),
+        ("social.Post", GinIndex(SearchVector("content", config="english"), condition=Q(is_active=True),
+                                 name="post_content_search_idx")),
+    ]
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model, index in search_indexes():
+            schema_editor.add_index(apps.get_model(model), index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model, index in search_indexes():
+            schema_editor.remove_index(apps.get_model(model), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0006_statbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
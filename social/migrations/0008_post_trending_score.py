@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:29
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def score_existing_posts(apps, schema_editor):
+    # same formula as social.trending.score, frozen here
+    Post = apps.get_model("social", "Post")
+    seconds_per_e = getattr(settings, "TRENDING_TENFOLD_SECONDS", 45000) / math.log(10)
+    batch = []
+    for post in Post.objects.only("like_count", "comment_count", "created_at").iterator(chunk_size=2000):
+        engagement = post.like_count + 2 * post.comment_count
+        post.trending_score = math.log1p(engagement) + post.created_at.timestamp() / seconds_per_e
+        batch.append(post)
+        if len(batch) >= 2000:
+            Post.objects.bulk_update(batch, ["trending_score"])
+            batch = []
+    Post.objects.bulk_update(batch, ["trending_score"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0007_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(score_existing_posts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-trending_score', '-id'], name='post_active_trending_idx'),
+        ),
+    ]
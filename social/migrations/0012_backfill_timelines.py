@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import migrations
+
+# Each user's own recent posts plus the recent posts of every fanned-out author
+# they follow, as rebuild_timelines would write them, in one INSERT ... SELECT.
+BACKFILL_SQL = """
+INSERT INTO {entry} (owner_id, post_id, author_id, created_at)
+SELECT pairs.owner_id, recent.id, recent.author_id, recent.created_at
+FROM (
+    SELECT id AS owner_id, id AS author_id FROM {user}
+    UNION
+    SELECT f.follower_id, f.following_id FROM {follow} f
+    WHERE f.follower_id <> f.following_id AND NOT EXISTS (
+        SELECT 1 FROM {profile} p WHERE p.user_id = f.following_id AND p.followers_count >= %s)
+) pairs
+JOIN (
+    SELECT id, author_id, created_at FROM (
+        SELECT id, author_id, created_at,
+               ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY created_at DESC, id DESC) AS n
+        FROM {post} WHERE is_active = %s
+    ) ranked
+    WHERE n <= %s
+) recent ON recent.author_id = pairs.author_id
+WHERE NOT EXISTS (SELECT 1 FROM {entry} t WHERE t.owner_id = pairs.owner_id AND t.post_id = recent.id)
+"""
+
+
+def backfill_timelines(apps, schema_editor):
+    """Fill TimelineEntry for existing users with set-based SQL, so the cost
+    does not grow with one query per user and followed author."""
+    connection = schema_editor.connection
+    tables = {name: connection.ops.quote_name(apps.get_model(app, model)._meta.db_table)
+              for name, app, model in (("entry", "social", "TimelineEntry"), ("user", "auth", "User"),
+                                       ("follow", "social", "Follow"), ("profile", "social", "Profile"),
+                                       ("post", "social", "Post"))}
+    params = [getattr(settings, "TIMELINE_FANOUT_LIMIT", 10000), True, getattr(settings, "TIMELINE_BACKFILL_SIZE", 200)]
+    with connection.cursor() as cursor:
+        cursor.execute(BACKFILL_SQL.format(**tables), params)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0011_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+def seed_actor_ids(apps, schema_editor):
+    # unread rows can still be merged into; their latest sender is the one id we know
+    Notification = apps.get_model("social", "Notification")
+    rows = list(Notification.objects.filter(is_read=False).only("id", "sender_id"))
+    for n in rows:
+        n.actor_ids = [n.sender_id]
+    Notification.objects.bulk_update(rows, ["actor_ids"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0012_backfill_timelines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(seed_actor_ids, migrations.RunPython.noop),
+    ]
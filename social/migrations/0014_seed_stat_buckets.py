@@ -0,0 +1,36 @@
+from datetime import timezone as dt_timezone
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+# metric -> (model, creation timestamp field), as in social.stats.METRICS
+METRICS = {
+    "signups": ("auth.User", "date_joined"),
+    "posts": ("social.Post", "created_at"),
+    "comments": ("social.Comment", "created_at"),
+    "likes": ("social.Like", "created_at"),
+    "follows": ("social.Follow", "created_at"),
+}
+
+
+def seed_stat_buckets(apps, schema_editor):
+    """Count existing rows into the rollup, like `reconcile_stats --all`."""
+    StatBucket = apps.get_model("social", "StatBucket")
+    StatBucket.objects.all().delete()
+    for metric, (label, field) in METRICS.items():
+        rows = (apps.get_model(label).objects.order_by().annotate(h=TruncHour(field, tzinfo=dt_timezone.utc))
+                .values("h").annotate(n=Count("*")))
+        StatBucket.objects.bulk_create(
+            (StatBucket(metric=metric, hour=row["h"], slot=0, count=row["n"]) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0013_notification_actor_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_stat_buckets, migrations.RunPython.noop),
+    ]
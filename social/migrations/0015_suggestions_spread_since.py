@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0014_seed_stat_buckets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='followsuggestions',
+            name='spread_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='followsuggestions',
+            index=models.Index(condition=models.Q(('spread_since__isnull', False)), fields=['spread_since'], name='suggestions_spread_idx'),
+        ),
+    ]
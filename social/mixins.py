@@ -0,0 +1,210 @@
+import asyncio
+from contextlib import contextmanager
+from functools import cached_property, lru_cache, wraps
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601, SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(budget, label):
+    """Fail when the wrapped block runs more than `budget` queries.
+
+    Only active with settings.ENFORCE_QUERY_BUDGETS (meant for tests), so the
+    production request path never pays for query capture.
+    """
+    if budget is None or not getattr(settings, "ENFORCE_QUERY_BUDGETS", False):
+        yield
+        return
+    executed = []
+
+    def record(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        yield
+    if len(executed) > budget:
+        listing = "\n".join(executed)
+        raise QueryBudgetExceeded(f"{label} ran {len(executed)} queries (budget {budget}):\n{listing}")
+
+
+def with_query_budget(budget):
+    """Decorator form of `query_budget` for function-based views."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            with query_budget(budget, view.__name__):
+                return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def query_plan(serializer_class, prefix=""):
+    """Work out what a ModelSerializer touches on its model.
+
+    Returns (select_related, prefetch_related, only) path tuples. Nested
+    single-object serializers become select_related joins, nested `many=True`
+    serializers become prefetches. `only` is None when a field can't be mapped
+    to a model column (e.g. SerializerMethodField), since deferring would then
+    be unsafe. Serializers can add paths with Meta.select_related and
+    Meta.prefetch_related.
+    """
+    meta = serializer_class.Meta
+    model = meta.model
+    select = [prefix + p for p in getattr(meta, "select_related", ())]
+    prefetch = [prefix + p for p in getattr(meta, "prefetch_related", ())]
+    only = []
+    declared = serializer_class._declared_fields
+    for name in meta.fields:
+        field = declared.get(name)
+        source = getattr(field, "source", None) or name
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(prefix + source)
+            continue
+        if isinstance(field, serializers.ModelSerializer):
+            select.append(prefix + source)
+            if only is not None:
+                only.append(prefix + source)
+            sub_select, sub_prefetch, sub_only = query_plan(type(field), f"{prefix}{source}__")
+            select += sub_select
+            prefetch += sub_prefetch
+            only = None if only is None or sub_only is None else only + list(sub_only)
+            continue
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not model_field.concrete:
+            only = None
+        elif only is not None:
+            only.append(prefix + source)
+    return tuple(select), tuple(prefetch), (tuple(only) if only is not None else None)
+
+
+async def gather_queries(*calls):
+    """Run independent blocking ORM calls at once and return their results.
+
+    Django's async ORM sends every query through one shared thread, so
+    asyncio.gather over aget()/acount() still runs them one after another.
+    Each call here gets its own worker thread and therefore its own
+    connection. Afterwards that connection is closed (or returned to the
+    pool) only once it has outlived CONN_MAX_AGE, which is why settings
+    default DB_CONN_MAX_AGE to 0 under ASGI.
+    """
+    def own_connection(call):
+        def run():
+            try:
+                return call()
+            finally:
+                close_old_connections()
+        return sync_to_async(run, thread_sensitive=False)()
+
+    return await asyncio.gather(*(own_connection(call) for call in calls))
+
+
+class OptimizedQuerysetMixin:
+    """Apply the serializer's query plan to the viewset queryset.
+
+    Related objects are joined or prefetched for every action; list pages also
+    defer unused columns with only(), keeping the paginator's ordering field. `query_budget` caps the queries one GET
+    may run when settings.ENFORCE_QUERY_BUDGETS is on.
+    """
+    query_budget = None
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        select, prefetch, only = query_plan(self.get_serializer_class())
+        if select:
+            qs = qs.select_related(*select)
+        if prefetch:
+            qs = qs.prefetch_related(*prefetch)
+        if only and self.action == "list":
+            # the paginator reads its ordering column off the last row for the cursor
+            ordering = getattr(self.paginator, "ordering_field", None)
+            qs = qs.only(*only, *([ordering] if ordering else []))
+        return qs
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != "GET":
+            return super().dispatch(request, *args, **kwargs)
+        with query_budget(self.query_budget, type(self).__name__):
+            return super().dispatch(request, *args, **kwargs)
+
+
+# Field types whose to_representation returns a model column's value unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.EmailField, serializers.URLField, serializers.SlugField,
+    serializers.IntegerField, serializers.BooleanField, serializers.ChoiceField,
+)
+
+
+def _iso_datetime(field):
+    def render(value):
+        if isinstance(value, str) or value.tzinfo is None:
+            return field.to_representation(value)
+        text = value.astimezone(timezone.get_current_timezone()).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return render
+
+
+class FieldPlanMixin:
+    """Serialize reads through a field plan compiled once per serializer.
+
+    Plain columns are read with attrgetter and returned as-is, primary-key
+    relations read the `<field>_id` column, ISO datetimes skip DRF's format
+    lookups. Everything else (nested serializers, method fields, custom
+    formats) still goes through the field's own get_attribute and
+    to_representation, so the output is identical to ModelSerializer's.
+    """
+
+    @cached_property
+    def _field_plan(self):
+        model = self.Meta.model
+        plan = []
+        for field in self._readable_fields:
+            source = field.source_attrs[0] if len(field.source_attrs) == 1 else None
+            try:
+                model_field = model._meta.get_field(source) if source else None
+            except FieldDoesNotExist:
+                model_field = None
+            concrete = model_field is not None and model_field.concrete
+            kind = type(field)
+            if concrete and not model_field.is_relation and kind in PASSTHROUGH_FIELDS:
+                plan.append((field.field_name, attrgetter(source), None))
+            elif concrete and not model_field.is_relation and kind is serializers.DateTimeField \
+                    and getattr(field, "format", api_settings.DATETIME_FORMAT).lower() == ISO_8601 \
+                    and not hasattr(field, "timezone"):
+                plan.append((field.field_name, attrgetter(source), _iso_datetime(field)))
+            elif concrete and model_field.many_to_one and kind is serializers.PrimaryKeyRelatedField \
+                    and field.pk_field is None:
+                plan.append((field.field_name, attrgetter(model_field.attname), None))
+            else:
+                plan.append((field.field_name, field.get_attribute, field.to_representation))
+        return plan
+
+    def to_representation(self, instance):
+        ret = {}
+        for name, get, render in self._field_plan:
+            try:
+                value = get(instance)
+            except SkipField:
+                continue
+            if render is not None and value is not None:
+                # mirrors ModelSerializer: None is never passed to a field
+                value = None if isinstance(value, PKOnlyObject) and value.pk is None else render(value)
+            ret[name] = value
+        return ret
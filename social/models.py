@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Profile(models.Model):
     VISIBILITY_CHOICES = (
@@ -34,13 +35,44 @@ class Post(models.Model):
     is_active = models.BooleanField(default=True)
     like_count = models.PositiveIntegerField(default=0)
     comment_count = models.PositiveIntegerField(default=0)
+    trending_score = models.FloatField(default=0)  # see social/trending.py
+    image_variants = models.JSONField(default=dict, blank=True)  # {"160": url, ...}, see social/uploads.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], condition=models.Q(is_active=True),
+                         name="post_active_recent_idx"),
+            models.Index(fields=["-trending_score", "-id"], condition=models.Q(is_active=True),
+                         name="post_active_trending_idx"),
+            models.Index(fields=["author", "-created_at", "-id"], condition=models.Q(is_active=True),
+                         name="post_author_active_recent_idx"),
+        ]
+
     def __str__(self):
         return f"Post {self.id} by {self.author.username}"
 
 
+class PostCounterShard(models.Model):
+    """One of N write slots for a post's like/comment counters.
+
+    Only used when settings.POST_COUNTER_SHARDS > 0: writers bump a random
+    slot instead of the Post row, and `flush_counter_shards` periodically
+    folds the deltas back into Post.like_count / comment_count.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="counter_shards")
+    slot = models.PositiveSmallIntegerField()
+    like_delta = models.IntegerField(default=0)
+    comment_delta = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("post", "slot")
+
+    def __str__(self):
+        return f"post {self.post_id} slot {self.slot}"
+
+
 class Follow(models.Model):
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name="following_set")
     following = models.ForeignKey(User, on_delete=models.CASCADE, related_name="followers_set")
@@ -48,6 +80,10 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ("follower", "following")
+        indexes = [
+            models.Index(fields=["following", "-created_at", "-id"], name="follow_following_recent_idx"),
+            models.Index(fields=["follower", "-created_at", "-id"], name="follow_follower_recent_idx"),
+        ]
 
     def __str__(self):
         return f"{self.follower.username} -> {self.following.username}"
@@ -72,6 +108,14 @@ class Comment(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "-created_at", "-id"], condition=models.Q(is_active=True),
+                         name="comment_post_active_recent_idx"),
+            models.Index(fields=["-created_at", "-id"], condition=models.Q(is_active=True),
+                         name="comment_active_recent_idx"),
+        ]
+
     def __str__(self):
         return f"Comment {self.id} by {self.author.username}"
 
@@ -83,8 +127,136 @@ class Notification(models.Model):
     notification_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     post = models.ForeignKey(Post, null=True, blank=True, on_delete=models.CASCADE)
     message = models.CharField(max_length=200)
+    actor_count = models.PositiveIntegerField(default=1)  # senders folded into this row
+    actor_ids = models.JSONField(default=list, blank=True)  # their distinct ids, see notifications.write_batch
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "-created_at", "-id"], name="notif_recipient_recent_idx"),
+            models.Index(fields=["recipient"], condition=models.Q(is_read=False),
+                         name="notif_recipient_unread_idx"),
+        ]
+
     def __str__(self):
         return f"Notif to {self.recipient.username}: {self.notification_type}"
+
+
+class TimelineEntry(models.Model):
+    """Materialized home-timeline row: `post` is visible in `owner`'s feed.
+
+    Written on post creation (fan-out-on-write) and on follow (backfill);
+    `created_at` mirrors the post's timestamp so the feed is a key range
+    scan over (owner, created_at, post).
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("owner", "post")
+        indexes = [
+            models.Index(fields=["owner", "-created_at", "-post"], name="timeline_owner_recent_idx"),
+            models.Index(fields=["owner", "author"], name="timeline_owner_author_idx"),
+        ]
+
+    def __str__(self):
+        return f"timeline:{self.owner_id} <- post {self.post_id}"
+
+
+class StatBucket(models.Model):
+    """Rows of one metric (posts, likes, ...) created in a given UTC hour.
+
+    Kept up to date from signals and rebuilt by `reconcile_stats`, so the
+    admin dashboard sums a small rollup instead of counting raw tables.
+    Writers spread over STATS_SHARDS slots to avoid a single hot row.
+    """
+    metric = models.CharField(max_length=20)
+    hour = models.DateTimeField()
+    slot = models.PositiveSmallIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("metric", "hour", "slot")
+
+    def __str__(self):
+        return f"{self.metric} @ {self.hour:%Y-%m-%d %H}:00 slot {self.slot}: {self.count}"
+
+
+class FollowSuggestions(models.Model):
+    """A user's precomputed "who to follow" list (see social/suggestions.py).
+
+    `items` holds [user_id, score, mutual, shared] best first. Follow signals
+    set `stale_since` on both ends and `spread_since` on the follower;
+    `refresh_suggestions` marks the follower's neighbours stale from
+    `spread_since`, then recomputes just the stale rows.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="follow_suggestions")
+    items = models.JSONField(default=list)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    stale_since = models.DateTimeField(null=True, blank=True)
+    spread_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["stale_since"], condition=models.Q(stale_since__isnull=False),
+                         name="suggestions_stale_idx"),
+            models.Index(fields=["spread_since"], condition=models.Q(spread_since__isnull=False),
+                         name="suggestions_spread_idx"),
+        ]
+
+    def __str__(self):
+        return f"suggestions for {self.user_id} ({len(self.items)})"
+
+
+class UploadedImage(models.Model):
+    """An image uploaded through /api/uploads/images/ and its thumbnails.
+
+    `variants` maps a longest-side size in pixels (as a string) to the URL of
+    that thumbnail; it is copied onto every Post whose image_url is `url`.
+    """
+    PENDING, READY, FAILED = "pending", "ready", "failed"
+    STATUS_CHOICES = ((PENDING, "Pending"), (READY, "Ready"), (FAILED, "Failed"))
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="uploaded_images")
+    path = models.CharField(max_length=300)
+    url = models.URLField(max_length=500, unique=True)
+    content_type = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    variants = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], condition=~models.Q(status="ready"), name="upload_unfinished_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.url} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """A queued email, sent out of band by social/outbox.py."""
+    QUEUED, SENT, FAILED = "queued", "sent", "failed"
+    STATUS_CHOICES = ((QUEUED, "Queued"), (SENT, "Sent"), (FAILED, "Failed"))
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at"], condition=models.Q(status="queued"), name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,229 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import realtime
+from .models import Notification, Post
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple("Event", "recipient_id sender_id sender_name notification_type post_id at")
+
+VERBS = {
+    "follow": "started following you",
+    "like": "liked your post",
+    "comment": "commented on your post",
+}
+
+
+def build_message(sender_name, notification_type, actor_count):
+    verb = VERBS[notification_type]
+    if actor_count <= 1:
+        return f"{sender_name} {verb}"
+    others = actor_count - 1
+    return f"{sender_name} and {others} other{'s' if others > 1 else ''} {verb}"
+
+
+UNREAD_TTL = 3600
+
+
+def unread_key(user_id):
+    return f"notif:unread:{user_id}"
+
+
+def unread_count(user_id):
+    """Unread notifications for a user, served from cache after the first count.
+
+    Without a SHARED_CACHE every call counts (an index-only scan on
+    notif_recipient_unread_idx): a per-process copy would miss reads and
+    writes handled by other workers.
+    """
+    if not getattr(settings, "SHARED_CACHE", False):
+        return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+    key = unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_TTL)
+    return count
+
+
+def bump_unread(user_id, delta):
+    """Adjust a cached unread count; an uncached count is left to the next read."""
+    if not getattr(settings, "SHARED_CACHE", False):
+        return
+    key = unread_key(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+
+
+def reset_unread(user_id, count=None):
+    """Store a known unread count, or drop the cached one when count is None."""
+    if not getattr(settings, "SHARED_CACHE", False):
+        return
+    if count is None:
+        cache.delete(unread_key(user_id))
+    else:
+        cache.set(unread_key(user_id), count, UNREAD_TTL)
+
+
+def write_batch(events):
+    """Persist a batch of events, coalescing per (recipient, post, type).
+
+    Events for the same key are folded together, and folded into an unread
+    notification for that key created within NOTIFICATION_COALESCE_WINDOW
+    seconds ("A and 37 others liked your post"). actor_count counts distinct
+    senders, so repeat events from one sender change nothing. A merged row
+    keeps its created_at, and with it its place in paginated inboxes.
+    Everything else becomes new rows in one bulk_create. Returns the newly
+    created notifications.
+    """
+    live_posts = set(Post.objects.filter(
+        id__in={e.post_id for e in events if e.post_id}).values_list("id", flat=True))
+    groups = {}
+    for e in events:
+        if e.post_id and e.post_id not in live_posts:
+            continue
+        key = (e.recipient_id, e.post_id, e.notification_type)
+        latest, senders = groups.get(key, (e, {}))
+        senders[e.sender_id] = None  # distinct, in arrival order
+        groups[key] = (e if e.at >= latest.at else latest, senders)
+    if not groups:
+        return []
+
+    window = timezone.now() - timedelta(seconds=getattr(settings, "NOTIFICATION_COALESCE_WINDOW", 3600))
+    match = Q()
+    for recipient_id, post_id, notification_type in groups:
+        match |= Q(recipient_id=recipient_id, post_id=post_id, notification_type=notification_type)
+    existing = {}
+    for n in Notification.objects.filter(match, is_read=False, created_at__gte=window).order_by("created_at"):
+        existing[(n.recipient_id, n.post_id, n.notification_type)] = n
+
+    updated, created = [], []
+    for key, (latest, senders) in groups.items():
+        n = existing.get(key)
+        if n is None:
+            n = Notification(recipient_id=latest.recipient_id, post_id=latest.post_id,
+                             notification_type=latest.notification_type, actor_count=0, actor_ids=[])
+            created.append(n)
+        new = [sender_id for sender_id in senders if sender_id not in n.actor_ids]
+        if not new:
+            continue  # e.g. an unlike and like again: nothing to tell the recipient
+        if n.pk is not None:
+            updated.append(n)
+        n.sender_id = latest.sender_id
+        n.actor_ids += new
+        n.actor_count += len(new)
+        n.message = build_message(latest.sender_name, latest.notification_type, n.actor_count)
+
+    with transaction.atomic():
+        if updated:
+            Notification.objects.bulk_update(updated, ["sender", "actor_ids", "actor_count", "message"])
+        if created:
+            created = Notification.objects.bulk_create(created)
+    for n in created:
+        bump_unread(n.recipient_id, 1)
+    realtime.publish((n.recipient_id, "notification", {
+        "id": n.id, "notification_type": n.notification_type, "sender": n.sender_id,
+        "post": n.post_id, "message": n.message, "actor_count": n.actor_count,
+        "created_at": n.created_at,
+    }) for n in updated + created)
+    return created
+
+
+class NotificationPipeline:
+    """Moves notification writes off the request path.
+
+    Signals `submit()` events once the triggering transaction commits. In
+    "thread" mode a daemon worker drains the queue in batches (up to
+    NOTIFICATION_BATCH_SIZE events, waiting at most NOTIFICATION_BATCH_WAIT
+    seconds to fill one) and writes them with `write_batch`. In "sync" mode
+    events are written immediately, which suits tests and serverless hosts
+    that freeze background threads.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+
+    @property
+    def mode(self):
+        return getattr(settings, "NOTIFICATION_PIPELINE", "thread")
+
+    def submit(self, event):
+        if self.mode == "sync":
+            write_batch([event])
+            return
+        self.queue.put(event)
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name="notification-pipeline", daemon=True)
+                self.worker.start()
+
+    def _take_batch(self, block):
+        size = getattr(settings, "NOTIFICATION_BATCH_SIZE", 500)
+        wait = getattr(settings, "NOTIFICATION_BATCH_WAIT", 0.5)
+        try:
+            batch = [self.queue.get(block=block)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + wait
+        while len(batch) < size:
+            remaining = deadline - time.monotonic() if block else 0
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            write_batch(batch)
+        except Exception:
+            logger.exception("Dropped a batch of %d notifications", len(batch))
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(block=True)
+            close_old_connections()
+            self._write(batch)
+
+    def flush(self):
+        """Write everything queued so far in the calling thread."""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+
+pipeline = NotificationPipeline()
+atexit.register(pipeline.flush)
+
+
+def notify(recipient_id, sender, notification_type, post_id=None):
+    """Queue a notification once the current transaction commits."""
+    event = Event(recipient_id, sender.id, sender.username, notification_type, post_id, timezone.now())
+    transaction.on_commit(lambda: pipeline.submit(event))
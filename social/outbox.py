@@ -0,0 +1,131 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)  # how long a claimed message is hidden from other senders
+
+
+def retry_delay(attempts):
+    """Seconds before the next try: EMAIL_OUTBOX_RETRY_DELAY, doubling per failed attempt, capped at an hour."""
+    return min(getattr(settings, "EMAIL_OUTBOX_RETRY_DELAY", 60) * 2 ** (attempts - 1), 3600)
+
+
+def claim(limit):
+    """Due queued messages, leased so concurrent senders skip them."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(OutboundEmail.objects.select_for_update(skip_locked=True)
+                     .filter(status=OutboundEmail.QUEUED, next_attempt_at__lte=now)
+                     .order_by("next_attempt_at")[:limit])
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(next_attempt_at=now + LEASE)
+    return batch
+
+
+def deliver(messages):
+    """Send messages over one connection and record each outcome. Returns the number sent."""
+    if not messages:
+        return 0
+    max_attempts = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    connection = get_connection()
+    sent, failed = [], []
+    try:
+        for m in messages:
+            try:
+                connection.open()  # no-op while the connection is up
+                connection.send_messages([EmailMessage(m.subject, m.body, m.from_email, m.to)])
+                sent.append(m.pk)
+            except Exception as exc:
+                m.attempts += 1
+                m.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+                if m.attempts >= max_attempts:
+                    m.status = OutboundEmail.FAILED
+                    logger.error("Giving up on email %s to %s: %s", m.pk, m.to, m.last_error)
+                else:
+                    m.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(m.attempts))
+                failed.append(m)
+                connection.close()  # the next message reconnects
+    finally:
+        connection.close()
+    if sent:
+        OutboundEmail.objects.filter(pk__in=sent).update(status=OutboundEmail.SENT, sent_at=timezone.now())
+    if failed:
+        OutboundEmail.objects.bulk_update(failed, ["attempts", "last_error", "status", "next_attempt_at"])
+    return len(sent)
+
+
+def send_due(limit=None):
+    """Claim and send one batch of due messages. Returns (claimed, sent)."""
+    batch = claim(limit or getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 100))
+    return len(batch), deliver(batch)
+
+
+class OutboxSender:
+    """Sends queued email off the request path.
+
+    In "thread" mode a daemon worker wakes when a message is queued (and every
+    EMAIL_OUTBOX_POLL_INTERVAL seconds, for retries) and sends due messages in
+    batches over one SMTP connection. "sync" sends inline once the transaction
+    commits, for tests. "off" leaves sending to `manage.py send_outbox --loop`.
+    Messages live in the database, so nothing is lost to a restart.
+    """
+
+    def __init__(self):
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.worker = None
+
+    @property
+    def mode(self):
+        return getattr(settings, "EMAIL_OUTBOX_PIPELINE", "thread")
+
+    def submit(self, message_id):
+        if self.mode == "sync":
+            deliver(list(OutboundEmail.objects.filter(pk=message_id, status=OutboundEmail.QUEUED)))
+        elif self.mode == "thread":
+            self._ensure_worker()
+            self.wake.set()
+
+    def _ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        size = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 100)
+        while True:
+            self.wake.wait(getattr(settings, "EMAIL_OUTBOX_POLL_INTERVAL", 30))
+            self.wake.clear()
+            close_old_connections()
+            try:
+                while send_due(size)[0] == size:
+                    pass
+            except Exception:
+                logger.exception("Email outbox pass failed")
+
+
+sender = OutboxSender()
+
+
+def enqueue(subject, body, to, from_email=None):
+    """Queue an email; it is sent after the current transaction commits.
+    Returns None when there is no one to send it to (e.g. a blank address)."""
+    to = [address for address in to if address]
+    if not to:
+        return None
+    message = OutboundEmail.objects.create(
+        subject=subject, body=body, to=to, from_email=from_email or settings.DEFAULT_FROM_EMAIL)
+    transaction.on_commit(lambda: sender.submit(message.pk))
+    return message
@@ -0,0 +1,116 @@
+import base64
+import math
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pagination on (created_at, id) with an opaque cursor.
+
+    Each page is a range scan that starts strictly after the last row of the
+    previous page, so there is no OFFSET, no COUNT(*), and rows inserted while
+    a client is scrolling never shift or duplicate items between pages.
+
+    Works on any queryset whose model has `created_at` and `id`, and on
+    sequences exposing `seek((value, id))` (see `HomeTimeline`).
+    Async views use `apaginate_queryset`.
+    Subclasses can page on another column by overriding `ordering_field`
+    and the cursor value codec.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    ordering_field = "created_at"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = self._seek(queryset, self.decode_cursor(request))
+        return self._page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset for async views; sequences may provide `afetch(n)`."""
+        self.request = request
+        queryset = self._seek(queryset, self.decode_cursor(request))
+        if hasattr(queryset, "afetch"):
+            rows = await queryset.afetch(self.page_size + 1)
+        else:
+            rows = [row async for row in queryset[:self.page_size + 1]]
+        return self._page(rows)
+
+    def _seek(self, queryset, position):
+        if hasattr(queryset, "seek"):
+            return queryset.seek(position)
+        field = self.ordering_field
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(**{f"{field}__lte": value}).filter(
+                Q(**{f"{field}__lt": value}) | Q(id__lt=pk)
+            )
+        return queryset.order_by(f"-{field}", "-id")
+
+    def _page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.next_position = (getattr(page[-1], self.ordering_field), page[-1].id) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def encode_value(self, value):
+        return value.isoformat()
+
+    def decode_value(self, raw):
+        return datetime.fromisoformat(raw)
+
+    def encode_cursor(self, position):
+        value, pk = position
+        raw = f"{self.encode_value(value)}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+            value, pk = raw.split("|")
+            return self.decode_value(value), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class TrendingPagination(KeysetPagination):
+    """Highest trending_score first (see social/trending.py), same cursor scheme."""
+    ordering_field = "trending_score"
+
+    def encode_value(self, value):
+        return repr(value)
+
+    def decode_value(self, raw):
+        value = float(raw)
+        if not math.isfinite(value):
+            raise ValueError(raw)
+        return value
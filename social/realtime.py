@@ -0,0 +1,274 @@
+import asyncio
+import json
+import secrets
+import threading
+import time
+from collections import deque, namedtuple
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+StreamEvent = namedtuple("StreamEvent", "id type data")
+TICKET_SALT = "social.realtime.stream-ticket"
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+class BaseBroker:
+    """Pub/sub with replay. Subclasses implement `publish` and `subscribe`.
+
+    `subscribe(channel, last_event_id, heartbeat)` is an async iterator that
+    first replays retained events newer than `last_event_id`, then yields new
+    ones as they arrive, and yields None whenever `heartbeat` seconds pass
+    without an event.
+    """
+
+    def publish(self, channel, event_type, data):
+        raise NotImplementedError
+
+    def publish_many(self, items):
+        for channel, event_type, data in items:
+            self.publish(channel, event_type, data)
+
+    def subscribe(self, channel, last_event_id=None, heartbeat=15):
+        raise NotImplementedError
+
+
+class _Channel:
+    def __init__(self, size):
+        self.buffer = deque(maxlen=size)
+        self.subscribers = set()  # (loop, asyncio.Queue)
+        self.idle_since = time.monotonic()
+
+
+class MemoryBroker(BaseBroker):
+    """Single-process broker.
+
+    Events are only kept for channels that have a subscriber, or had one in
+    the last REALTIME_RETENTION seconds, so publishing to millions of offline
+    users costs a dict lookup each. Use RedisBroker when running more than
+    one worker process.
+
+    Event ids are microsecond timestamps rather than a counter, so they keep
+    increasing across restarts and a Last-Event-ID from before one never
+    hides newer events.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.last_id = 0
+        self.buffer_size = getattr(settings, "REALTIME_BUFFER_SIZE", 100)
+        self.retention = getattr(settings, "REALTIME_RETENTION", 300)
+
+    def publish(self, channel, event_type, data):
+        with self.lock:
+            ch = self.channels.get(channel)
+            if ch is None:
+                return
+            self.last_id = max(self.last_id + 1, time.time_ns() // 1000)
+            event = StreamEvent(str(self.last_id), event_type, data)
+            ch.buffer.append(event)
+            subscribers = list(ch.subscribers)
+        for loop, q in subscribers:
+            loop.call_soon_threadsafe(q.put_nowait, event)
+
+    def _sweep(self):
+        cutoff = time.monotonic() - self.retention
+        for name in [n for n, ch in self.channels.items() if not ch.subscribers and ch.idle_since < cutoff]:
+            del self.channels[name]
+
+    async def subscribe(self, channel, last_event_id=None, heartbeat=15):
+        q = asyncio.Queue()
+        sub = (asyncio.get_running_loop(), q)
+        with self.lock:
+            self._sweep()
+            ch = self.channels.setdefault(channel, _Channel(self.buffer_size))
+            ch.subscribers.add(sub)
+            after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+            backlog = [e for e in ch.buffer if after is not None and int(e.id) > after]
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                try:
+                    yield await asyncio.wait_for(q.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self.lock:
+                ch.subscribers.discard(sub)
+                ch.idle_since = time.monotonic()
+
+
+class RedisBroker(BaseBroker):
+    """Multi-process broker on Redis streams (requires the `redis` package).
+
+    Each channel is a capped stream, so stream ids double as event ids and
+    resuming is an XREAD from the client's Last-Event-ID. As in MemoryBroker,
+    events are only written for users with a subscriber now or in the last
+    REALTIME_RETENTION seconds (tracked by a presence key the subscriber
+    keeps refreshing), and a stream expires that long after its last event.
+    """
+
+    def __init__(self):
+        import redis
+        import redis.asyncio
+
+        url = getattr(settings, "REDIS_URL", None) or "redis://localhost:6379/0"
+        self.client = redis.Redis.from_url(url)
+        self.async_client = redis.asyncio.Redis.from_url(url)
+        self.buffer_size = getattr(settings, "REALTIME_BUFFER_SIZE", 100)
+        self.retention = getattr(settings, "REALTIME_RETENTION", 300)
+
+    def _key(self, channel):
+        return f"stream:{channel}"
+
+    def _presence_key(self, channel):
+        return f"stream-presence:{channel}"
+
+    def _fields(self, event_type, data):
+        return {"type": event_type, "data": json.dumps(data, cls=DjangoJSONEncoder)}
+
+    def publish(self, channel, event_type, data):
+        self.publish_many([(channel, event_type, data)])
+
+    def publish_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        channels = list({channel: None for channel, _, _ in items})
+        present = self.client.mget([self._presence_key(c) for c in channels])
+        listening = {c for c, flag in zip(channels, present) if flag is not None}
+        if not listening:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for channel, event_type, data in items:
+            if channel in listening:
+                pipe.xadd(self._key(channel), self._fields(event_type, data),
+                          maxlen=self.buffer_size, approximate=True)
+        for channel in listening:
+            pipe.expire(self._key(channel), self.retention)
+        pipe.execute()
+
+    async def subscribe(self, channel, last_event_id=None, heartbeat=15):
+        key = self._key(channel)
+        cursor = last_event_id or "$"
+        while True:
+            # refreshed every heartbeat at most, so it outlives the connection by REALTIME_RETENTION
+            await self.async_client.set(self._presence_key(channel), 1, ex=int(heartbeat + self.retention))
+            response = await self.async_client.xread({key: cursor}, block=int(heartbeat * 1000), count=100)
+            if not response:
+                yield None
+                continue
+            for event_id, fields in response[0][1]:
+                cursor = event_id.decode()
+                yield StreamEvent(cursor, fields[b"type"].decode(), json.loads(fields[b"data"]))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, "REALTIME_BROKER", "social.realtime.MemoryBroker"))()
+
+
+def publish(items):
+    """Push (user_id, event_type, data) items to the users' streams."""
+    get_broker().publish_many((user_channel(uid), event_type, data) for uid, event_type, data in items)
+
+
+def ticket_ttl():
+    return getattr(settings, "REALTIME_TICKET_TTL", 30)
+
+
+def issue_ticket(user):
+    """A signed ticket for opening one event stream as `user`.
+
+    EventSource can't send an Authorization header, and a JWT in the query
+    string would end up in access logs and browser history; a ticket there
+    expires after REALTIME_TICKET_TTL seconds and is accepted once.
+    """
+    return signing.dumps({"user": user.pk, "nonce": secrets.token_urlsafe(12)}, salt=TICKET_SALT)
+
+
+def redeem_ticket(ticket):
+    """The user id a valid, unused ticket was issued for, or None.
+    Reuse is caught across processes only with a shared cache."""
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_ttl())
+    except signing.BadSignature:
+        return None
+    if not cache.add(f"stream-ticket:{payload['nonce']}", 1, ticket_ttl()):
+        return None
+    return payload["user"]
+
+
+def _stream_user(request):
+    """The user from a ?ticket= (see issue_ticket) or the Authorization header."""
+    ticket = request.GET.get("ticket")
+    if ticket:
+        user_id = redeem_ticket(ticket)
+        return User.objects.filter(pk=user_id).first() if user_id is not None else None
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if not raw:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, TokenError):
+        return None
+
+
+class StreamTicketView(APIView):
+    """POST /api/stream/ticket/: a single-use ticket for /api/stream/?ticket=."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({"ticket": issue_ticket(request.user), "expires_in": ticket_ttl()})
+
+
+def _format(event):
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def event_stream(request):
+    """Server-sent events for the signed-in user's notifications and feed.
+
+    Event types are "notification" and "post". Reconnecting clients send
+    Last-Event-ID (EventSource does this automatically) to receive what they
+    missed. Needs an ASGI server, e.g. `uvicorn backend.asgi:application`:
+    it is only routed with ASYNC_VIEWS, and answers 501 when served over WSGI,
+    where each open stream would hold a worker.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Event streams need an ASGI server."}, status=501)
+    user = await sync_to_async(_stream_user)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    heartbeat = getattr(settings, "REALTIME_HEARTBEAT", 15)
+
+    async def events():
+        yield "retry: 3000\n\n"
+        async for event in get_broker().subscribe(user_channel(user.id), last_event_id, heartbeat):
+            yield ": heartbeat\n\n" if event is None else _format(event)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,91 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Follow, Like
+
+MAX_BATCH_IDS = 100
+
+
+def parse_ids(request):
+    """Ids from ?ids=1,2,3 or a JSON body {"ids": [1, 2, 3]}."""
+    raw = request.data.get("ids") if request.method == "POST" else request.query_params.get("ids", "")
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(",") if part.strip()]
+    try:
+        ids = {int(i) for i in raw or []}
+    except (TypeError, ValueError):
+        raise ValidationError({"ids": ["Expected a list of integer ids."]})
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValidationError({"ids": [f"At most {MAX_BATCH_IDS} ids per request."]})
+    return ids
+
+
+def liked_post_ids(user, post_ids):
+    """Which of `post_ids` the user has liked, in one IN query."""
+    if not post_ids:
+        return set()
+    return set(Like.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", flat=True))
+
+
+def follow_relations(user, user_ids):
+    """(ids the user follows, ids that follow the user) among `user_ids`, in one query."""
+    following, followed_by = set(), set()
+    if not user_ids:
+        return following, followed_by
+    rows = Follow.objects.filter(
+        Q(follower=user, following_id__in=user_ids) | Q(following=user, follower_id__in=user_ids)
+    ).values_list("follower_id", "following_id")
+    for follower_id, following_id in rows:
+        if follower_id == user.id:
+            following.add(following_id)
+        if following_id == user.id:
+            followed_by.add(follower_id)
+    return following, followed_by
+
+
+class ViewerState:
+    """Per-request cache of the viewer's likes and follow edges.
+
+    List serializers call `load_posts` / `load_users` once per page so that
+    each row's `viewer_state` block is a dict lookup; single objects load
+    on demand.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.liked = {}
+        self.relations = {}
+
+    def load_posts(self, post_ids):
+        missing = [pid for pid in post_ids if pid not in self.liked]
+        self.prime_posts(missing, liked_post_ids(self.user, missing))
+
+    def load_users(self, user_ids):
+        missing = [uid for uid in user_ids if uid not in self.relations]
+        self.prime_users(missing, *follow_relations(self.user, missing))
+
+    # results fetched elsewhere (e.g. concurrently by an async view)
+    def prime_posts(self, post_ids, liked):
+        self.liked.update((pid, pid in liked) for pid in post_ids)
+
+    def prime_users(self, user_ids, following, followed_by):
+        self.relations.update(
+            (uid, {"following": uid in following, "followed_by": uid in followed_by}) for uid in user_ids
+        )
+
+    def for_post(self, post_id):
+        self.load_posts([post_id])
+        return {"liked": self.liked[post_id]}
+
+    def for_user(self, user_id):
+        self.load_users([user_id])
+        return self.relations[user_id]
+
+
+def viewer_state_context(request):
+    """Serializer context enabling `viewer_state` when asked for with ?include=viewer_state."""
+    user = getattr(request, "user", None)
+    includes = request.query_params.get("include", "").split(",")
+    if "viewer_state" in includes and user is not None and user.is_authenticated:
+        return {"viewer_state": ViewerState(user)}
+    return {}
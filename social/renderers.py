@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+# DRF's encoder covers Decimal, lazy strings, timedelta, querysets, etc.
+_encoder = encoders.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+_default = _encoder.default
+
+
+def _escape_separators(raw):
+    # keep the output a strict JavaScript subset, as DRF's renderer does
+    if b"\xe2\x80\xa8" in raw or b"\xe2\x80\xa9" in raw:
+        raw = raw.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return raw
+
+
+def dumps(data):
+    """Compact JSON bytes, via orjson when installed."""
+    if orjson is not None:
+        return _escape_separators(orjson.dumps(data, default=_default, option=ORJSON_OPTIONS))
+    return _escape_separators(_encoder.encode(data).encode())
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer backed by orjson (or a reused stdlib encoder).
+
+    Datetimes and UUIDs are encoded natively. Pretty-printed output
+    (`; indent=N`, the browsable API) goes through the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+def iter_json_array(rows, chunk_size=500):
+    """Encode an iterable as one JSON array, `chunk_size` rows per chunk."""
+    yield b"["
+    first = True
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield (b"" if first else b",") + dumps(chunk)[1:-1]
+            first, chunk = False, []
+    if chunk:
+        yield (b"" if first else b",") + dumps(chunk)[1:-1]
+    yield b"]"
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """A JSON array response written while `rows` is still being iterated."""
+
+    def __init__(self, rows, chunk_size=500, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(iter_json_array(rows, chunk_size), **kwargs)
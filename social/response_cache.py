@@ -0,0 +1,104 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+
+def _version_key(scope):
+    return f"respver:{scope}"
+
+
+def bump(*scopes):
+    """Invalidate every cached response that depends on one of `scopes`."""
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), time.time_ns(), None)
+
+
+def versions(scopes):
+    keys = [_version_key(s) for s in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # seed unknown versions with a fresh value so an evicted counter
+            # can never resurrect responses cached under an older one
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[k] for k in keys]
+
+
+def rows(data):
+    """The objects in serialized response data: a page, a list or one object."""
+    return data.get("results", [data]) if isinstance(data, dict) else data
+
+
+def _last_modified(data):
+    """Latest updated_at (or created_at) in a serialized object or page."""
+    stamps = [parse_datetime(r.get("updated_at") or r.get("created_at") or "")
+              for r in rows(data) if isinstance(r, dict)]
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps).timestamp() if stamps else None
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and last_modified is not None and int(last_modified) <= since
+
+
+def cached_response(scopes, item_scopes=None):
+    """Cache a read-only viewset action's response data under versioned keys.
+
+    `scopes(view, request, **kwargs)` names what the response depends on as
+    a whole, e.g. which posts are on a page; a `bump()` of any of them makes
+    the old entry unreachable. `item_scopes(data)` names per-object scopes
+    read off the rendered data (e.g. "post:12" for each row); their versions
+    are stored with the entry and checked on every hit, so a like only
+    invalidates the pages that show that post. Clients get an ETag derived
+    from all these versions (If-None-Match is answered without touching the
+    database) and Last-Modified from the rows' updated_at. Requests asking
+    for per-viewer data are never cached, and nothing is without a
+    SHARED_CACHE, since a bump() in one worker cannot reach another worker's
+    local memory.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapped(self, request, *args, **kwargs):
+            if request.method != "GET" or "viewer_state" in request.query_params.get("include", "") \
+                    or not getattr(settings, "SHARED_CACHE", False):
+                return method(self, request, *args, **kwargs)
+            url = request.build_absolute_uri()
+            vers = versions(scopes(self, request, **kwargs))
+            key = "response:" + hashlib.sha1(f"{url}|{vers}".encode()).hexdigest()
+            entry = cache.get(key)
+            if entry is not None and versions(entry["items"]) != entry["item_versions"]:
+                entry = None  # one of the objects in it has changed
+            if entry is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                items = list(item_scopes(response.data)) if item_scopes else []
+                entry = {"data": response.data, "last_modified": _last_modified(response.data),
+                         "items": items, "item_versions": versions(items)}
+                cache.set(key, entry, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300))
+            else:
+                response = Response(entry["data"])
+            etag = '"%s"' % hashlib.sha1(f"{key}|{entry['item_versions']}".encode()).hexdigest()
+            last_modified = entry["last_modified"]
+            if _not_modified(request, etag, last_modified):
+                response = Response(status=304)
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            return response
+        return wrapped
+    return decorator
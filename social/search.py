@@ -0,0 +1,283 @@
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+
+from .models import Post
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or so that the this to was "
+    "were will with you your".split()
+)
+MAX_PREFIX_EXPANSION = 50
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """Posting lists with BM25 ranking, for databases without full-text search.
+
+    Every add() takes a fresh internal doc number, so posting lists are
+    append-only arrays in doc order. Removing or re-adding a document only
+    marks its old number dead; dead entries are compacted away once they are
+    a quarter of the index. `prefix=True` keeps a sorted vocabulary so the
+    last query term also matches as a prefix (for names).
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, prefix=False):
+        self.postings = {}  # term -> (array of doc numbers, array of term frequencies)
+        self.doc_ids = array("q")  # doc number -> external id
+        self.lengths = array("I")  # doc number -> token count
+        self.alive = bytearray()
+        self.current = {}  # external id -> doc number
+        self.total_length = 0
+        self.dead = 0
+        self.vocabulary = [] if prefix else None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.current)
+
+    def add(self, doc_id, text):
+        tokens = tokenize(text)
+        with self.lock:
+            self.remove(doc_id)
+            docnum = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.lengths.append(len(tokens))
+            self.alive.append(1)
+            self.current[doc_id] = docnum
+            self.total_length += len(tokens)
+            for term, tf in Counter(tokens).items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array("I"), array("H"))
+                    if self.vocabulary is not None:
+                        insort(self.vocabulary, term)
+                entry[0].append(docnum)
+                entry[1].append(min(tf, 65535))
+
+    def remove(self, doc_id):
+        with self.lock:
+            docnum = self.current.pop(doc_id, None)
+            if docnum is None:
+                return
+            self.alive[docnum] = 0
+            self.total_length -= self.lengths[docnum]
+            self.dead += 1
+            if self.dead > 1000 and self.dead * 4 > len(self.doc_ids):
+                self.compact()
+
+    def compact(self):
+        with self.lock:
+            remap = array("q", [-1]) * len(self.doc_ids)
+            doc_ids, lengths = array("q"), array("I")
+            for docnum, live in enumerate(self.alive):
+                if live:
+                    remap[docnum] = len(doc_ids)
+                    doc_ids.append(self.doc_ids[docnum])
+                    lengths.append(self.lengths[docnum])
+            for term in list(self.postings):
+                docs, tfs = self.postings[term]
+                kept = [(remap[d], tf) for d, tf in zip(docs, tfs) if remap[d] >= 0]
+                if kept:
+                    self.postings[term] = (array("I", [d for d, _ in kept]), array("H", [tf for _, tf in kept]))
+                else:
+                    del self.postings[term]
+                    if self.vocabulary is not None:
+                        del self.vocabulary[bisect_left(self.vocabulary, term)]
+            self.doc_ids, self.lengths = doc_ids, lengths
+            self.alive = bytearray(b"\x01") * len(doc_ids)
+            self.current = {doc_id: docnum for docnum, doc_id in enumerate(doc_ids)}
+            self.dead = 0
+
+    def _terms(self, q):
+        terms = list(dict.fromkeys(tokenize(q)))
+        if terms and self.vocabulary is not None:
+            last = terms.pop()
+            start = bisect_left(self.vocabulary, last)
+            for term in self.vocabulary[start:start + MAX_PREFIX_EXPANSION]:
+                if not term.startswith(last):
+                    break
+                terms.append(term)
+        return terms
+
+    def search(self, q, limit=20):
+        """[(doc_id, score)] best first, scoring any-term matches with BM25."""
+        with self.lock:
+            n = len(self.current)
+            if not n:
+                return []
+            avgdl = self.total_length / n or 1
+            k1, b = self.k1, self.b
+            alive, lengths = self.alive, self.lengths
+            scores = {}
+            for term in self._terms(q):
+                entry = self.postings.get(term)
+                if entry is None:
+                    continue
+                docs, tfs = entry
+                df = len(docs)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for docnum, tf in zip(docs, tfs):
+                    if alive[docnum]:
+                        norm = k1 * (1 - b + b * lengths[docnum] / avgdl)
+                        scores[docnum] = scores.get(docnum, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            best = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+            return [(self.doc_ids[docnum], score) for docnum, score in best]
+
+
+def _user_text(username, first_name, last_name, bio):
+    return " ".join(filter(None, (username, first_name, last_name, bio)))
+
+
+class PythonSearch:
+    """In-process indexes built from the database on first use.
+
+    Signals keep them current, but only in the process that handled the
+    write, so this suits SQLite and single-process setups; use PostgreSQL
+    when running several workers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.post_index = None
+        self.user_index = None
+
+    def build(self):
+        posts, users = InvertedIndex(), InvertedIndex(prefix=True)
+        for post_id, content in Post.objects.filter(is_active=True).values_list("id", "content").iterator(5000):
+            posts.add(post_id, content)
+        rows = (User.objects.filter(is_active=True)
+                .values_list("id", "username", "first_name", "last_name", "profile__bio").iterator(5000))
+        for user_id, *fields in rows:
+            users.add(user_id, _user_text(*fields))
+        self.post_index, self.user_index = posts, users
+
+    def _ready(self):
+        if self.post_index is None:
+            with self.lock:
+                if self.post_index is None:
+                    self.build()
+
+    def posts(self, q, limit):
+        self._ready()
+        return self.post_index.search(q, limit)
+
+    def users(self, q, limit):
+        self._ready()
+        return self.user_index.search(q, limit)
+
+    # incremental updates: no-ops until something has searched
+    def post_saved(self, post):
+        if self.post_index is not None:
+            if post.is_active:
+                self.post_index.add(post.pk, post.content)
+            else:
+                self.post_index.remove(post.pk)
+
+    def post_deleted(self, post_id):
+        if self.post_index is not None:
+            self.post_index.remove(post_id)
+
+    def user_changed(self, user_id):
+        if self.user_index is not None:
+            row = (User.objects.filter(pk=user_id, is_active=True)
+                   .values_list("username", "first_name", "last_name", "profile__bio").first())
+            if row is None:
+                self.user_index.remove(user_id)
+            else:
+                self.user_index.add(user_id, _user_text(*row))
+
+    def user_deleted(self, user_id):
+        if self.user_index is not None:
+            self.user_index.remove(user_id)
+
+
+# ---- PostgreSQL: GIN expression indexes from migration 0007 ----
+# The vectors must compile to exactly the indexed expressions.
+def post_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector("content", config="english")
+
+
+def name_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector("username", "first_name", "last_name", config="simple")
+
+
+def bio_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector("profile__bio", config="english")
+
+
+class PostgresSearch:
+    """tsvector search; PostgreSQL maintains the indexes itself."""
+
+    def posts(self, q, limit):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        query = SearchQuery(q, config="english", search_type="websearch")
+        return list(Post.objects.filter(is_active=True).annotate(document=post_vector())
+                    .filter(document=query).annotate(rank=SearchRank(post_vector(), query))
+                    .order_by("-rank", "-id").values_list("id", "rank")[:limit])
+
+    def users(self, q, limit):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        terms = list(dict.fromkeys(tokenize(q)))
+        if not terms:
+            return []
+        names = SearchQuery(" & ".join(f"{t}:*" for t in terms), config="simple", search_type="raw")
+        bios = SearchQuery(q, config="english", search_type="websearch")
+        users = User.objects.filter(is_active=True)
+        scores = Counter()
+        for vector, query, weight in ((name_vector(), names, 2), (bio_vector(), bios, 1)):
+            rows = (users.annotate(document=vector).filter(document=query)
+                    .annotate(rank=SearchRank(vector, query)).order_by("-rank").values_list("id", "rank")[:limit])
+            for user_id, rank in rows:
+                scores[user_id] += weight * rank  # a name hit outranks a bio mention
+        return scores.most_common(limit)
+
+    def post_saved(self, post):
+        pass
+
+    def post_deleted(self, post_id):
+        pass
+
+    def user_changed(self, user_id):
+        pass
+
+    def user_deleted(self, user_id):
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """SEARCH_BACKEND "postgres" or "python"; "auto" picks by database vendor."""
+    name = getattr(settings, "SEARCH_BACKEND", "auto")
+    if name == "auto":
+        name = "postgres" if connection.vendor == "postgresql" else "python"
+    return PostgresSearch() if name == "postgres" else PythonSearch()
+
+
+def search_posts(q, limit=20):
+    """[(post_id, score)] best first."""
+    return get_backend().posts(q, limit)
+
+
+def search_users(q, limit=20):
+    """[(user_id, score)] best first."""
+    return get_backend().users(q, limit)
@@ -3,6 +3,9 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from .models import Profile, Post, Comment, Like, Notification, Follow
+from .counters import pending_post_counts
+from .mixins import FieldPlanMixin
+from . import fragments
 
 USERNAME_RE = re.compile(r"^[A-Za-z0-9_]{3,30}$")
 
@@ -42,13 +45,35 @@ class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(write_only=True)
     new_password = serializers.CharField(write_only=True, validators=[validate_password])
 
-class UserSerializer(serializers.ModelSerializer):
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, "all") else data)
+        if fragments.users_enabled(self.context):
+            fragments.prefetch(fragments.user_keys(users, self.context))
+        state = self.context.get("viewer_state")
+        if state is not None:
+            state.load_users([u.pk for u in users])
+        return super().to_representation(users)
+
+class UserSerializer(FieldPlanMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email", "first_name", "last_name", "last_login", "date_joined"]
+        list_serializer_class = UserListSerializer
+
+    def to_representation(self, instance):
+        build = lambda: super(UserSerializer, self).to_representation(instance)
+        if fragments.users_enabled(self.context):
+            data = fragments.fetch(fragments.user_key(instance, self.context), build)
+        else:
+            data = build()
+        state = self.context.get("viewer_state")
+        if state is not None:
+            data["viewer_state"] = state.for_user(instance.pk)
+        return data
 
 # -------- Profile --------
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(FieldPlanMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     class Meta:
         model = Profile
@@ -64,18 +89,53 @@ def validate_image_url(url: str):
         raise serializers.ValidationError("Only JPG/PNG images are allowed.")
     return url
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, "all") else data)
+        missing = [p for p in posts if not hasattr(p, "pending_counts")]
+        pending = pending_post_counts([p.pk for p in missing])
+        for p in missing:
+            p.pending_counts = pending.get(p.pk)
+        if fragments.enabled(self.context):
+            keys = [fragments.post_key(p) for p in posts]
+            if fragments.users_enabled(self.context):
+                keys += fragments.user_keys([p.author for p in posts], self.context)
+            fragments.prefetch(keys)
+        state = self.context.get("viewer_state")
+        if state is not None:
+            state.load_posts([p.pk for p in posts])
+            state.load_users({p.author_id for p in posts})
+        return super().to_representation(posts)
+
+class PostSerializer(FieldPlanMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
 
     class Meta:
         model = Post
-        fields = ["id", "author", "content", "image_url", "category", "is_active",
+        fields = ["id", "author", "content", "image_url", "image_variants", "category", "is_active",
                   "like_count", "comment_count", "created_at", "updated_at"]
+        read_only_fields = ["image_variants"]
+        list_serializer_class = PostListSerializer
 
     def validate_image_url(self, v):
         return validate_image_url(v)
 
-class CommentSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        # the post fragment is cached without its author, which has its own
+        build = lambda: {**super(PostSerializer, self).to_representation(instance), "author": None}
+        data = fragments.fetch(fragments.post_key(instance), build) if fragments.enabled(self.context) else build()
+        data["author"] = self.fields["author"].to_representation(instance.author)
+        # add like/comment deltas still sitting in counter shards
+        if not hasattr(instance, "pending_counts"):
+            instance.pending_counts = pending_post_counts([instance.pk]).get(instance.pk)
+        for field, delta in (instance.pending_counts or {}).items():
+            data[field] = max(0, data[field] + delta)
+        state = self.context.get("viewer_state")
+        if state is not None:
+            data["viewer_state"] = state.for_post(instance.pk)
+        return data
+
+class CommentSerializer(FieldPlanMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
 
@@ -83,7 +143,7 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ["id", "author", "post", "content", "is_active", "created_at"]
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(FieldPlanMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
 
@@ -92,7 +152,7 @@ class LikeSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "post", "created_at"]
 
 # -------- Follow / Notification --------
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(FieldPlanMixin, serializers.ModelSerializer):
     follower = UserSerializer(read_only=True)
     following = UserSerializer(read_only=True)
 
@@ -100,7 +160,7 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ["id", "follower", "following", "created_at"]
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(FieldPlanMixin, serializers.ModelSerializer):
     recipient = UserSerializer(read_only=True)
     sender = UserSerializer(read_only=True)
     # keep post minimal to reduce payload
@@ -109,4 +169,4 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ["id", "recipient", "sender", "notification_type", "post",
-                  "message", "is_read", "created_at"]
+                  "message", "actor_count", "is_read", "created_at"]
@@ -1,64 +1,173 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.utils import timezone
 from django.dispatch import receiver
 from .models import Follow, Like, Comment, Notification, Profile, Post
+from . import search, stats, suggestions, timeline, trending, uploads
+from .counters import incr, incr_post
+from .notifications import notify, reset_unread
+from .response_cache import bump
 
 @receiver(post_save, sender=Follow)
 def notif_follow(sender, instance, created, **kwargs):
     if created and instance.follower != instance.following:
-        Notification.objects.create(
-            recipient=instance.following,
-            sender=instance.follower,
-            notification_type="follow",
-            message=f"{instance.follower.username} started following you",
-        )
+        notify(instance.following_id, instance.follower, "follow")
         # counts
-        try:
-            p_following = Profile.objects.get(user=instance.following)
-            p_follower = Profile.objects.get(user=instance.follower)
-            p_following.followers_count += 1
-            p_following.save()
-            p_follower.following_count += 1
-            p_follower.save()
-        except Profile.DoesNotExist:
-            pass
+        incr(Profile, "followers_count", 1, user_id=instance.following_id)
+        incr(Profile, "following_count", 1, user_id=instance.follower_id)
+    if created:
+        bump(f"profile:{instance.following_id}", f"profile:{instance.follower_id}",
+             f"followers:{instance.following_id}", f"following:{instance.follower_id}")
 
 @receiver(post_delete, sender=Follow)
 def update_counts_unfollow(sender, instance, **kwargs):
-    try:
-        p_following = Profile.objects.get(user=instance.following)
-        p_follower = Profile.objects.get(user=instance.follower)
-        p_following.followers_count = max(0, p_following.followers_count - 1)
-        p_following.save()
-        p_follower.following_count = max(0, p_follower.following_count - 1)
-        p_follower.save()
-    except Profile.DoesNotExist:
-        pass
+    incr(Profile, "followers_count", -1, user_id=instance.following_id)
+    incr(Profile, "following_count", -1, user_id=instance.follower_id)
+    bump(f"profile:{instance.following_id}", f"profile:{instance.follower_id}",
+         f"followers:{instance.following_id}", f"following:{instance.follower_id}")
+
+@receiver(post_save, sender=Follow)
+def timeline_follow(sender, instance, created, **kwargs):
+    if created and instance.follower_id != instance.following_id:
+        timeline.backfill(instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender=Follow)
+def timeline_unfollow(sender, instance, **kwargs):
+    timeline.prune(instance.follower_id, instance.following_id)
 
 @receiver(post_save, sender=Like)
 def notif_like(sender, instance, created, **kwargs):
-    if created and instance.user != instance.post.author:
-        Notification.objects.create(
-            recipient=instance.post.author,
-            sender=instance.user,
-            notification_type="like",
-            post=instance.post,
-            message=f"{instance.user.username} liked your post",
-        )
-        Post.objects.filter(pk=instance.post_id).update(like_count=instance.post.likes.count())
+    if not created:
+        return
+    incr_post(instance.post_id, "like_count", 1)
+    bump(f"post:{instance.post_id}", "trending")
+    if instance.user_id != instance.post.author_id:
+        notify(instance.post.author_id, instance.user, "like", instance.post_id)
 
 @receiver(post_delete, sender=Like)
 def decr_like(sender, instance, **kwargs):
-    Post.objects.filter(pk=instance.post_id).update(like_count=max(0, instance.post.likes.count()))
+    incr_post(instance.post_id, "like_count", -1)
+    bump(f"post:{instance.post_id}", "trending")
 
 @receiver(post_save, sender=Comment)
 def notif_comment(sender, instance, created, **kwargs):
+    bump(f"post:{instance.post_id}", f"comments:{instance.post_id}", "trending")
+    if created:
+        incr_post(instance.post_id, "comment_count", 1)
+        if instance.author_id != instance.post.author_id:
+            notify(instance.post.author_id, instance.author, "comment", instance.post_id)
+
+@receiver(post_delete, sender=Comment)
+def decr_comment(sender, instance, **kwargs):
+    incr_post(instance.post_id, "comment_count", -1)
+    bump(f"post:{instance.post_id}", f"comments:{instance.post_id}", "trending")
+
+@receiver(pre_save, sender=Post)
+def score_new_post(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.trending_score = trending.score(
+            instance.like_count, instance.comment_count, instance.created_at or timezone.now())
+
+@receiver(pre_save, sender=Post)
+def attach_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "image_url" in update_fields:
+        instance.image_variants = uploads.variants_for(instance.image_url)
+
+# ---- unread counts ----
+# Deleting a post or a user cascades away notifications about it; drop the
+# recipients' cached unread counts once the delete commits.
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=User)
+def unread_cascade(sender, instance, **kwargs):
+    if not getattr(settings, "SHARED_CACHE", False):
+        return
+    about = {"post_id": instance.pk} if sender is Post else {"sender_id": instance.pk}
+    recipients = set(Notification.objects.filter(is_read=False, **about).values_list("recipient_id", flat=True))
+    if recipients:
+        transaction.on_commit(lambda: [reset_unread(recipient_id) for recipient_id in recipients])
+
+# ---- response cache invalidation ----
+# The list-wide "posts" and "profiles" scopes move only when rows join or
+# leave a list; edits and counter changes bump the object's own scope.
+@receiver(post_save, sender=Post)
+def invalidate_post(sender, instance, created, **kwargs):
+    if created or not instance.is_active:
+        bump("posts", f"post:{instance.pk}")
+    else:
+        bump(f"post:{instance.pk}")
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    bump("posts", f"post:{instance.pk}")
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile(sender, instance, created, **kwargs):
+    if created:
+        bump("profiles", f"profile:{instance.user_id}")
+    else:
+        bump(f"profile:{instance.user_id}")
+
+@receiver(post_delete, sender=Profile)
+def invalidate_deleted_profile(sender, instance, **kwargs):
+    bump("profiles", f"profile:{instance.user_id}")
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, update_fields=None, **kwargs):
+    # a new user is in no cached response until their profile is; logins
+    # only touch last_login, which cached responses don't depend on
+    if not created and (update_fields is None or set(update_fields) != {"last_login"}):
+        bump(f"user:{instance.pk}")
+
+# ---- stats rollup ----
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Follow)
+def stats_created(sender, instance, created, **kwargs):
     if created:
-        Post.objects.filter(pk=instance.post_id).update(comment_count=instance.post.comments.count())
-        if instance.author != instance.post.author:
-            Notification.objects.create(
-                recipient=instance.post.author,
-                sender=instance.author,
-                notification_type="comment",
-                post=instance.post,
-                message=f"{instance.author.username} commented on your post",
-            )
+        metric, field = stats.BY_MODEL[sender]
+        stats.record(metric, getattr(instance, field))
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Follow)
+def stats_deleted(sender, instance, **kwargs):
+    metric, field = stats.BY_MODEL[sender]
+    stats.record(metric, getattr(instance, field), -1)
+
+# ---- search index ----
+@receiver(post_save, sender=Post)
+def search_post_saved(sender, instance, **kwargs):
+    search.get_backend().post_saved(instance)
+
+@receiver(post_delete, sender=Post)
+def search_post_deleted(sender, instance, **kwargs):
+    search.get_backend().post_deleted(instance.pk)
+
+@receiver(post_save, sender=Profile)
+def search_profile_saved(sender, instance, **kwargs):
+    search.get_backend().user_changed(instance.user_id)
+
+@receiver(post_save, sender=User)
+def search_user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        search.get_backend().user_changed(instance.pk)
+
+@receiver(post_delete, sender=User)
+def search_user_deleted(sender, instance, **kwargs):
+    search.get_backend().user_deleted(instance.pk)
+
+# ---- follow suggestions ----
+@receiver(post_save, sender=Follow)
+def suggestions_follow(sender, instance, created, **kwargs):
+    if created and instance.follower_id != instance.following_id:
+        suggestions.follow_changed(instance.follower_id, instance.following_id, followed=True)
+
+@receiver(post_delete, sender=Follow)
+def suggestions_unfollow(sender, instance, **kwargs):
+    suggestions.follow_changed(instance.follower_id, instance.following_id, followed=False)
@@ -0,0 +1,116 @@
+import random
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import Comment, Follow, Like, Post, StatBucket
+
+# metric -> (model, creation timestamp field)
+METRICS = {
+    "signups": (User, "date_joined"),
+    "posts": (Post, "created_at"),
+    "comments": (Comment, "created_at"),
+    "likes": (Like, "created_at"),
+    "follows": (Follow, "created_at"),
+}
+BY_MODEL = {model: (metric, field) for metric, (model, field) in METRICS.items()}
+INTERVALS = {"hour": (TruncHour, timedelta(hours=1)), "day": (TruncDay, timedelta(days=1))}
+MAX_POINTS = 2000
+OVERVIEW_KEY = "stats:overview"
+
+
+def hour_of(at):
+    return at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record(metric, at, delta=1):
+    """Count a row created (+1) or deleted (-1) into the hour it was created in."""
+    slot = random.randrange(max(getattr(settings, "STATS_SHARDS", 8), 1))
+    lookup = {"metric": metric, "hour": hour_of(at), "slot": slot}
+    if StatBucket.objects.filter(**lookup).update(count=F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            StatBucket.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # another writer created the slot first
+        StatBucket.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def forget(metric, queryset):
+    """Subtract rows about to be deleted without signals (e.g. by bulk.bulk_delete_posts)."""
+    _, field = METRICS[metric]
+    rows = (queryset.order_by().annotate(h=TruncHour(field, tzinfo=dt_timezone.utc))
+            .values("h").annotate(n=Count("*")))
+    for row in rows:
+        record(metric, row["h"], -row["n"])
+
+
+def totals():
+    found = dict(StatBucket.objects.values_list("metric").annotate(n=Sum("count")).order_by())
+    return {metric: found.get(metric, 0) for metric in METRICS}
+
+
+def overview():
+    """Totals plus today's posts, cached for STATS_CACHE_TIMEOUT seconds."""
+    data = cache.get(OVERVIEW_KEY)
+    if data is None:
+        today = timezone.now().astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        total = totals()
+        data = {
+            "total_users": total["signups"],
+            "total_posts": total["posts"],
+            "active_today": StatBucket.objects.filter(metric="posts", hour__gte=today)
+                                              .aggregate(n=Sum("count"))["n"] or 0,
+            "totals": total,
+        }
+        cache.set(OVERVIEW_KEY, data, getattr(settings, "STATS_CACHE_TIMEOUT", 30))
+    return data
+
+
+def series(metrics, interval, since, until):
+    """{metric: [{"t": bucket start, "count": n}, ...]} from the rollup, zero-filled."""
+    trunc, step = INTERVALS[interval]
+    start = hour_of(since)
+    if interval == "day":
+        start = start.replace(hour=0)
+    rows = (StatBucket.objects.filter(metric__in=metrics, hour__gte=start, hour__lt=until)
+            .annotate(t=trunc("hour", tzinfo=dt_timezone.utc))
+            .values("metric", "t").annotate(n=Sum("count")).order_by())
+    found = {(row["metric"], row["t"]): row["n"] for row in rows}
+    points = []
+    t = start
+    while t < until and len(points) < MAX_POINTS:
+        points.append(t)
+        t += step
+    return {m: [{"t": p, "count": found.get((m, p), 0)} for p in points] for m in metrics}
+
+
+def rebuild(since=None):
+    """Recount buckets from the raw tables, for hours >= `since` (or all time).
+
+    Returns {metric: buckets written}.
+    """
+    written = {}
+    with transaction.atomic():
+        for metric, (model, field) in METRICS.items():
+            qs = model.objects.all()
+            stale = StatBucket.objects.filter(metric=metric)
+            if since is not None:
+                since = hour_of(since)
+                qs = qs.filter(**{f"{field}__gte": since})
+                stale = stale.filter(hour__gte=since)
+            rows = (qs.order_by().annotate(h=TruncHour(field, tzinfo=dt_timezone.utc))
+                    .values("h").annotate(n=Count("*")))
+            buckets = [StatBucket(metric=metric, hour=row["h"], slot=0, count=row["n"]) for row in rows]
+            stale.delete()
+            StatBucket.objects.bulk_create(buckets, batch_size=1000)
+            written[metric] = len(buckets)
+    cache.delete(OVERVIEW_KEY)
+    return written
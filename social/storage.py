@@ -0,0 +1,160 @@
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class StorageError(Exception):
+    pass
+
+
+class BaseStorage:
+    """Where uploaded images live. Paths are relative, e.g. "12/ab34-cat.jpg"."""
+
+    def save(self, path, data, content_type):
+        """Store `data` (bytes) and return its public URL."""
+        raise NotImplementedError
+
+    def read(self, path):
+        raise NotImplementedError
+
+    def delete(self, *paths):
+        """Remove stored files; paths that do not exist are ignored."""
+        raise NotImplementedError
+
+    def open(self, path, content_type):
+        """A writer for storing a file chunk by chunk: write(bytes), then
+        close() -> public URL, or abort() to discard what was written."""
+        raise NotImplementedError
+
+
+class LocalWriter:
+    """Writes into a temp file next to the target and renames it into place on
+    close, so readers never see a partial file."""
+
+    def __init__(self, target, url):
+        self.target, self.url = target, url
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self.file = tempfile.NamedTemporaryFile(dir=target.parent, prefix=".upload-", delete=False)
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+
+    def write(self, chunk):
+        try:
+            self.file.write(chunk)
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+
+    def close(self):
+        try:
+            self.file.close()
+            os.replace(self.file.name, self.target)
+        except OSError as exc:
+            self.abort()
+            raise StorageError(str(exc)) from exc
+        return self.url
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.unlink(self.file.name)
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage(BaseStorage):
+    """Files under MEDIA_ROOT served from MEDIA_URL; for development and tests."""
+
+    def __init__(self):
+        self.root = Path(settings.MEDIA_ROOT)
+        self.base_url = settings.MEDIA_URL
+
+    def save(self, path, data, content_type):
+        target = self.root / path
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+        return self.base_url + path
+
+    def read(self, path):
+        try:
+            return (self.root / path).read_bytes()
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+
+    def delete(self, *paths):
+        try:
+            for path in paths:
+                (self.root / path).unlink(missing_ok=True)
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+
+    def open(self, path, content_type):
+        return LocalWriter(self.root / path, self.base_url + path)
+
+
+class SupabaseWriter(LocalWriter):
+    """Spools to a temp file and uploads it on close. The client streams the
+    file from disk, so a large upload is never held in memory."""
+
+    def __init__(self, storage, path, content_type):
+        self.storage, self.path, self.content_type = storage, path, content_type
+        super().__init__(Path(tempfile.gettempdir()) / os.path.basename(path), None)
+
+    def close(self):
+        try:
+            self.file.close()
+            self.storage.bucket.upload(path=self.path, file=self.file.name,
+                                       file_options={"contentType": self.content_type})
+        except Exception as exc:
+            raise StorageError(str(exc)) from exc
+        finally:
+            self.abort()
+        return self.storage.bucket.get_public_url(self.path).rstrip("?")
+
+
+class SupabaseStorage(BaseStorage):
+    """A Supabase Storage bucket, through one client per process.
+
+    The client keeps its HTTP connection pool, so uploads after the first skip
+    the TLS handshake that creating a client per request used to cost.
+    """
+
+    def __init__(self):
+        from supabase import create_client
+
+        self.bucket = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY).storage.from_(
+            settings.SUPABASE_BUCKET or "images")
+
+    def save(self, path, data, content_type):
+        try:
+            self.bucket.upload(path=path, file=data, file_options={"contentType": content_type})
+        except Exception as exc:  # storage3 raises its own StorageException and httpx errors
+            raise StorageError(str(exc)) from exc
+        return self.bucket.get_public_url(path).rstrip("?")
+
+    def read(self, path):
+        try:
+            return self.bucket.download(path)
+        except Exception as exc:
+            raise StorageError(str(exc)) from exc
+
+    def delete(self, *paths):
+        try:
+            self.bucket.remove(list(paths))
+        except Exception as exc:
+            raise StorageError(str(exc)) from exc
+
+    def open(self, path, content_type):
+        return SupabaseWriter(self, path, content_type)
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    return import_string(getattr(settings, "UPLOAD_STORAGE", "social.storage.LocalStorage"))()
@@ -0,0 +1,205 @@
+import heapq
+from array import array
+from collections import Counter
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Follow, FollowSuggestions
+
+try:
+    import numpy
+except ImportError:  # optional: only speeds up neighbour counting
+    numpy = None
+
+# score = MUTUAL_WEIGHT * (people you follow who follow them)
+#       + SHARED_WEIGHT * (your followers who also follow them)
+MUTUAL_WEIGHT = 1.0
+SHARED_WEIGHT = 0.5
+ID_CHUNK = 500
+
+
+def suggestions_size():
+    return getattr(settings, "SUGGESTIONS_SIZE", 50)
+
+
+def _csr(n, pairs):
+    """(indptr, indices) for dense (row, col) pairs; each row's columns sorted."""
+    pairs.sort()
+    degree = array("i", [0]) * n
+    for row, _ in pairs:
+        degree[row] += 1
+    indptr = array("i", [0])
+    indptr.extend(accumulate(degree))
+    return indptr, array("i", (col for _, col in pairs))
+
+
+class FollowGraph:
+    """Follow edges as CSR adjacency in both directions.
+
+    User ids are mapped to dense indexes; the accounts index i follows are
+    out_idx[out_ptr[i]:out_ptr[i + 1]] and its followers likewise in in_idx,
+    all in flat int arrays (viewed without copying by NumPy when installed).
+    """
+
+    def __init__(self, edges):
+        edges = list(edges)
+        self.ids = array("q", sorted({uid for edge in edges for uid in edge}))
+        self.index = {uid: i for i, uid in enumerate(self.ids)}
+        pairs = [(self.index[a], self.index[b]) for a, b in edges]
+        self.out_ptr, self.out_idx = _csr(len(self.ids), pairs)
+        self.in_ptr, self.in_idx = _csr(len(self.ids), [(b, a) for a, b in pairs])
+        if numpy is not None:
+            dtype = numpy.dtype(f"i{self.out_idx.itemsize}")
+            self.out_view = numpy.frombuffer(self.out_idx, dtype=dtype) if self.out_idx else None
+
+    def following(self, i):
+        return self.out_idx[self.out_ptr[i]:self.out_ptr[i + 1]]
+
+    def followers(self, i):
+        return self.in_idx[self.in_ptr[i]:self.in_ptr[i + 1]]
+
+    def _reach(self, sources):
+        """{node: how many of `sources` follow it}."""
+        if not sources:
+            return {}
+        ptr = self.out_ptr
+        if numpy is not None and self.out_view is not None:
+            reached = numpy.concatenate([self.out_view[ptr[s]:ptr[s + 1]] for s in sources])
+            nodes, counts = numpy.unique(reached, return_counts=True)
+            return dict(zip(nodes.tolist(), counts.tolist()))
+        counts = Counter()
+        for s in sources:
+            counts.update(self.out_idx[ptr[s]:ptr[s + 1]])
+        return counts
+
+    def recommend(self, user_id, size, banned=frozenset()):
+        """[[user_id, score, mutual, shared]] best first; ties go to the lower id."""
+        i = self.index.get(user_id)
+        if i is None:
+            return []
+        following = self.following(i)
+        mutual = self._reach(following)
+        shared = self._reach(self.followers(i))
+        skip = set(following)
+        skip.add(i)
+        ids = self.ids
+        scored = []
+        for c in mutual.keys() | shared.keys():
+            if c in skip or ids[c] in banned:
+                continue
+            m, s = mutual.get(c, 0), shared.get(c, 0)
+            scored.append((MUTUAL_WEIGHT * m + SHARED_WEIGHT * s, m, -ids[c], s))
+        return [[-neg_id, score, m, s] for score, m, neg_id, s in heapq.nlargest(size, scored)]
+
+
+def _edges():
+    return Follow.objects.exclude(follower_id=F("following_id")).values_list("follower_id", "following_id")
+
+
+def _chunks(ids):
+    ids = iter(ids)
+    while chunk := list(islice(ids, ID_CHUNK)):
+        yield chunk
+
+
+def load_graph(user_ids=None):
+    """The whole graph, or just the edges needed to score `user_ids`: their
+    own follows both ways plus everything their neighbours follow."""
+    if user_ids is None:
+        return FollowGraph(_edges().iterator(chunk_size=10000))
+    edges = set(_edges().filter(Q(follower_id__in=user_ids) | Q(following_id__in=user_ids)))
+    hop = {uid for edge in edges for uid in edge}.difference(user_ids)
+    for chunk in _chunks(hop):
+        edges.update(_edges().filter(follower_id__in=chunk))
+    return FollowGraph(edges)
+
+
+def refresh(user_ids=None):
+    """Recompute and store suggestions for `user_ids` (None = every active
+    user, from one load of the full graph). Returns rows written."""
+    started = timezone.now()
+    banned = set(User.objects.filter(is_active=False).values_list("id", flat=True))
+    full = user_ids is None
+    if full:
+        graph = load_graph()
+        user_ids = User.objects.filter(is_active=True).order_by("id").values_list("id", flat=True).iterator()
+    else:
+        graph = load_graph(user_ids)
+    size, written = suggestions_size(), 0
+    for chunk in _chunks(user_ids):
+        rows = [FollowSuggestions(user_id=uid, items=graph.recommend(uid, size, banned), computed_at=started)
+                for uid in chunk]
+        FollowSuggestions.objects.bulk_create(rows, update_conflicts=True, unique_fields=["user"],
+                                              update_fields=["items", "computed_at"])
+        # rows marked again while we were computing stay stale for the next pass
+        FollowSuggestions.objects.filter(user_id__in=chunk, stale_since__lt=started).update(stale_since=None)
+        written += len(rows)
+    if full:
+        # the graph was loaded after `started`, so pending neighbourhood marks are covered
+        FollowSuggestions.objects.filter(spread_since__lt=started).update(spread_since=None)
+    return written
+
+
+def spread(limit=1000):
+    """Mark the two-hop neighbourhood of up to `limit` followers whose follows
+    changed: their followers (mutual counts) and the accounts they follow
+    (shared-follower counts). Returns rows taken."""
+    started = timezone.now()
+    spread_ids = list(FollowSuggestions.objects.filter(spread_since__isnull=False)
+                      .order_by("spread_since").values_list("user_id", flat=True)[:limit])
+    for chunk in _chunks(spread_ids):
+        FollowSuggestions.objects.filter(
+            Q(user_id__in=Follow.objects.filter(following_id__in=chunk).values("follower_id"))
+            | Q(user_id__in=Follow.objects.filter(follower_id__in=chunk).values("following_id"))
+        ).update(stale_since=started)
+        FollowSuggestions.objects.filter(user_id__in=chunk, spread_since__lt=started).update(spread_since=None)
+    return len(spread_ids)
+
+
+def refresh_stale(limit=1000):
+    """One worker pass: spread pending follow changes, then recompute up to
+    `limit` stale rows, oldest first."""
+    spread(limit)
+    stale = list(FollowSuggestions.objects.filter(stale_since__isnull=False)
+                 .order_by("stale_since").values_list("user_id", flat=True)[:limit])
+    return refresh(stale) if stale else 0
+
+
+def follow_changed(follower_id, following_id, followed):
+    """Mark both ends of a follow/unfollow stale and queue the follower's
+    neighbourhood for the worker (see `spread`); a popular follower has too
+    many neighbours to mark on the request."""
+    now = timezone.now()
+    if followed:
+        # not on unfollow: that also runs while a user is being deleted
+        FollowSuggestions.objects.bulk_create(
+            [FollowSuggestions(user_id=uid, stale_since=now) for uid in (follower_id, following_id)],
+            ignore_conflicts=True,
+        )
+    FollowSuggestions.objects.filter(user_id=following_id).update(stale_since=now)
+    FollowSuggestions.objects.filter(user_id=follower_id).update(stale_since=now, spread_since=now)
+    if followed:
+        # don't keep suggesting the account just followed until the worker runs
+        row = FollowSuggestions.objects.filter(user_id=follower_id).only("items").first()
+        if row is not None and any(item[0] == following_id for item in row.items):
+            row.items = [item for item in row.items if item[0] != following_id]
+            row.save(update_fields=["items"])
+
+
+def for_user(user, limit):
+    """Stored suggestions as ([(User, score, mutual, shared)], computed_at).
+
+    A user without a row yet gets an empty list and is queued for the worker.
+    """
+    row = FollowSuggestions.objects.filter(user=user).first()
+    if row is None:
+        FollowSuggestions.objects.bulk_create([FollowSuggestions(user=user, stale_since=timezone.now())],
+                                              ignore_conflicts=True)
+        return [], None
+    items = row.items[:limit]
+    found = User.objects.filter(is_active=True).in_bulk([item[0] for item in items])
+    return [(found[uid], score, m, s) for uid, score, m, s in items if uid in found], row.computed_at
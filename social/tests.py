@@ -1,3 +1,962 @@
-from django.test import TestCase
+import csv
+import importlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend import settings as settings_module
+
+from .bulk import bulk_delete_posts
+from .counters import flush_shards, incr, reconcile
+from .hashers import MIN_ITERATIONS, PBKDF2PasswordHasher
+from . import async_views, fragments, renderers
+from . import outbox, search, stats, suggestions, trending
+from .management.commands.explain_hot_queries import SEQ_SCAN_RE, hot_queries
+from .mixins import FieldPlanMixin, QueryBudgetExceeded, query_plan
+from .notifications import unread_key
+from .realtime import MemoryBroker, StreamTicketView, _Channel, _stream_user, event_stream, issue_ticket
+from .storage import get_storage
+from .serializers import CommentSerializer, NotificationSerializer, PostSerializer, UserSerializer
+from .models import (
+    Comment, Follow, FollowSuggestions, Like, Notification, OutboundEmail, Post, PostCounterShard, Profile, StatBucket,
+    TimelineEntry, UploadedImage,
+)
+from .pagination import KeysetPagination
+from .timeline import HomeTimeline, fan_out_post
+from .views import NotificationViewSet
+
+
+test_settings = override_settings(NOTIFICATION_PIPELINE="sync", UPLOAD_PIPELINE="sync", EMAIL_OUTBOX_PIPELINE="sync",
+                                  PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+
+
+class SocialTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def make_user(self, username, **kwargs):
+        user = User.objects.create_user(username, f"{username}@example.com", "pass-4821!", **kwargs)
+        Profile.objects.get_or_create(user=user)
+        return user
+
+    def login(self, user):
+        self.client.force_authenticate(user)
+
+
+@test_settings
+class SocialTestCase(SocialTestMixin, TestCase):
+    pass
+
+
+def load_settings(**env):
+    """A fresh copy of backend/settings.py run with these environment
+    variables (None = unset)."""
+    spec = importlib.util.spec_from_file_location("settings_check", settings_module.__file__)
+    with patch.dict(os.environ):
+        for name, value in env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        spec.loader.exec_module(module := importlib.util.module_from_spec(spec))
+    return module
+
+
+# ---- Timelines ----
+class TimelineTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = self.make_user("alice"), self.make_user("bob")
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        post = Post.objects.create(author=self.bob, content="hello")
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertEqual([p.id for p in HomeTimeline(self.alice)[:10]], [post.id])
+        Follow.objects.filter(follower=self.alice, following=self.bob).delete()
+        self.assertEqual(HomeTimeline(self.alice)[:10], [])
+
+    def test_new_post_is_fanned_out(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.login(self.bob)
+        response = self.client.post("/api/posts/", {"content": "fresh"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.alice, post_id=response.data["id"]).exists())
+
+    def test_trending_feed_ranks_the_home_timeline(self):
+        carol = self.make_user("carol")
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        posts = [Post.objects.create(author=author, content="x") for author in (self.alice, self.bob, carol) * 12]
+        for post in posts:
+            fan_out_post(post)
+        for n, post in enumerate(posts[:6]):
+            Post.objects.filter(pk=post.pk).update(trending_score=post.trending_score + n)
+        expected = sorted((p for p in posts if p.author_id != carol.id),
+                          key=lambda p: (Post.objects.get(pk=p.pk).trending_score, p.id), reverse=True)
+        self.login(self.alice)
+
+        def walk():
+            ids, url = [], "/api/feed/?ranking=trending"
+            while url:
+                data = self.client.get(url).data
+                ids += [row["id"] for row in data["results"]]
+                url = data["next"]
+            return ids
+
+        self.assertEqual(walk(), [p.id for p in expected])
+        # bob's posts pulled at read time instead, merged in by score
+        TimelineEntry.objects.filter(owner=self.alice, author=self.bob).delete()
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            self.assertEqual(walk(), [p.id for p in expected])
+
+    def test_trending_feed_ranks_recent_entries_only(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        posts = [Post.objects.create(author=self.bob, content="x") for _ in range(4)]
+        for post in posts:
+            fan_out_post(post)
+        Post.objects.filter(pk=posts[0].pk).update(trending_score=posts[0].trending_score + 100)
+        ranked = lambda: [p.id for p in HomeTimeline(self.alice, "trending")[:10]]
+        self.assertEqual(ranked()[0], posts[0].id)
+        with override_settings(TIMELINE_TRENDING_WINDOW=3):
+            self.assertEqual(ranked(), [p.id for p in reversed(posts[1:])])
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=2, TIMELINE_FANOUT_LIMIT=5)
+    def test_migration_backfills_existing_rows(self):
+        carol = self.make_user("carol")
+        for author in (self.bob, carol):
+            Follow.objects.create(follower=self.alice, following=author)
+        Profile.objects.filter(user=carol).update(followers_count=5)  # read at request time instead
+        own = Post.objects.create(author=self.alice, content="x")
+        bobs = [Post.objects.create(author=self.bob, content=f"x{i}") for i in range(4)]
+        Post.objects.filter(pk=bobs[3].pk).update(is_active=False)
+        Post.objects.create(author=carol, content="x")
+        TimelineEntry.objects.all().delete()  # as on a database that predates the table
+        migration = importlib.import_module("social.migrations.0012_backfill_timelines")
+        for _ in range(2):  # rerunning adds nothing
+            migration.backfill_timelines(apps, SimpleNamespace(connection=connection))
+        entries = lambda user: set(TimelineEntry.objects.filter(owner=user).values_list("post_id", "author_id"))
+        self.assertEqual(entries(self.alice), {(own.id, self.alice.id), (bobs[2].id, self.bob.id),
+                                               (bobs[1].id, self.bob.id)})
+        self.assertEqual(entries(self.bob), {(bobs[2].id, self.bob.id), (bobs[1].id, self.bob.id)})
+        self.assertEqual(TimelineEntry.objects.filter(owner=carol).count(), 1)
+
+
+# ---- Pagination ----
+class KeysetPaginationTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.count = KeysetPagination.page_size + 5
+        self.posts = [Post.objects.create(author=self.alice, content=f"post {i}") for i in range(self.count)]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def test_pages_cover_every_post_once_newest_first(self):
+        self.assertEqual(self.walk("/api/posts/"), [p.id for p in reversed(self.posts)])
+
+    def test_rows_inserted_while_paging_do_not_shift_pages(self):
+        first = self.client.get("/api/posts/").data
+        Post.objects.create(author=self.alice, content="late")
+        rest = self.walk(first["next"])
+        self.assertEqual([row["id"] for row in first["results"]] + rest, [p.id for p in reversed(self.posts)])
+
+    def test_feed_pages_through_home_timeline(self):
+        for post in self.posts:
+            fan_out_post(post)
+        self.login(self.alice)
+        self.assertEqual(self.walk("/api/feed/"), [p.id for p in reversed(self.posts)])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/posts/?cursor=garbage").status_code, 404)
+
+
+# ---- Query budgets ----
+class QueryBudgetTests(SocialTestCase):
+    """Query counts per page stay flat as the page fills up (no N+1)."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.others = [self.make_user(f"user{i}") for i in range(3)]
+        for user in self.others:
+            Follow.objects.create(follower=self.alice, following=user)
+        self.add_posts()
+        self.login(self.alice)
+
+    def add_posts(self):
+        for user in self.others:
+            post = Post.objects.create(author=user, content="hello")
+            fan_out_post(post)
+            Like.objects.create(user=self.alice, post=post)
+            Comment.objects.create(author=self.alice, post=post, content="hi")
+            Follow.objects.get_or_create(follower=user, following=self.alice)
+
+    def assertQueriesFlat(self, url, expected):
+        for _ in range(2):
+            cache.clear()
+            with self.assertNumQueries(expected):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.add_posts()
+
+    def test_feed(self):
+        self.assertQueriesFlat("/api/feed/", 3)
+
+    def test_trending_feed(self):
+        self.assertQueriesFlat("/api/feed/?ranking=trending", 3)
+
+    def test_post_list(self):
+        self.assertQueriesFlat("/api/posts/", 1)
+        self.assertQueriesFlat("/api/posts/?include=viewer_state", 3)
+
+    def test_trending_post_list(self):
+        # more than a page, so the cursor is built from the last row
+        Post.objects.bulk_create(Post(author=self.others[0], content=f"filler {i}") for i in range(25))
+        self.assertQueriesFlat("/api/posts/?ranking=trending", 1)
+
+    def test_notifications(self):
+        self.assertQueriesFlat("/api/notifications/", 1)
+
+    def test_profiles(self):
+        self.assertQueriesFlat("/api/profiles/", 2)
+        self.assertQueriesFlat(f"/api/profiles/{self.others[0].profile.pk}/", 1)
+
+    @override_settings(ENFORCE_QUERY_BUDGETS=True)
+    def test_budgets_hold_and_are_enforced(self):
+        for url in ("/api/feed/", "/api/posts/?include=viewer_state", "/api/notifications/", "/api/profiles/"):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with patch.object(NotificationViewSet, "query_budget", 0), self.assertRaises(QueryBudgetExceeded):
+            self.client.get("/api/notifications/")
+
+
+# ---- Indexes ----
+class HotQueryIndexTests(SocialTestCase):
+    def test_hot_queries_use_indexes(self):
+        pattern = SEQ_SCAN_RE.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f"no scan detection for {connection.vendor}")
+        for label, qs in hot_queries(1, 1, "someone@example.com"):
+            if label == "user by email" and connection.vendor == "sqlite":
+                continue  # iexact is LIKE on SQLite, which can't use the UPPER(email) index
+            with self.subTest(label):
+                self.assertEqual(pattern.findall(qs.explain()), [])
+
+
+# ---- Counters ----
+class CounterTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = self.make_user("alice"), self.make_user("bob")
+        self.post = Post.objects.create(author=self.bob, content="hello")
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.like_count, self.post.comment_count
+
+    def test_likes_comments_and_follows_update_counters(self):
+        like = Like.objects.create(user=self.alice, post=self.post)
+        comment = Comment.objects.create(author=self.alice, post=self.post, content="hi")
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(Profile.objects.get(user=self.bob).followers_count, 1)
+        self.assertEqual(Profile.objects.get(user=self.alice).following_count, 1)
+        like.delete()
+        comment.delete()
+        Follow.objects.all().delete()
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual(Profile.objects.get(user=self.bob).followers_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        Like.objects.create(user=self.alice, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, trending_score=F("trending_score") + 2)
+        Profile.objects.filter(user=self.bob).update(followers_count=3)
+        self.assertEqual(reconcile(dry_run=True)["Post.like_count"], 1)
+        fixed = reconcile()
+        self.assertEqual((fixed["Post.like_count"], fixed["Profile.followers_count"]), (1, 1))
+        self.assertEqual(self.counts(), (1, 0))
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertAlmostEqual(post.trending_score, trending.score(1, 0, post.created_at))
+        self.assertEqual(reconcile(), dict.fromkeys(fixed, 0))
+
+
+    @override_settings(POST_COUNTER_SHARDS=4)
+    def test_sharded_counts_are_served_and_flushed(self):
+        for user in (self.alice, self.make_user("carol")):
+            Like.objects.create(user=user, post=self.post)
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual(self.client.get(f"/api/posts/{self.post.pk}/").data["like_count"], 2)
+        self.assertEqual(flush_shards(), 1)
+        self.assertEqual(self.counts(), (2, 0))
+        self.assertFalse(PostCounterShard.objects.exclude(like_delta=0).exists())
+
+
+# ---- Notifications ----
+class NotificationTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = (self.make_user(n) for n in ("alice", "bob", "carol"))
+        self.post = Post.objects.create(author=self.alice, content="hello")
+
+    def like(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=user, post=self.post)
+
+    def unlike(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.filter(user=user, post=self.post).delete()
+
+    def test_likes_coalesce_by_distinct_sender(self):
+        self.like(self.bob)
+        first = Notification.objects.get(recipient=self.alice)
+        self.unlike(self.bob)
+        self.like(self.bob)
+        self.like(self.carol)
+        n = Notification.objects.get(recipient=self.alice)
+        self.assertEqual((n.actor_count, n.actor_ids, n.sender_id), (2, [self.bob.id, self.carol.id], self.carol.id))
+        self.assertEqual(n.message, "carol and 1 other liked your post")
+        self.assertEqual(n.created_at, first.created_at)
+
+    def test_read_notifications_are_not_merged(self):
+        self.like(self.bob)
+        Notification.objects.update(is_read=True)
+        self.like(self.carol)
+        self.assertEqual(Notification.objects.filter(recipient=self.alice).count(), 2)
+
+    def test_unread_count(self):
+        self.login(self.alice)
+        self.like(self.bob)
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").data["unread_count"], 1)
+        self.client.post("/api/notifications/mark-all-read/")
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").data["unread_count"], 0)
+
+
+# ---- Shared cache ----
+class SharedCacheTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.login(self.alice)
+        Post.objects.create(author=self.alice, content="hello")
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_cache_is_not_used(self):
+        cache.set(unread_key(self.alice.id), 5)
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").data["unread_count"], 0)
+        response = self.client.get("/api/posts/")
+        self.assertNotIn("ETag", response)
+        with self.assertNumQueries(1):
+            self.client.get("/api/posts/")
+
+    @override_settings(SHARED_CACHE=True)
+    def test_shared_cache_serves_responses_and_unread_counts(self):
+        etag = self.client.get("/api/posts/")["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get("/api/posts/").data["results"]), 1)
+            self.assertEqual(self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        cache.set(unread_key(self.alice.id), 5)
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").data["unread_count"], 5)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_cascaded_notifications_reset_unread_counts(self):
+        bob, carol = self.make_user("bob"), self.make_user("carol")
+        post = Post.objects.get(author=self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=bob, post=post)
+            Follow.objects.create(follower=carol, following=self.alice)
+        unread = lambda: self.client.get("/api/notifications/unread-count/").data["unread_count"]
+        self.assertEqual(unread(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(unread(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            carol.delete()
+        self.assertEqual(unread(), 0)
+
+
+# ---- Realtime ----
+class RealtimeTests(SocialTestCase):
+    def test_stream_is_asgi_only(self):
+        self.login(self.make_user("alice"))
+        self.assertEqual(self.client.get("/api/stream/").status_code, 404)  # ASYNC_VIEWS is off
+        response = async_to_sync(event_stream)(RequestFactory().get("/api/stream/"))
+        self.assertEqual(response.status_code, 501)
+
+    def test_stream_tickets(self):
+        alice = self.make_user("alice")
+        request = RequestFactory().post("/api/stream/ticket/")
+        force_authenticate(request, alice)
+        ticket = StreamTicketView.as_view()(request).data["ticket"]
+        stream_user = lambda **query: _stream_user(RequestFactory().get("/api/stream/", query))
+        self.assertEqual(stream_user(ticket=ticket), alice)
+        self.assertIsNone(stream_user(ticket=ticket))  # single use
+        self.assertIsNone(stream_user(ticket=ticket[:-2]))
+        with override_settings(REALTIME_TICKET_TTL=-1):
+            self.assertIsNone(stream_user(ticket=issue_ticket(alice)))
+        # a JWT in the query string is not accepted
+        self.assertIsNone(stream_user(token=str(RefreshToken.for_user(alice).access_token)))
+
+    def test_memory_broker_ids_increase_across_restarts(self):
+        def publish_one(broker):
+            broker.channels["user:1"] = _Channel(10)  # as if subscribed
+            broker.publish("user:1", "post", {})
+            return int(broker.channels["user:1"].buffer[-1].id)
+
+        before, after = publish_one(MemoryBroker()), publish_one(MemoryBroker())
+        self.assertGreater(after, before)
+
+
+# ---- Viewer state ----
+class ViewerStateTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = self.make_user("alice"), self.make_user("bob")
+        self.liked = Post.objects.create(author=self.bob, content="liked")
+        self.other = Post.objects.create(author=self.bob, content="other")
+        Like.objects.create(user=self.alice, post=self.liked)
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        self.login(self.alice)
+
+    def test_post_list_viewer_state(self):
+        rows = self.client.get("/api/posts/?include=viewer_state").data["results"]
+        state = {row["id"]: row["viewer_state"] for row in rows}
+        self.assertEqual(state, {self.liked.id: {"liked": True}, self.other.id: {"liked": False}})
+        self.assertEqual(rows[0]["author"]["viewer_state"], {"following": False, "followed_by": True})
+        self.assertNotIn("viewer_state", self.client.get("/api/posts/").data["results"][0])
+
+    def test_batch_endpoints(self):
+        ids = f"{self.liked.id},{self.other.id}"
+        self.assertEqual(self.client.get(f"/api/posts/like-status/?ids={ids}").data, {"liked": [self.liked.id]})
+        response = self.client.post("/api/users/relationships/", {"ids": [self.bob.id]}, format="json")
+        self.assertEqual(response.data, {"following": [], "followed_by": [self.bob.id]})
+        self.assertEqual(self.client.get("/api/posts/like-status/?ids=x").status_code, 400)
+
+
+# ---- Response cache ----
+@override_settings(SHARED_CACHE=True)
+class ResponseCacheTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = self.make_user("alice"), self.make_user("bob")
+        self.posts = [Post.objects.create(author=self.bob, content=f"post {i}")
+                      for i in range(KeysetPagination.page_size + 1)]
+        self.login(self.alice)
+
+    def assertCached(self, url, cached=True):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url).data
+        self.assertEqual(len(queries) == 0, cached, url)
+        return data
+
+    def test_like_only_invalidates_pages_showing_the_post(self):
+        first = self.client.get("/api/posts/").data
+        second_url = first["next"]
+        self.client.get(second_url)
+        other = f"/api/posts/{self.posts[0].pk}/"
+        self.client.get(other)
+        Like.objects.create(user=self.alice, post=self.posts[-1])
+        self.assertCached(second_url)
+        self.assertCached(other)
+        self.assertEqual(self.assertCached("/api/posts/", cached=False)["results"][0]["like_count"], 1)
+        self.assertEqual(self.assertCached(f"/api/posts/{self.posts[-1].pk}/", cached=False)["like_count"], 1)
+
+    def test_new_post_invalidates_the_list(self):
+        self.client.get("/api/posts/")
+        self.client.post("/api/posts/", {"content": "fresh"}, format="json")
+        self.assertEqual(self.assertCached("/api/posts/", cached=False)["results"][0]["content"], "fresh")
+
+    def test_profiles_are_invalidated_one_at_a_time(self):
+        carol = self.make_user("carol")
+        urls = {u: f"/api/profiles/{u.profile.pk}/" for u in (self.alice, self.bob, carol)}
+        for url in urls.values():
+            self.client.get(url)
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertCached(urls[carol])
+        self.assertEqual(self.assertCached(urls[self.bob], cached=False)["followers_count"], 1)
+        self.assertEqual(self.assertCached(urls[self.alice], cached=False)["following_count"], 1)
+        self.make_user("dave")
+        self.assertCached(urls[carol])
+
+    def test_user_edit_invalidates_responses_embedding_them(self):
+        url = f"/api/posts/{self.posts[0].pk}/"
+        self.client.get(url)
+        self.bob.first_name = "Robert"
+        self.bob.save()
+        self.assertEqual(self.assertCached(url, cached=False)["author"]["first_name"], "Robert")
+
+
+# ---- Fragments ----
+@override_settings(SHARED_CACHE=True)
+class FragmentTests(SocialTestCase):
+    def test_user_fragments_are_versioned_per_user(self):
+        alice, bob = self.make_user("alice"), self.make_user("bob")
+        key = fragments.user_key(bob, {})
+        self.assertEqual(UserSerializer(bob).data["username"], "bob")
+        self.make_user("carol")
+        alice.first_name = "Alice"
+        alice.save()
+        self.assertEqual(fragments.user_key(bob, {}), key)
+        User.objects.filter(pk=bob.pk).update(first_name="Robert")  # no signal: the fragment is served
+        self.assertEqual(UserSerializer(User.objects.get(pk=bob.pk)).data["first_name"], "")
+        bob.refresh_from_db()
+        bob.save()
+        self.assertNotEqual(fragments.user_key(bob, {}), key)
+        self.assertEqual(UserSerializer(bob).data["first_name"], "Robert")
+
+    @override_settings(SHARED_CACHE=False)
+    def test_user_fragments_need_a_shared_cache(self):
+        bob = self.make_user("bob")
+        UserSerializer(bob).data
+        User.objects.filter(pk=bob.pk).update(first_name="Robert")
+        self.assertEqual(UserSerializer(User.objects.get(pk=bob.pk)).data["first_name"], "Robert")
+
+
+# ---- JSON rendering ----
+class RendererTests(SocialTestCase):
+    def sample(self):
+        author = self.make_user("alice")
+        posts = [Post.objects.create(author=author, content=text) for text in ("plain", "é \u2028 \u2029 ünï")]
+        return {"next": None, "results": PostSerializer(posts, many=True).data, "n": 1.5, "ok": True}
+
+    def test_matches_drf_renderer(self):
+        data = self.sample()
+        expected = JSONRenderer().render(data)
+        self.assertEqual(renderers.FastJSONRenderer().render(data), expected)
+        with patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.FastJSONRenderer().render(data), expected)
+
+    def test_streamed_array_and_parser(self):
+        rows = [{"id": i, "text": "é"} for i in range(7)]
+        self.assertEqual(json.loads(b"".join(renderers.iter_json_array(iter(rows), chunk_size=3))), rows)
+        self.assertEqual(b"".join(renderers.iter_json_array(iter([]))), b"[]")
+        parsed = renderers.FastJSONParser().parse(io.BytesIO(renderers.dumps(rows)))
+        self.assertEqual(parsed, rows)
+
+
+# ---- Serializer field plans ----
+class FieldPlanEquivalenceTests(SocialTestCase):
+    """FieldPlanMixin renders exactly what plain ModelSerializer does."""
+
+    def setUp(self):
+        super().setUp()
+        alice = self.make_user("alice", first_name="Bénch")
+        bob = self.make_user("bob")
+        self.client.force_login(alice)  # sets last_login on one of them
+        posts = [Post.objects.create(author=alice, content="plain", like_count=3),
+                 Post.objects.create(author=bob, content="ünï \u2028", image_url="https://example.com/a.png")]
+        Comment.objects.create(author=bob, post=posts[0], content="hi")
+        Notification.objects.create(recipient=alice, sender=bob, notification_type="like", post=posts[0],
+                                    message="bob liked your post")
+        Notification.objects.create(recipient=alice, sender=bob, notification_type="follow",
+                                    message="bob started following you")
+
+    def render_both(self, serializer_class, instances, **context):
+        render = renderers.FastJSONRenderer().render
+        new = render(serializer_class(instances, many=True, context=context).data)
+        with patch.object(FieldPlanMixin, "to_representation", serializers.ModelSerializer.to_representation):
+            old = render(serializer_class(instances, many=True, context=context).data)
+        return old, new
+
+    def test_identical_output(self):
+        for serializer_class, model in ((UserSerializer, User), (PostSerializer, Post),
+                                        (CommentSerializer, Comment), (NotificationSerializer, Notification)):
+            select, prefetch, _ = query_plan(serializer_class)
+            instances = list(model.objects.select_related(*select).prefetch_related(*prefetch).order_by("id"))
+            with self.subTest(serializer_class.__name__):
+                old, new = self.render_both(serializer_class, instances, fragments=False)
+                self.assertEqual(new, old)
+                with override_settings(SHARED_CACHE=True):
+                    self.render_both(serializer_class, instances)  # fills the fragment cache
+                    self.assertEqual(self.render_both(serializer_class, instances)[1], old)
+
+
+# ---- Admin exports and bulk actions ----
+class AdminBulkTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user("admin", is_staff=True)
+        self.bob = self.make_user("bob")
+        self.login(self.admin)
+
+    def test_nothing_cascades_from_likes_or_comments(self):
+        # bulk_delete_posts deletes them with _raw_delete, which skips cascades
+        self.assertEqual([rel.name for model in (Like, Comment) for rel in model._meta.related_objects], [])
+
+    def test_csv_columns_come_from_the_serializer(self):
+        Post.objects.create(author=self.bob, content="no image")
+        post = Post.objects.create(author=self.bob, content="image")
+        Post.objects.filter(pk=post.pk).update(image_variants={"160": "https://example.com/a-160.png"})
+        response = self.client.get("/api/admin/posts/?export=csv")
+        lines = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(lines[0], ["id", "author.id", "author.username", "author.email", "author.first_name",
+                                    "author.last_name", "author.last_login", "author.date_joined", "content",
+                                    "image_url", "image_variants", "category", "is_active", "like_count",
+                                    "comment_count", "created_at", "updated_at"])
+        self.assertEqual([len(line) for line in lines[1:]], [len(lines[0])] * 2)
+        self.assertEqual(json.loads(lines[2][10]), {"160": "https://example.com/a-160.png"})
+
+    @override_settings(SHARED_CACHE=True)
+    def test_bulk_delete_posts(self):
+        post = Post.objects.create(author=self.bob, content="doomed")
+        Profile.objects.filter(user=self.bob).update(posts_count=1)
+        fan_out_post(post)
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.admin, post=post)
+            Comment.objects.create(author=self.admin, post=post, content="bye")
+        self.login(self.bob)
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").data["unread_count"], 2)
+        likes_before = stats.totals()["likes"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk_delete_posts(Post.objects.filter(pk=post.pk)), 1)
+        self.assertFalse(Like.objects.exists() or Comment.objects.exists() or TimelineEntry.objects.exists())
+        self.assertEqual(stats.totals()["likes"], likes_before - 1)
+        self.assertEqual(Profile.objects.get(user=self.bob).posts_count, 0)
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").data["unread_count"], 0)
+
+    def test_decrements_clamp_drifted_counters_to_zero(self):
+        Profile.objects.filter(user=self.bob).update(posts_count=2)
+        incr(Profile, "posts_count", -5, user=self.bob)
+        self.assertEqual(Profile.objects.get(user=self.bob).posts_count, 0)
+
+
+# ---- Stats ----
+class StatsTests(SocialTestCase):
+    def test_rollup_follows_writes_and_migration_seeds_it(self):
+        alice, bob = self.make_user("alice"), self.make_user("bob")
+        post = Post.objects.create(author=alice, content="hello")
+        Like.objects.create(user=bob, post=post)
+        expected = {"signups": 2, "posts": 1, "comments": 0, "likes": 1, "follows": 0}
+        self.assertEqual(stats.totals(), expected)
+        self.assertEqual(stats.series(["posts"], "day", post.created_at, post.created_at + timedelta(days=1))
+                         ["posts"][0]["count"], 1)
+        StatBucket.objects.all().delete()  # as on a database that predates the rollup
+        migration = importlib.import_module("social.migrations.0014_seed_stat_buckets")
+        migration.seed_stat_buckets(apps, None)
+        self.assertEqual(stats.totals(), expected)
+
+
+# ---- Search ----
+class SearchTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        search.get_backend.cache_clear()  # the in-process index outlives test transactions
+        self.addCleanup(search.get_backend.cache_clear)
+        self.alice = self.make_user("alice_smith")
+        self.kept = Post.objects.create(author=self.alice, content="Gardening tips for tomato plants")
+        self.gone = Post.objects.create(author=self.alice, content="Tomato soup recipe")
+
+    def search(self, q, kind="all"):
+        return self.client.get("/api/search/", {"q": q, "type": kind}).data
+
+    def test_posts_and_users(self):
+        self.assertEqual([p["id"] for p in self.search("tomato gardening", "posts")["posts"]],
+                         [self.kept.id, self.gone.id])
+        self.assertEqual([u["username"] for u in self.search("ali", "users")["users"]], ["alice_smith"])
+
+    def test_index_follows_writes(self):
+        self.search("tomato")  # builds the index
+        self.gone.is_active = False
+        self.gone.save()
+        fresh = Post.objects.create(author=self.alice, content="tomato harvest")
+        self.assertEqual({p["id"] for p in self.search("tomato", "posts")["posts"]}, {self.kept.id, fresh.id})
+        self.alice.username = "alice_jones"
+        self.alice.save()
+        self.assertEqual(self.search("smith", "users")["users"], [])
+
+    def test_rebuild_command_leaves_the_python_index_alone(self):
+        with patch.object(search.PythonSearch, "build") as build:
+            out = io.StringIO()
+            call_command("rebuild_search_index", stdout=out)
+        build.assert_not_called()
+        self.assertIn("Nothing done", out.getvalue())
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get("/api/search/", {"q": "x", "type": "groups"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/search/", {"q": "x", "limit": "many"}).status_code, 400)
+
+
+# ---- Follow suggestions ----
+class SuggestionTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = (self.make_user(n) for n in ("alice", "bob", "carol"))
+        Follow.objects.create(follower=self.carol, following=self.alice)
+        suggestions.refresh()  # every row computed, nothing stale
+        self.login(self.alice)
+
+    def stale(self):
+        return set(FollowSuggestions.objects.filter(stale_since__isnull=False).values_list("user_id", flat=True))
+
+    def follow_queries(self, target):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(f"/api/users/{target.id}/follow/")
+        return len(queries)
+
+    def test_neighbours_marked_by_the_worker(self):
+        self.client.post(f"/api/users/{self.bob.id}/follow/")
+        self.assertEqual(self.stale(), {self.alice.id, self.bob.id})
+        self.assertEqual(suggestions.spread(), 1)
+        self.assertEqual(self.stale(), {self.alice.id, self.bob.id, self.carol.id})
+        suggestions.refresh_stale()
+        self.assertEqual(self.stale(), set())
+        items = FollowSuggestions.objects.get(user=self.carol).items
+        self.assertEqual([item[0] for item in items], [self.bob.id])
+
+    @override_settings(STATS_SHARDS=1)
+    def test_follow_cost_ignores_follower_count(self):
+        self.follow_queries(self.bob)  # first follow of the hour creates the stats bucket
+        few = self.follow_queries(self.make_user("dave"))
+        for i in range(20):
+            Follow.objects.create(follower=self.make_user(f"fan{i}"), following=self.alice)
+        self.assertEqual(self.follow_queries(self.make_user("erin")), few)
+
+
+# ---- ASGI ----
+class AsgiTests(SocialTestCase):
+    def test_connections_not_kept_by_default(self):
+        self.assertEqual(load_settings(ASGI=None, DB_CONN_MAX_AGE=None).DB_CONN_MAX_AGE, 600)
+        self.assertEqual(load_settings(ASGI="1", DB_CONN_MAX_AGE=None).DB_CONN_MAX_AGE, 0)
+        self.assertEqual(load_settings(ASGI="1", DB_CONN_MAX_AGE="60").DB_CONN_MAX_AGE, 60)
+        with patch.dict(os.environ):
+            importlib.reload(importlib.import_module("backend.asgi"))
+            self.assertEqual(os.environ["ASGI"], "1")
+
+
+# ---- Async views ----
+@test_settings
+class AsyncViewTests(SocialTestMixin, TransactionTestCase):
+    """gather_queries runs lookups on other threads, which only see committed rows."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = self.make_user("alice"), self.make_user("bob")
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.posts = [Post.objects.create(author=self.bob, content=f"post {i}") for i in range(3)]
+        for post in self.posts:
+            fan_out_post(post)
+        Like.objects.create(user=self.alice, post=self.posts[0])
+        self.factory = AsyncRequestFactory()
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.alice).access_token}"}
+
+    def call(self, view, method, path, **kwargs):
+        request = getattr(self.factory, method)(path, headers=self.auth)
+        response = async_to_sync(view)(request, **kwargs)
+        return response.render() if hasattr(response, "render") else response  # DRF fallbacks
+
+    def test_feed_matches_drf(self):
+        self.login(self.alice)
+        for params in ("", "?ranking=trending"):
+            response = self.call(async_views.feed, "get", f"/api/feed/{params}")
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            self.assertEqual(data, json.loads(self.client.get(f"/api/feed/{params}").content))
+            self.assertEqual({p["id"] for p in data["results"]}, {p.id for p in self.posts})
+        self.assertEqual(data["results"][0]["id"], self.posts[0].id)  # the liked post trends
+
+    def test_like_and_follow(self):
+        post, carol = self.posts[1], self.make_user("carol")
+        self.assertEqual(json.loads(self.call(async_views.like, "post", "/", pk=post.pk).content), {"liked": True})
+        self.assertTrue(Like.objects.filter(user=self.alice, post=post).exists())
+        self.call(async_views.like, "delete", "/", pk=post.pk)
+        self.assertFalse(Like.objects.filter(user=self.alice, post=post).exists())
+        self.call(async_views.follow, "post", "/", pk=carol.pk)
+        self.assertTrue(Follow.objects.filter(follower=self.alice, following=carol).exists())
+        self.call(async_views.follow, "delete", "/", pk=carol.pk)
+        self.assertFalse(Follow.objects.filter(follower=self.alice, following=carol).exists())
+
+    def test_edge_cases_fall_back_to_drf(self):
+        self.auth = {}
+        self.assertEqual(self.call(async_views.feed, "get", "/api/feed/").status_code, 401)
+        self.auth = {"Authorization": "Bearer not-a-token"}
+        self.assertEqual(self.call(async_views.notifications, "get", "/api/notifications/").status_code, 401)
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.alice).access_token}"}
+        self.assertEqual(self.call(async_views.follow, "post", "/", pk=self.alice.pk).status_code, 400)
+        self.assertEqual(self.call(async_views.like, "post", "/", pk=0).status_code, 404)
+
+
+# ---- Uploads ----
+class UploadTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name, UPLOAD_STORAGE="social.storage.LocalStorage")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        get_storage.cache_clear()  # LocalStorage reads MEDIA_ROOT once
+        self.addCleanup(get_storage.cache_clear)
+        self.root = media.name
+        self.alice = self.make_user("alice")
+        self.login(self.alice)
+
+    def upload(self, data, name="photo.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/uploads/images/", {"file": SimpleUploadedFile(name, data)})
+        self.assertEqual(response.status_code, 201)
+        return UploadedImage.objects.get(pk=response.data["id"])
+
+    def stored(self, image):
+        return os.path.exists(os.path.join(self.root, image.path))
+
+    def image_bytes(self, fmt, size=(600, 300)):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "teal").save(buffer, fmt)
+        return buffer.getvalue()
+
+    def files(self):
+        return [name for _, _, names in os.walk(self.root) for name in names]
+
+    def rejected(self, data, name="photo.png"):
+        response = self.client.post("/api/uploads/images/", {"file": SimpleUploadedFile(name, data)})
+        self.assertEqual(response.status_code, 400)
+        return response.data["detail"]
+
+    def test_type_from_content(self):
+        image = self.upload(self.image_bytes("JPEG", (100, 50)), name="notes.txt")
+        self.assertEqual(image.content_type, "image/jpeg")
+        self.assertTrue(image.path.endswith("-notes.jpg") and image.url.endswith(image.path))
+        self.assertEqual(self.rejected(b"GIF89a" + b"\0" * 100, name="cat.png"), "Only JPEG/PNG allowed.")
+        self.assertEqual(len(self.files()), 1)  # the JPEG (too small for thumbnails); nothing of the GIF
+
+    def test_size_cap(self):
+        chunk = 64 * 1024
+        self.assertEqual(self.rejected(b"\x89PNG\r\n\x1a\n".ljust(2 * 1024 * 1024 + chunk, b"\0")),
+                         "Max file size is 2MB.")
+        # a declared body far over the cap is refused without being read
+        response = self.client.generic("POST", "/api/uploads/images/", b"",
+                                       content_type="multipart/form-data; boundary=x",
+                                       CONTENT_LENGTH=str(10 * 1024 * 1024))
+        self.assertEqual((response.status_code, response.data["detail"]), (400, "Max file size is 2MB."))
+        self.assertEqual(self.files(), [])
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_thumbnails(self):
+        image = self.upload(self.image_bytes("PNG"))
+        self.assertEqual((image.status, sorted(image.variants, key=int)), ("ready", ["160", "480"]))
+        self.assertTrue(self.stored(image))
+
+    def test_undecodable_original_deleted(self):
+        with self.assertLogs("social.uploads", "ERROR"):
+            image = self.upload(b"\x89PNG\r\n\x1a\n" + b"not really a png" * 64)
+        self.assertEqual(image.status, UploadedImage.FAILED)
+        self.assertFalse(self.stored(image))
+
+    def test_sweep_unfinished(self):
+        old = timezone.now() - timedelta(hours=30)
+        images = {}
+        for label, status in (("pending", "pending"), ("failed", "failed"), ("used", "failed"), ("ready", "ready"),
+                              ("recent", "pending")):
+            path = f"{self.alice.id}/{label}.png"
+            get_storage().save(path, b"png", "image/png")
+            images[label] = UploadedImage.objects.create(
+                owner=self.alice, path=path, url=f"http://localhost:8000/media/{path}",
+                content_type="image/png", status=status)
+        UploadedImage.objects.exclude(pk=images["recent"].pk).update(created_at=old)
+        Post.objects.create(author=self.alice, content="x", image_url=images["used"].url)
+        out = io.StringIO()
+        call_command("process_uploads", "--min-age", "999999", "--sweep-hours", "24", stdout=out)
+        self.assertIn("Deleted 2 uploads", out.getvalue())
+        self.assertEqual(set(UploadedImage.objects.values_list("path", flat=True)),
+                         {images[label].path for label in ("used", "ready", "recent")})
+        self.assertEqual({label for label, image in images.items() if self.stored(image)},
+                         {"used", "ready", "recent"})
+
+
+# ---- Email outbox ----
+@override_settings(EMAIL_OUTBOX_PIPELINE="off")
+class OutboxTests(SocialTestCase):
+    def register(self, name="alice"):
+        data = {"username": name, "email": f"{name}@example.com", "password": "Str0ng-pass-4821!",
+                "password2": "Str0ng-pass-4821!"}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/auth/register/", data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_register_queues_instead_of_sending(self):
+        self.register()
+        self.assertEqual(mail.outbox, [])
+        message = OutboundEmail.objects.get()
+        self.assertEqual((message.status, message.to), (OutboundEmail.QUEUED, ["alice@example.com"]))
+        self.assertEqual(outbox.send_due(), (1, 1))
+        self.assertEqual([m.to for m in mail.outbox], [["alice@example.com"]])
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.SENT)
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+    @override_settings(EMAIL_OUTBOX_PIPELINE="sync")
+    def test_sync_mode_sends_after_commit(self):
+        self.register()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/auth/password-reset/", {"email": "ALICE@example.com"}, format="json")
+            self.client.post("/api/auth/password-reset/", {"email": "nobody@example.com"}, format="json")
+        self.assertEqual([m.subject for m in mail.outbox], ["Verify your SocialConnect account", "Password reset"])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_retries_then_gives_up(self):
+        self.register()
+        with patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("refused")):
+            self.assertEqual(outbox.send_due(), (1, 0))
+            message = OutboundEmail.objects.get()
+            self.assertEqual((message.status, message.attempts, message.last_error),
+                             (OutboundEmail.QUEUED, 1, "OSError: refused"))
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(outbox.send_due(), (0, 0))  # not due yet
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            with self.assertLogs("social.outbox", "ERROR"):
+                outbox.send_due()
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.FAILED)
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+
+# ---- Password hashing ----
+class PasswordHashingTests(SocialTestCase):
+    def load_settings(self, profile):
+        return load_settings(PASSWORD_HASH_PROFILE=profile).PASSWORD_PBKDF2_ITERATIONS
+
+    def test_settings_floor(self):
+        self.assertIsNone(self.load_settings("django"))
+        self.assertEqual(self.load_settings("owasp"), MIN_ITERATIONS)
+        self.assertEqual(self.load_settings("900000"), 900_000)
+        for profile in ("100000", "0", "fast"):
+            with self.assertRaises(ImproperlyConfigured):
+                self.load_settings(profile)
+
+    def test_hasher_clamps(self):
+        hasher = PBKDF2PasswordHasher()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.assertEqual(hasher.iterations, MIN_ITERATIONS)
+            self.assertTrue(hasher.must_update(hasher.encode("pass-4821!", hasher.salt(), iterations=1000)))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1_200_000):
+            self.assertEqual(hasher.iterations, 1_200_000)
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=None):
+            self.assertEqual(hasher.iterations, hashers.PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,36 @@
+"""Pillow thumbnail rendering.
+
+Runs in the upload pipeline's worker processes, so this module must not
+import Django models or settings.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# what Pillow raises for a file it cannot decode (truncated, corrupt, too large)
+UNDECODABLE = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+
+def render(data, sizes):
+    """[(size, bytes)] for each size smaller than the image's longest side.
+
+    Thumbnails keep the original format (JPEG or PNG) and aspect ratio, with
+    EXIF orientation applied.
+    """
+    with Image.open(BytesIO(data)) as original:
+        fmt = original.format
+        image = ImageOps.exif_transpose(original)
+        longest = max(image.size)
+        out = []
+        for size in sorted(sizes, reverse=True):
+            if size >= longest:
+                continue
+            image = image.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            if fmt == "JPEG":
+                image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+            else:
+                image.save(buffer, "PNG", optimize=True)
+            out.append((size, buffer.getvalue()))
+        return out
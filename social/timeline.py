@@ -0,0 +1,161 @@
+import heapq
+from functools import cached_property
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import realtime
+from .mixins import gather_queries
+from .models import Follow, Post, Profile, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    return getattr(settings, "TIMELINE_FANOUT_LIMIT", 10000)
+
+
+def trending_window():
+    return getattr(settings, "TIMELINE_TRENDING_WINDOW", 1000)
+
+
+def is_fanout_exempt(user_id):
+    """Authors above the fan-out limit are read on demand instead of pushed."""
+    return Profile.objects.filter(user_id=user_id, followers_count__gte=fanout_limit()).exists()
+
+
+def _chunks(iterable):
+    iterable = iter(iterable)
+    while True:
+        chunk = list(islice(iterable, BATCH_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert(entries):
+    for batch in _chunks(entries):
+        TimelineEntry.objects.bulk_create(batch, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Write `post` into its author's timeline and, unless the author is a
+    high-follower account, into every follower's timeline. Each owner also
+    gets a "post" event on their realtime stream."""
+    owner_ids = [post.author_id]
+    if not is_fanout_exempt(post.author_id):
+        follower_ids = (Follow.objects.filter(following_id=post.author_id)
+                        .values_list("follower_id", flat=True)
+                        .iterator(chunk_size=BATCH_SIZE))
+        owner_ids = chain(owner_ids, follower_ids)
+    event = {"id": post.id, "author_id": post.author_id, "created_at": post.created_at}
+    for chunk in _chunks(owner_ids):
+        _insert(TimelineEntry(owner_id=owner_id, post_id=post.id,
+                              author_id=post.author_id, created_at=post.created_at)
+                for owner_id in chunk)
+        realtime.publish((owner_id, "post", event) for owner_id in chunk)
+
+
+def backfill(owner_id, author_id):
+    """Copy the author's recent posts into owner's timeline (after a follow)."""
+    if owner_id != author_id and is_fanout_exempt(author_id):
+        return
+    size = getattr(settings, "TIMELINE_BACKFILL_SIZE", 200)
+    recent = (Post.objects.filter(author_id=author_id, is_active=True)
+              .order_by("-created_at", "-id").values_list("id", "created_at")[:size])
+    _insert(TimelineEntry(owner_id=owner_id, post_id=pid, author_id=author_id, created_at=ts)
+            for pid, ts in recent)
+
+
+def prune(owner_id, author_id):
+    """Drop the author's posts from owner's timeline (after an unfollow)."""
+    TimelineEntry.objects.filter(owner_id=owner_id, author_id=author_id).delete()
+
+
+class HomeTimeline:
+    """A user's home feed as a sliceable sequence of posts.
+
+    Materialized entries are read as a pre-sorted key range; posts by followed
+    high-follower authors are pulled at read time and merged in by
+    (created_at, id). Slicing returns `Post` instances; `seek()` restricts it
+    to posts strictly older than a (created_at, id) position, which is what
+    `KeysetPagination` uses.
+
+    With ranking="trending" the same two sources are ordered and merged by
+    (trending_score, id) instead, for `TrendingPagination`. The materialized
+    half ranks only the owner's newest TIMELINE_TRENDING_WINDOW entries (an
+    index range), not the whole timeline; recency is part of the score, so
+    older entries would rarely make the page anyway.
+    """
+    # ranking -> the Post column the feed is ordered by
+    ORDERINGS = {"latest": "created_at", "trending": "trending_score"}
+
+    def __init__(self, user, ranking="latest"):
+        self.user = user
+        self.position = None
+        self.field = self.ORDERINGS[ranking]
+
+    def _pulled_authors(self):
+        following = Follow.objects.filter(follower=self.user).values("following_id")
+        return Profile.objects.filter(user_id__in=following, followers_count__gte=fanout_limit()).values("user_id")
+
+    @cached_property
+    def pulled_author_ids(self):
+        return [row["user_id"] for row in self._pulled_authors()]
+
+    def seek(self, position):
+        self.position = position
+        return self
+
+    def _before(self, qs, field, id_field):
+        if self.position is None:
+            return qs
+        value, pk = self.position
+        return qs.filter(**{f"{field}__lte": value}).filter(
+            Q(**{f"{field}__lt": value}) | Q(**{f"{id_field}__lt": pk})
+        )
+
+    def _materialized_keys(self, limit):
+        field = self.field
+        entries = TimelineEntry.objects.filter(owner=self.user)
+        if field == "created_at":
+            # TimelineEntry mirrors the post's created_at: a range scan
+            entries = self._before(entries.filter(post__is_active=True), field, "post_id")
+            return entries.order_by(f"-{field}", "-post_id").values_list(field, "post_id")[:limit]
+        window = entries.order_by("-created_at", "-post_id").values("post_id")[:trending_window()]
+        posts = self._before(Post.objects.filter(id__in=window, is_active=True), field, "id")
+        return posts.order_by(f"-{field}", "-id").values_list(field, "id")[:limit]
+
+    def _pulled_keys(self, author_ids, limit):
+        # skip posts that were fanned out before the author crossed the limit
+        field = self.field
+        already = TimelineEntry.objects.filter(owner=self.user, author_id__in=author_ids).values("post_id")
+        posts = Post.objects.filter(author_id__in=author_ids, is_active=True).exclude(id__in=already)
+        return self._before(posts, field, "id").order_by(f"-{field}", "-id").values_list(field, "id")[:limit]
+
+    def keys(self, limit):
+        """(created_at or trending_score, post_id) pairs, best first, at most `limit` of them."""
+        keys = self._materialized_keys(limit)
+        if not self.pulled_author_ids:
+            return list(keys)
+        pulled = self._pulled_keys(self.pulled_author_ids, limit)
+        return list(islice(heapq.merge(keys, pulled, reverse=True), limit))
+
+    async def afetch(self, limit):
+        """self[:limit] for async views: both key ranges are read concurrently
+        (the pulled authors as a subquery), then the posts in one query."""
+        keys, pulled = await gather_queries(
+            lambda: list(self._materialized_keys(limit)),
+            lambda: list(self._pulled_keys(self._pulled_authors(), limit)),
+        )
+        ids = [pid for _, pid in islice(heapq.merge(keys, pulled, reverse=True), limit)]
+        posts = await Post.objects.select_related("author").ain_bulk(ids)
+        return [posts[pid] for pid in ids if pid in posts]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None or key.stop is None:
+            raise TypeError("HomeTimeline only supports bounded slices.")
+        ids = [pid for _, pid in self.keys(key.stop)[key.start or 0:]]
+        posts = Post.objects.select_related("author").in_bulk(ids)
+        return [posts[pid] for pid in ids if pid in posts]
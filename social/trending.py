@@ -0,0 +1,70 @@
+import math
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Ln
+from rest_framework.exceptions import ValidationError
+
+from .models import Post
+
+RANKINGS = ("latest", "trending")
+
+# engagement = sum(weight * counter)
+WEIGHTS = {"like_count": 1, "comment_count": 2}
+
+
+def _seconds_per_e():
+    # TRENDING_TENFOLD_SECONDS: a post needs 10x the engagement to rank level
+    # with one posted this much later
+    return getattr(settings, "TRENDING_TENFOLD_SECONDS", 45000) / math.log(10)
+
+
+def score(like_count, comment_count, created_at):
+    """ln(1 + engagement) + age bonus.
+
+    Recency enters as created_at itself rather than as an age, so a post's
+    score only changes when its engagement does and never needs re-scoring
+    as time passes.
+    """
+    engagement = WEIGHTS["like_count"] * like_count + WEIGHTS["comment_count"] * comment_count
+    return math.log1p(max(engagement, 0)) + created_at.timestamp() / _seconds_per_e()
+
+
+def adjust(**new):
+    """Update expression moving trending_score along with new counter values.
+
+    `new` maps counter fields to the expressions they are being set to in the
+    same UPDATE (e.g. like_count=F("like_count") + 1); SQL evaluates the
+    right-hand side against the old row, so the created_at term cancels out.
+    """
+    old_engagement = sum(w * F(field) for field, w in WEIGHTS.items())
+    new_engagement = sum(w * new.get(field, F(field)) for field, w in WEIGHTS.items())
+    return F("trending_score") + Ln(1 + new_engagement) - Ln(1 + old_engagement)
+
+
+def refresh(queryset=None, batch_size=2000):
+    """Recompute scores from scratch, e.g. after reconcile_counters. Returns rows written."""
+    qs = (queryset if queryset is not None else Post.objects.all()).order_by("pk")
+    fields = ("pk", "like_count", "comment_count", "created_at", "trending_score")
+    written, last = 0, 0
+    while True:
+        rows = list(qs.filter(pk__gt=last).only(*fields)[:batch_size])
+        if not rows:
+            return written
+        changed = []
+        for post in rows:
+            value = score(post.like_count, post.comment_count, post.created_at)
+            if not math.isclose(post.trending_score, value, rel_tol=0, abs_tol=1e-6):
+                post.trending_score = value
+                changed.append(post)
+        Post.objects.bulk_update(changed, ["trending_score"])
+        written += len(changed)
+        last = rows[-1].pk
+
+
+def ranking(request):
+    """The ?ranking= a list view was asked for: "latest" (default) or "trending"."""
+    value = request.query_params.get("ranking", "latest")
+    if value not in RANKINGS:
+        raise ValidationError({"ranking": [f"Expected one of {', '.join(RANKINGS)}."]})
+    return value
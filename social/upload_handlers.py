@@ -0,0 +1,89 @@
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from .storage import StorageError, get_storage
+from .uploads import sniff, storage_path
+
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024
+FORM_OVERHEAD = 64 * 1024  # multipart boundaries, headers and small fields
+
+
+class StoredImage(UploadedFile):
+    """The request.FILES entry for an image that is already in storage."""
+
+    def __init__(self, name, content_type, size, path, url):
+        super().__init__(None, name, content_type, size)
+        self.path, self.url = path, url
+
+    def close(self):
+        pass
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Streams the "file" field of a multipart upload straight into storage.
+
+    The type comes from the file's magic bytes, not the client's header, and
+    the size cap is enforced as chunks arrive, so an oversized or non-image
+    upload is stopped after at most one chunk and memory stays at one chunk
+    whatever the file size. On failure `error` holds (status, message) and
+    nothing is left in storage.
+    """
+
+    def __init__(self, request=None, field_name="file", max_size=MAX_UPLOAD_SIZE):
+        super().__init__(request)
+        self.field, self.max_size = field_name, max_size
+        self.writer = self.path = self.stored = self.error = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + FORM_OVERHEAD:
+            # don't read the body at all
+            self.error = (400, "Max file size is 2MB.")
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.field and self.stored is None and self.writer is None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            raise SkipFile()
+        if self.writer is None:
+            self.content_type = sniff(raw_data)
+            if self.content_type is None:
+                self.stop(400, "Only JPEG/PNG allowed.")
+            self.path = storage_path(self.request.user.id, self.file_name, self.content_type)
+            try:
+                self.writer = get_storage().open(self.path, self.content_type)
+            except StorageError:
+                self.stop(500, "Upload failed")
+        if start + len(raw_data) > self.max_size:
+            self.stop(400, "Max file size is 2MB.")
+        try:
+            self.writer.write(raw_data)
+        except StorageError:
+            self.stop(500, "Upload failed")
+
+    def file_complete(self, file_size):
+        if not self.active or self.writer is None:
+            return None
+        writer, self.writer = self.writer, None
+        try:
+            url = writer.close()
+        except StorageError:
+            self.error = (500, "Upload failed")
+            return None
+        self.stored = StoredImage(self.file_name, self.content_type, file_size, self.path, url)
+        return self.stored
+
+    def stop(self, status, message):
+        self.error = (status, message)
+        self.discard()
+        raise StopUpload(connection_reset=False)  # the body is capped, so drain it
+
+    def discard(self):
+        """Drop a partly written file (after an error or a broken request)."""
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
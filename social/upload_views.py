@@ -1,31 +1,37 @@
-import uuid
-from django.conf import settings
+from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
-from supabase import create_client, Client
 
-def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+from .models import UploadedImage
+from .upload_handlers import ImageUploadHandler
+from .uploads import pipeline
+
 
 class UploadImageView(APIView):
+    """Stream the original into storage and return its URL; thumbnails are
+    made in the background."""
     permission_classes = [IsAuthenticated]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # before anything reads the body
+        self.upload_handler = ImageUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
     def post(self, request):
-        file = request.FILES.get("file")
+        handler = self.upload_handler
+        try:
+            file = request.FILES.get("file")
+        finally:
+            handler.discard()
+        if handler.error:
+            status, detail = handler.error
+            return Response({"detail": detail}, status=status)
         if not file:
             return Response({"detail": "No file provided."}, status=400)
-        if file.size > 2 * 1024 * 1024:
-            return Response({"detail": "Max file size is 2MB."}, status=400)
-        if file.content_type not in ["image/jpeg", "image/png"]:
-            return Response({"detail": "Only JPEG/PNG allowed."}, status=400)
 
-        filename = f"{request.user.id}/{uuid.uuid4().hex}-{file.name}"
-        supabase = get_supabase()
-        bucket = settings.SUPABASE_BUCKET or "images"
-        res = supabase.storage.from_(bucket).upload(path=filename, file=file, file_options={"contentType": file.content_type})
-        if res.get("error"):
-            return Response({"detail": "Upload failed"}, status=500)
-        public_url = supabase.storage.from_(bucket).get_public_url(filename)
-        return Response({"url": public_url}, status=201)
+        image = UploadedImage.objects.create(
+            owner=request.user, path=file.path, url=file.url, content_type=file.content_type)
+        transaction.on_commit(lambda: pipeline.submit(image.pk))
+        return Response({"id": image.pk, "url": image.url, "status": image.status}, status=201)
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from . import thumbnails
+from .models import Post, UploadedImage
+from .response_cache import bump
+from .storage import StorageError, get_storage
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png"}
+SIGNATURES = {b"\xff\xd8\xff": "image/jpeg", b"\x89PNG\r\n\x1a\n": "image/png"}
+
+
+def sniff(head):
+    """The content type for the first bytes of a file, or None if it is not JPEG/PNG."""
+    return next((ctype for magic, ctype in SIGNATURES.items() if head.startswith(magic)), None)
+
+
+def thumbnail_sizes():
+    return getattr(settings, "UPLOAD_THUMBNAIL_SIZES", (160, 480, 1080))
+
+
+def storage_path(user_id, filename, content_type):
+    """"<user id>/<random>-<name><ext>"; the extension follows the content type
+    so the URL passes Post.image_url validation whatever the file was called."""
+    stem = get_valid_filename(os.path.splitext(filename or "")[0])[:80] or "image"
+    return f"{user_id}/{uuid.uuid4().hex}-{stem}{EXTENSIONS[content_type]}"
+
+
+def variant_path(path, size):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}-{size}{ext}"
+
+
+def finish(image, rendered):
+    """Store rendered thumbnails and copy the variants onto posts using the image."""
+    storage = get_storage()
+    image.variants = {str(size): storage.save(variant_path(image.path, size), data, image.content_type)
+                      for size, data in rendered}
+    image.status = UploadedImage.READY
+    image.save(update_fields=["variants", "status"])
+    # updated_at moves so cached post fragments pick up the variants
+    post_ids = list(Post.objects.filter(image_url=image.url).values_list("pk", flat=True))
+    if post_ids:
+        Post.objects.filter(pk__in=post_ids).update(image_variants=image.variants, updated_at=timezone.now())
+        bump(*(f"post:{pk}" for pk in post_ids))
+
+
+def stored_paths(image):
+    """The original and any thumbnails stored for an upload."""
+    return [image.path] + [variant_path(image.path, size) for size in image.variants]
+
+
+def fail(image, discard=False):
+    """Mark an upload failed; `discard` also deletes the stored original (for
+    files Pillow cannot decode, which a retry would not fix)."""
+    logger.exception("Could not make thumbnails for %s", image.url)
+    UploadedImage.objects.filter(pk=image.pk).update(status=UploadedImage.FAILED)
+    if discard:
+        try:
+            get_storage().delete(*stored_paths(image))
+        except StorageError:
+            logger.exception("Could not delete %s; `process_uploads` sweeps it later", image.url)
+
+
+def sweep(older_than):
+    """Delete uploads still pending or failed after `older_than` (a timedelta),
+    files and rows, unless a post uses the image. Returns uploads deleted."""
+    unfinished = (UploadedImage.objects.filter(status__in=[UploadedImage.PENDING, UploadedImage.FAILED],
+                                               created_at__lt=timezone.now() - older_than)
+                  .exclude(url__in=Post.objects.filter(image_url__gt="").values("image_url")))
+    storage, deleted = get_storage(), []
+    for image in unfinished.only("path", "variants").iterator():
+        try:
+            storage.delete(*stored_paths(image))
+        except StorageError:
+            logger.exception("Could not delete %s", image.path)
+            continue
+        deleted.append(image.pk)
+    UploadedImage.objects.filter(pk__in=deleted).delete()
+    return len(deleted)
+
+
+class ThumbnailPipeline:
+    """Renders upload thumbnails off the request path.
+
+    In "thread" mode a daemon worker takes every queued upload, renders them
+    in parallel on a pool of UPLOAD_THUMBNAIL_PROCESSES processes (Pillow
+    work is CPU-bound) and stores the results. "sync" renders inline, for
+    tests and serverless hosts that freeze background threads. Uploads lost
+    to a restart stay pending until `manage.py process_uploads` picks them up.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+        self.pool = None
+
+    @property
+    def mode(self):
+        return getattr(settings, "UPLOAD_PIPELINE", "thread")
+
+    def submit(self, image_id, data=None):
+        """Queue an UploadedImage; `data` saves reading the original back from storage."""
+        if self.mode == "sync":
+            self.process([(image_id, data)], pool=None)
+            return
+        self.queue.put((image_id, data))
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                # spawn: forking a process with live threads and DB connections is unsafe
+                self.pool = self.pool or ProcessPoolExecutor(
+                    max_workers=getattr(settings, "UPLOAD_THUMBNAIL_PROCESSES", 2),
+                    mp_context=multiprocessing.get_context("spawn"))
+                self.worker = threading.Thread(target=self._run, name="thumbnail-pipeline", daemon=True)
+                self.worker.start()
+
+    def _take_batch(self, block):
+        try:
+            batch = [self.queue.get(block=block)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def process(self, items, pool):
+        """Render and store thumbnails for [(image_id, data or None)]."""
+        images = UploadedImage.objects.in_bulk([image_id for image_id, _ in items])
+        storage, sizes, jobs = get_storage(), thumbnail_sizes(), []
+        for image_id, data in items:
+            image = images.get(image_id)
+            if image is None:
+                continue
+            try:
+                data = data if data is not None else storage.read(image.path)
+                job = pool.submit(thumbnails.render, data, sizes) if pool else thumbnails.render(data, sizes)
+                jobs.append((image, job))
+            except Exception as exc:
+                fail(image, discard=isinstance(exc, thumbnails.UNDECODABLE))
+        for image, job in jobs:
+            try:
+                finish(image, job.result() if pool else job)
+            except Exception as exc:
+                fail(image, discard=isinstance(exc, thumbnails.UNDECODABLE))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(block=True)
+            close_old_connections()
+            try:
+                self.process(batch, self.pool)
+            except Exception:
+                logger.exception("Dropped a batch of %d uploads", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self):
+        """Process everything queued so far in the calling thread."""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            try:
+                # inline: at exit the process pool may already be shut down
+                self.process(batch, pool=None)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+pipeline = ThumbnailPipeline()
+atexit.register(pipeline.flush)
+
+
+def variants_for(url):
+    """Thumbnail URLs recorded for an uploaded image URL ({} if none yet)."""
+    if not url:
+        return {}
+    return (UploadedImage.objects.filter(url=url, status=UploadedImage.READY)
+            .values_list("variants", flat=True).first()) or {}
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, ProfileViewSet, PostViewSet, CommentViewSet,
-    LikeViewSet, FollowViewSet, NotificationViewSet, AdminViewSet, feed_view
+    LikeViewSet, FollowViewSet, NotificationViewSet, AdminViewSet, feed_view, search_view
 )
+from .upload_views import UploadImageView
 from .auth_views import (
     RegisterView, LoginView, LogoutView, ChangePasswordView,
     PasswordResetView, PasswordResetConfirmView, VerifyEmailView
@@ -33,10 +35,34 @@ urlpatterns = [
     # Feed
     path("feed/", feed_view, name="feed"),
 
+    # Uploads
+    path("uploads/images/", UploadImageView.as_view(), name="upload-image"),
+
+    # Search
+    path("search/", search_view, name="search"),
+
     # Admin
     path("admin/users/", AdminViewSet.as_view({"get": "list_users"})),
     path("admin/users/<int:pk>/deactivate/", AdminViewSet.as_view({"post": "deactivate_user"})),
+    path("admin/users/bulk-deactivate/", AdminViewSet.as_view({"post": "bulk_deactivate_users"})),
     path("admin/posts/", AdminViewSet.as_view({"get": "list_posts"})),
+    path("admin/posts/bulk-delete/", AdminViewSet.as_view({"post": "bulk_delete_posts"})),
     path("admin/posts/<int:post_id>/", AdminViewSet.as_view({"delete": "delete_post"})),
     path("admin/stats/", AdminViewSet.as_view({"get": "stats"})),
+    path("admin/stats/timeseries/", AdminViewSet.as_view({"get": "stats_timeseries"})),
 ]
+
+if getattr(settings, "ASYNC_VIEWS", False):
+    # ASGI only: async fast paths that shadow the DRF routes above (see
+    # social/async_views.py), and the event stream
+    from . import async_views
+    from .realtime import StreamTicketView, event_stream
+    urlpatterns = [
+        path("feed/", async_views.feed),
+        path("notifications/", async_views.notifications),
+        path("posts/<int:pk>/like/", async_views.like),
+        path("users/<int:pk>/follow/", async_views.follow),
+        # Realtime (server-sent events)
+        path("stream/", event_stream, name="event-stream"),
+        path("stream/ticket/", StreamTicketView.as_view(), name="event-stream-ticket"),
+    ] + urlpatterns
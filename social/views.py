@@ -1,6 +1,8 @@
+from datetime import timedelta
+
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth.models import User
-from django.db.models import Q
 from rest_framework import viewsets, permissions, status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.decorators import action, api_view, permission_classes
@@ -11,7 +13,32 @@ from .serializers import (
     UserSerializer, ProfileSerializer, PostSerializer, CommentSerializer,
     LikeSerializer, FollowSerializer, NotificationSerializer
 )
+from .bulk import bulk_deactivate_users, bulk_delete_posts, bulk_filter, export_response
+from .counters import incr
+from . import stats
+from .mixins import OptimizedQuerysetMixin, with_query_budget
+from .notifications import bump_unread, reset_unread, unread_count as cached_unread_count
+from .pagination import KeysetPagination, TrendingPagination
+from .relationships import follow_relations, liked_post_ids, parse_ids, viewer_state_context
+from .response_cache import bump, cached_response, rows
+from .search import search_posts, search_users
+from . import suggestions
 from .permissions import IsOwnerOrReadOnly
+from .timeline import HomeTimeline, fan_out_post
+from . import trending
+
+# ---- Response cache scopes of the objects in a response ----
+def user_scopes(data):
+    return [f"user:{r['id']}" for r in rows(data)]
+
+def author_scopes(data):
+    return [f"user:{r['author']['id']}" for r in rows(data)]
+
+def post_scopes(data):
+    return [f"post:{r['id']}" for r in rows(data)] + author_scopes(data)
+
+def profile_scopes(data):
+    return [s for r in rows(data) for s in (f"profile:{r['user']['id']}", f"user:{r['user']['id']}")]
 
 # ---- Users & Profiles ----
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
@@ -19,6 +46,9 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **viewer_state_context(self.request)}
+
     @action(detail=False, methods=["get", "put", "patch"], permission_classes=[IsAuthenticated])
     def me(self, request):
         """GET = my profile, PUT/PATCH = update own profile"""
@@ -44,39 +74,99 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         Follow.objects.filter(follower=request.user, following=target).delete()
         return Response({"unfollowed": True})
 
+    @action(detail=False, methods=["get", "post"], permission_classes=[IsAuthenticated], url_path="relationships")
+    def relationships(self, request):
+        """Which of ?ids= the caller follows and is followed by."""
+        following, followed_by = follow_relations(request.user, parse_ids(request))
+        return Response({"following": sorted(following), "followed_by": sorted(followed_by)})
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated], url_path="suggestions")
+    def who_to_follow(self, request):
+        """Who to follow: ?limit=10, read from the precomputed table."""
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), suggestions.suggestions_size())
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=400)
+        rows, computed_at = suggestions.for_user(request.user, limit)
+        users = UserSerializer([u for u, *_ in rows], many=True, context=self.get_serializer_context()).data
+        results = [{"user": data, "score": score, "mutual_count": mutual, "shared_follower_count": shared}
+                   for data, (_, score, mutual, shared) in zip(users, rows)]
+        return Response({"computed_at": computed_at, "results": results})
+
     @action(detail=True, methods=["get"], permission_classes=[permissions.AllowAny], url_path="followers")
+    @cached_response(lambda view, request, pk=None: [f"followers:{pk}", "users"], user_scopes)
     def followers(self, request, pk=None):
         u = self.get_object()
-        qs = Follow.objects.filter(following=u).order_by("-created_at")
-        data = [{"id": f.follower.id, "username": f.follower.username} for f in qs]
-        return Response(data)
+        qs = Follow.objects.filter(following=u).select_related("follower").only(
+            "id", "created_at", "follower__id", "follower__username")
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(qs, request)
+        data = [{"id": f.follower.id, "username": f.follower.username} for f in page]
+        return paginator.get_paginated_response(data)
 
     @action(detail=True, methods=["get"], permission_classes=[permissions.AllowAny], url_path="following")
+    @cached_response(lambda view, request, pk=None: [f"following:{pk}", "users"], user_scopes)
     def following(self, request, pk=None):
         u = self.get_object()
-        qs = Follow.objects.filter(follower=u).order_by("-created_at")
-        data = [{"id": f.following.id, "username": f.following.username} for f in qs]
-        return Response(data)
+        qs = Follow.objects.filter(follower=u).select_related("following").only(
+            "id", "created_at", "following__id", "following__username")
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(qs, request)
+        data = [{"id": f.following.id, "username": f.following.username} for f in page]
+        return paginator.get_paginated_response(data)
 
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Profile.objects.select_related("user").all()
     serializer_class = ProfileSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    query_budget = 3
+
+    @cached_response(lambda view, request: ["profiles", "users"], profile_scopes)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response(lambda view, request, pk=None: ["users"], profile_scopes)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 # ---- Posts ----
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Post.objects.filter(is_active=True).order_by("-created_at")
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = 5
+    pagination_class = KeysetPagination
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **viewer_state_context(self.request)}
+
+    @property
+    def paginator(self):
+        # ?ranking=trending pages through the trending_score index instead
+        if not hasattr(self, "_paginator"):
+            trending_list = self.action == "list" and trending.ranking(self.request) == "trending"
+            self._paginator = TrendingPagination() if trending_list else KeysetPagination()
+        return self._paginator
+
+    # likes and comments reorder the trending list, but not the latest one
+    @cached_response(lambda view, request: ["posts", "users"] + (
+        ["trending"] if trending.ranking(request) == "trending" else []), post_scopes)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response(lambda view, request, pk=None: [f"post:{pk}", "users"], author_scopes)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         post = serializer.save(author=self.request.user)
-        profile, _ = Profile.objects.get_or_create(user=self.request.user)
-        profile.posts_count += 1
-        profile.save()
+        if not incr(Profile, "posts_count", 1, user=self.request.user):
+            Profile.objects.get_or_create(user=self.request.user, defaults={"posts_count": 1})
+        bump(f"profile:{self.request.user.id}")
+        fan_out_post(post)
 
     # Spec: like/unlike/like-status under /api/posts/{id}/like/
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated], url_path="like")
@@ -97,12 +187,20 @@ class PostViewSet(viewsets.ModelViewSet):
         liked = Like.objects.filter(user=request.user, post=post).exists()
         return Response({"liked": liked})
 
+    @action(detail=False, methods=["get", "post"], permission_classes=[IsAuthenticated], url_path="like-status")
+    def like_status_batch(self, request):
+        """Which of ?ids= the caller has liked."""
+        return Response({"liked": sorted(liked_post_ids(request.user, parse_ids(request)))})
+
     # Spec: comments nested under a post
     @action(detail=True, methods=["get", "post"], permission_classes=[IsAuthenticatedOrReadOnly], url_path="comments")
+    @cached_response(lambda view, request, pk=None: [f"comments:{pk}", "users"], author_scopes)
     def comments_under_post(self, request, pk=None):
         post = self.get_object()
         if request.method == "GET":
-            ser = CommentSerializer(post.comments.filter(is_active=True).order_by("-created_at"), many=True)
+            ser = CommentSerializer(
+                post.comments.filter(is_active=True).select_related("author").order_by("-created_at"), many=True
+            )
             return Response(ser.data)
         # POST
         ser = CommentSerializer(data={"post": post.id, **request.data})
@@ -111,58 +209,102 @@ class PostViewSet(viewsets.ModelViewSet):
         return Response(CommentSerializer(obj).data, status=201)
 
 # ---- Comments (for delete own comment) ----
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.filter(is_active=True).order_by("-created_at")
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    query_budget = 2
+    pagination_class = KeysetPagination
 
 # ---- Likes (read-only listing if needed) ----
-class LikeViewSet(viewsets.ReadOnlyModelViewSet):
+class LikeViewSet(OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Like.objects.all().order_by("-created_at")
     serializer_class = LikeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = 3
 
 # ---- Follows ----
-class FollowViewSet(viewsets.ReadOnlyModelViewSet):
+class FollowViewSet(OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Follow.objects.all().order_by("-created_at")
     serializer_class = FollowSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = 3
 
 # ---- Notifications ----
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all().order_by("-created_at")
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 2
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user).order_by("-created_at")
+        return super().get_queryset().filter(recipient=self.request.user)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        reset_unread(self.request.user.id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        reset_unread(self.request.user.id)
 
     @action(detail=True, methods=["post"])
     def read(self, request, pk=None):
         n = self.get_object()
-        n.is_read = True
-        n.save(update_fields=["is_read"])
+        if Notification.objects.filter(pk=n.pk, is_read=False).update(is_read=True):
+            bump_unread(request.user.id, -1)
         return Response({"read": True})
 
     @action(detail=False, methods=["post"], url_path="mark-all-read")
     def mark_all_read(self, request):
         Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        reset_unread(request.user.id, 0)
         return Response({"marked_all_read": True})
 
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        return Response({"unread_count": cached_unread_count(request.user.id)})
+
 # ---- Feed ----
+@with_query_budget(7)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def feed_view(request):
-    user = request.user
-    following_ids = Follow.objects.filter(follower=user).values_list("following_id", flat=True)
-    posts = Post.objects.filter(Q(author=user) | Q(author_id__in=following_ids), is_active=True).order_by("-created_at")
-    from rest_framework.pagination import PageNumberPagination
-    paginator = PageNumberPagination()
-    paginator.page_size = 20
+    ranking = trending.ranking(request)
+    paginator = TrendingPagination() if ranking == "trending" else KeysetPagination()
+    posts = HomeTimeline(request.user, ranking)
     page = paginator.paginate_queryset(posts, request)
-    ser = PostSerializer(page, many=True)
+    ser = PostSerializer(page, many=True, context={"request": request, **viewer_state_context(request)})
     return paginator.get_paginated_response(ser.data)
 
+# ---- Search ----
+MAX_SEARCH_RESULTS = 50
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def search_view(request):
+    """?q=...&type=all|posts|users&limit=20, best matches first."""
+    q = request.query_params.get("q", "").strip()[:200]
+    kind = request.query_params.get("type", "all")
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), MAX_SEARCH_RESULTS)
+    except ValueError:
+        return Response({"detail": "limit must be an integer."}, status=400)
+    if kind not in ("all", "posts", "users"):
+        return Response({"detail": "type must be all, posts or users."}, status=400)
+    context = {"request": request, **viewer_state_context(request)}
+    data = {"q": q}
+    if kind in ("all", "posts"):
+        hits = search_posts(q, limit) if q else []
+        found = Post.objects.filter(is_active=True).select_related("author").in_bulk([pk for pk, _ in hits])
+        data["posts"] = PostSerializer([found[pk] for pk, _ in hits if pk in found], many=True, context=context).data
+    if kind in ("all", "users"):
+        hits = search_users(q, limit) if q else []
+        found = User.objects.filter(is_active=True).in_bulk([pk for pk, _ in hits])
+        data["users"] = UserSerializer([found[pk] for pk, _ in hits if pk in found], many=True, context=context).data
+    return Response(data)
+
 # ---- Admin ----
 from rest_framework.viewsets import ViewSet
 
@@ -170,10 +312,10 @@ class AdminViewSet(ViewSet):
     permission_classes = [IsAuthenticated]
 
     def list_users(self, request):
+        """All users, streamed; ?export=ndjson or ?export=csv for downloads."""
         if not request.user.is_staff:
             return Response({"detail": "Not authorized"}, status=403)
-        users = User.objects.all()
-        return Response(UserSerializer(users, many=True).data)
+        return export_response(request, UserSerializer, User.objects.all(), "users")
 
     def deactivate_user(self, request, pk=None):
         if not request.user.is_staff:
@@ -187,10 +329,24 @@ class AdminViewSet(ViewSet):
         return Response({"message": "User deactivated"})
 
     def list_posts(self, request):
+        """All posts, streamed; ?export=ndjson or ?export=csv for downloads."""
         if not request.user.is_staff:
             return Response({"detail": "Not authorized"}, status=403)
-        posts = Post.objects.all()
-        return Response(PostSerializer(posts, many=True).data)
+        return export_response(request, PostSerializer, Post.objects.all(), "posts")
+
+    def bulk_deactivate_users(self, request):
+        """Deactivate users by {"ids": [...]}, {"id_from", "id_to"} and/or {"before": date_joined}."""
+        if not request.user.is_staff:
+            return Response({"detail": "Not authorized"}, status=403)
+        users = bulk_filter(User.objects.exclude(pk=request.user.pk), request.data, "date_joined")
+        return Response({"deactivated": bulk_deactivate_users(users)})
+
+    def bulk_delete_posts(self, request):
+        """Delete posts by {"ids": [...]}, {"id_from", "id_to"} and/or {"before": created_at}."""
+        if not request.user.is_staff:
+            return Response({"detail": "Not authorized"}, status=403)
+        posts = bulk_filter(Post.objects.all(), request.data, "created_at")
+        return Response({"deleted": bulk_delete_posts(posts)})
 
     @action(detail=False, methods=["delete"], url_path="posts/(?P<post_id>[^/.]+)")
     def delete_post(self, request, post_id=None):
@@ -205,8 +361,19 @@ class AdminViewSet(ViewSet):
     def stats(self, request):
         if not request.user.is_staff:
             return Response({"detail": "Not authorized"}, status=403)
-        today = timezone.now().date()
-        total_users = User.objects.count()
-        total_posts = Post.objects.count()
-        active_today = Post.objects.filter(created_at__date=today).count()
-        return Response({"total_users": total_users, "total_posts": total_posts, "active_today": active_today})
+        return Response(stats.overview())
+
+    def stats_timeseries(self, request):
+        """?metrics=posts,likes&interval=hour|day&since=&until= (ISO datetimes, default last 30 days)."""
+        if not request.user.is_staff:
+            return Response({"detail": "Not authorized"}, status=403)
+        params = request.query_params
+        metrics = [m for m in params.get("metrics", "posts").split(",") if m]
+        interval = params.get("interval", "day")
+        until = parse_datetime(params["until"]) if params.get("until") else timezone.now()
+        since = parse_datetime(params["since"]) if params.get("since") else until - timedelta(days=30)
+        if any(m not in stats.METRICS for m in metrics) or interval not in stats.INTERVALS \
+                or since is None or until is None:
+            return Response({"detail": f"metrics must be among {', '.join(stats.METRICS)}, interval hour or day, "
+                                       "since/until ISO datetimes."}, status=400)
+        return Response({"interval": interval, "series": stats.series(metrics, interval, since, until)})